@@ -0,0 +1,27 @@
+"""Add checkout_sessions.pricing_plan_id, the plan being bought
+
+Revision ID: 9d3b6f1e2c84
+Revises: c4a9d1e7f250
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b6f1e2c84'
+down_revision = 'c4a9d1e7f250'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('checkout_sessions', sa.Column('pricing_plan_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_checkout_sessions_pricing_plan', 'checkout_sessions', 'pricing_plans',
+                          ['pricing_plan_id'], ['id'])
+
+
+def downgrade():
+    op.drop_constraint('fk_checkout_sessions_pricing_plan', 'checkout_sessions', type_='foreignkey')
+    op.drop_column('checkout_sessions', 'pricing_plan_id')
@@ -0,0 +1,30 @@
+"""Add checkout reservations to tag
+
+Revision ID: a1d7e3f05c96
+Revises: f2c9a4e81b07
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d7e3f05c96'
+down_revision = 'f2c9a4e81b07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tag', sa.Column('reserved_by', sa.Integer(), nullable=True))
+    op.add_column('tag', sa.Column('reserved_until', sa.DateTime(), nullable=True))
+    op.create_foreign_key('fk_tag_reserved_by_user', 'tag', 'user', ['reserved_by'], ['id'])
+    op.create_index('ix_tag_reserved_until', 'tag', ['reserved_until'])
+
+
+def downgrade():
+    op.drop_index('ix_tag_reserved_until', table_name='tag')
+    op.drop_constraint('fk_tag_reserved_by_user', 'tag', type_='foreignkey')
+    op.drop_column('tag', 'reserved_until')
+    op.drop_column('tag', 'reserved_by')
@@ -0,0 +1,24 @@
+"""Add photo_variants to pet
+
+Revision ID: b61e2d9c4a73
+Revises: 3f8c7b6a5d92
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b61e2d9c4a73'
+down_revision = '3f8c7b6a5d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('pet', sa.Column('photo_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('pet', 'photo_variants')
@@ -0,0 +1,57 @@
+"""Add admin_jobs and admin_job_items for background admin operations
+
+Revision ID: b8e2f6a3d417
+Revises: a1d7e3f05c96
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f6a3d417'
+down_revision = 'a1d7e3f05c96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'admin_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=True),
+        sa.Column('idempotency_key', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('succeeded', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('skipped', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    op.create_table(
+        'admin_job_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('subscription_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('message', sa.String(length=255), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['admin_jobs.id']),
+        sa.ForeignKeyConstraint(['subscription_id'], ['subscription.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('job_id', 'subscription_id', name='uq_admin_job_items_job_subscription'),
+    )
+
+
+def downgrade():
+    op.drop_table('admin_job_items')
+    op.drop_table('admin_jobs')
@@ -0,0 +1,61 @@
+"""Add revenue_ledger and payments.pricing_plan_id, backfilled from history
+
+Revision ID: c4a9d1e7f250
+Revises: b8e2f6a3d417
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9d1e7f250'
+down_revision = 'b8e2f6a3d417'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('payments', sa.Column('pricing_plan_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_payments_pricing_plan', 'payments', 'pricing_plans', ['pricing_plan_id'], ['id'])
+
+    # Past payments were for their subscription's plan
+    op.execute(
+        "UPDATE payments SET pricing_plan_id = ("
+        "SELECT subscription.pricing_plan_id FROM subscription WHERE subscription.id = payments.subscription_id"
+        ") WHERE subscription_id IS NOT NULL"
+    )
+
+    op.create_table(
+        'revenue_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('payment_gateway', sa.String(length=50), nullable=False),
+        sa.Column('payment_type', sa.String(length=50), nullable=False),
+        sa.Column('pricing_plan_id', sa.Integer(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payment_count', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'payment_gateway', 'payment_type', 'pricing_plan_id', 'currency', 'status',
+                            name='uq_revenue_ledger_key'),
+    )
+
+    # Backfill; `python -m services.revenue rebuild` does the same from the app
+    op.execute(
+        "INSERT INTO revenue_ledger "
+        "(day, payment_gateway, payment_type, pricing_plan_id, currency, status, payment_count, amount) "
+        "SELECT DATE(created_at), payment_gateway, payment_type, COALESCE(pricing_plan_id, 0), "
+        "UPPER(COALESCE(currency, 'USD')), status, COUNT(id), SUM(amount) "
+        "FROM payments WHERE created_at IS NOT NULL "
+        "GROUP BY DATE(created_at), payment_gateway, payment_type, COALESCE(pricing_plan_id, 0), "
+        "UPPER(COALESCE(currency, 'USD')), status"
+    )
+
+
+def downgrade():
+    op.drop_table('revenue_ledger')
+    op.drop_constraint('fk_payments_pricing_plan', 'payments', type_='foreignkey')
+    op.drop_column('payments', 'pricing_plan_id')
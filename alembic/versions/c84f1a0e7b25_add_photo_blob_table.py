@@ -0,0 +1,38 @@
+"""Add photo_blob table for content-addressed photo storage
+
+Revision ID: c84f1a0e7b25
+Revises: b61e2d9c4a73
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c84f1a0e7b25'
+down_revision = 'b61e2d9c4a73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('photo_blob',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(64), nullable=False),
+        sa.Column('key', sa.String(255), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('content_type', sa.String(100), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256'),
+        sa.UniqueConstraint('key')
+    )
+    op.create_index('ix_photo_blob_orphans', 'photo_blob', ['ref_count', 'updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_photo_blob_orphans', table_name='photo_blob')
+    op.drop_table('photo_blob')
@@ -0,0 +1,40 @@
+"""Add (status, end_date) indexes for the subscription expiry sweeper
+
+Revision ID: d5e2a7c91f34
+Revises: c84f1a0e7b25
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e2a7c91f34'
+down_revision = 'c84f1a0e7b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_subscription_status_end_date', 'subscription', ['status', 'end_date'])
+    op.create_index(
+        'ix_partner_subscription_status_end_date', 'partner_subscription', ['status', 'end_date']
+    )
+    # Rows that lapsed before the sweeper existed (no expiry emails for those);
+    # end_date is naive UTC, so compare with utcnow rather than the DB clock
+    now = datetime.utcnow()
+    for table in ('subscription', 'partner_subscription'):
+        op.get_bind().execute(
+            sa.text(
+                f"UPDATE {table} SET status = 'expired', updated_at = :now "
+                "WHERE status = 'active' AND end_date < :now"
+            ),
+            {"now": now},
+        )
+
+
+def downgrade():
+    op.drop_index('ix_partner_subscription_status_end_date', table_name='partner_subscription')
+    op.drop_index('ix_subscription_status_end_date', table_name='subscription')
@@ -0,0 +1,26 @@
+"""Add saved gateway customer and payment method to subscription
+
+Revision ID: e7b3c5d02a18
+Revises: d5e2a7c91f34
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3c5d02a18'
+down_revision = 'd5e2a7c91f34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('subscription', sa.Column('gateway_customer_id', sa.String(100), nullable=True))
+    op.add_column('subscription', sa.Column('gateway_payment_method_id', sa.String(100), nullable=True))
+
+
+def downgrade():
+    op.drop_column('subscription', 'gateway_payment_method_id')
+    op.drop_column('subscription', 'gateway_customer_id')
@@ -0,0 +1,48 @@
+"""Add checkout_sessions for reusable payment intents
+
+Revision ID: f2c9a4e81b07
+Revises: e7b3c5d02a18
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c9a4e81b07'
+down_revision = 'e7b3c5d02a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'checkout_sessions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('checkout_key', sa.String(length=64), nullable=False),
+        sa.Column('payment_type', sa.String(length=50), nullable=False),
+        sa.Column('subject', sa.String(length=100), nullable=True),
+        sa.Column('subscription_type', sa.String(length=20), nullable=True),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+        sa.Column('payment_gateway', sa.String(length=50), nullable=False),
+        sa.Column('payment_intent_id', sa.String(length=200), nullable=True),
+        sa.Column('client_secret', sa.String(length=255), nullable=True),
+        sa.Column('idempotency_key', sa.String(length=200), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('payment_intent_id'),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    op.create_index('ix_checkout_sessions_user_key', 'checkout_sessions', ['user_id', 'checkout_key'])
+
+
+def downgrade():
+    op.drop_index('ix_checkout_sessions_user_key', table_name='checkout_sessions')
+    op.drop_table('checkout_sessions')
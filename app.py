@@ -4,8 +4,24 @@ LTFPQRR Flask Application Factory
 import os
 from flask import Flask
 from config import config
-from extensions import db, init_login_manager, make_celery, get_cipher_suite
-from utils import init_utils, configure_payment_gateways
+from extensions import db, init_login_manager, get_celery
+from utils import init_utils
+from services.compression import init_compression
+from services.assets import init_assets
+from services.metrics import init_metrics
+from services.health import init_health
+from services.snapshots import init_snapshots
+from services.templates import init_template_cache
+from services.cache import init_cache
+from services.fragment_cache import init_fragment_cache
+from services.page_cache import init_page_cache
+from services.storage import init_storage
+from services.tag_filter import init_tag_filter
+from services.rate_limit import init_rate_limit
+from services.subscriptions import init_subscriptions
+from services.stripe_client import init_stripe_client
+from services.revenue import init_revenue
+from services.json_provider import init_json
 
 # Import blueprint modules
 from routes.public import public
@@ -18,6 +34,9 @@ from routes.payment import payment
 from routes.profile import profile_bp
 from routes.admin import admin
 from routes.settings import settings
+from routes.monitoring import monitoring
+from routes.media import media
+from routes.api import api
 
 
 def create_app(config_name=None):
@@ -29,7 +48,7 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     
     # Ensure upload directory exists
-    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    os.makedirs(os.path.join(app.root_path, app.config["UPLOAD_FOLDER"]), exist_ok=True)
     
     # Initialize extensions
     db.init_app(app)
@@ -37,6 +56,22 @@ def create_app(config_name=None):
     
     # Initialize utilities
     init_utils(app)
+    init_json(app)
+    init_compression(app)
+    init_metrics(app)
+    init_health(app)
+    init_snapshots(app)
+    init_template_cache(app)
+    init_cache(app)
+    init_fragment_cache(app)
+    init_page_cache(app)
+    init_assets(app)
+    init_storage(app)
+    init_tag_filter(app)
+    init_rate_limit(app)
+    init_subscriptions(app)
+    init_stripe_client(app)
+    init_revenue(app)
     
     # Register blueprints
     app.register_blueprint(public)
@@ -49,39 +84,49 @@ def create_app(config_name=None):
     app.register_blueprint(profile_bp)
     app.register_blueprint(admin)
     app.register_blueprint(settings)
+    app.register_blueprint(monitoring)
+    app.register_blueprint(media)
+    app.register_blueprint(api)
     
-    # Import models to ensure they are registered with SQLAlchemy
+    # Import models to ensure they are registered with SQLAlchemy.
+    # Schema changes are managed by Alembic (see start_ltfpqrr.sh / migrate.py)
+    # and payment gateways are configured on first use, so creating the app
+    # does not touch the database.
     from models.models import (
-        User, Role, Tag, Pet, Subscription, SearchLog, 
+        User, Role, Tag, Pet, PhotoBlob, Subscription, SearchLog, 
         NotificationPreference, SystemSetting, PaymentGateway, 
         PricingPlan, Payment
     )
     from models.partner.partner import Partner, PartnerAccessRequest, PartnerSubscription
     
-    # Create tables if they don't exist
-    with app.app_context():
-        db.create_all()
-        
-        # Configure payment gateways after app and database initialization
-        try:
-            configure_payment_gateways()
-        except Exception as e:
-            app.logger.warning(f"Could not configure payment gateways: {e}")
-    
     return app
 
 
 def create_celery_app(app=None):
     """Create Celery app."""
     app = app or create_app()
-    return make_celery(app)
+    return get_celery(app)
+
 
+def __getattr__(name):
+    """Create the default app and Celery instances on first access.
 
-# Create app instance for direct running
-app = create_app()
-celery = create_celery_app(app)
+    Importing this module has no side effects; `from app import app, db`
+    (CLI scripts) and `celery -A app.celery` still work.
+    """
+    if name == "app":
+        instance = create_app()
+    elif name == "celery":
+        instance = create_celery_app(globals().get("app") or __getattr__("app"))
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = instance
+    return instance
 
 
 if __name__ == '__main__':
     # Development server
+    from services.warmup import warm_up
+    app = create_app()
+    warm_up(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Checkout throughput benchmark, offline.
+
+Starts benchmarks/fake_stripe.py with --latency per response, points the app
+at it (STRIPE_API_BASE) and has --concurrency threads, each logged in as its
+own user, POST /payment/stripe/create-intent --requests times in total. It
+reports requests per second, latency percentiles and how many TCP connections
+the fake Stripe saw: with the shared client every thread keeps its connection
+alive, so that number stays at about one per thread.
+
+Each thread repeats the same checkout, which reuses its payment intent
+(services/checkout.py); --distinct claims a different tag on every request
+so that each one needs a new intent. --recurring checks out a monthly plan,
+which also needs a Stripe customer.
+
+Usage:
+    python benchmarks/checkout_load.py --requests 500 --concurrency 16 --latency 0.05
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_stripe import FakeStripeServer  # noqa: E402
+
+
+def create_app_with_users(database_url, stripe_url, count, tags_per_user=0):
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "STRIPE_API_BASE": stripe_url,
+        "STRIPE_SECRET_KEY": "sk_test_fake",
+        "STRIPE_PUBLISHABLE_KEY": "pk_test_fake",
+    })
+    from app import create_app
+    from decimal import Decimal
+    from extensions import db
+    from models.models import PricingPlan, Tag, User
+
+    app = create_app("development")
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            PricingPlan(name="Monthly", price=Decimal("9.99"), billing_period="monthly", plan_type="tag"),
+            PricingPlan(name="Lifetime", price=Decimal("199.99"), billing_period="lifetime", plan_type="tag"),
+        ])
+        users = [
+            User(username=f"load{i}", email=f"load{i}@example.com", password_hash="x",
+                 first_name="Load", last_name=str(i))
+            for i in range(count)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+        # --distinct checks out a different available tag each time
+        db.session.add_all(
+            Tag(tag_id=f"LOAD{user_id}X{i}", status="available", created_by=user_id)
+            for user_id in user_ids for i in range(tags_per_user)
+        )
+        db.session.commit()
+    return app, user_ids
+
+
+def run(app, user_ids, total, recurring, distinct):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_thread = total // len(user_ids)
+
+    def checkout(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+            session["subscription_type"] = "monthly" if recurring else "lifetime"
+        for i in range(per_thread):
+            if distinct:
+                with client.session_transaction() as session:
+                    session["claiming_tag_id"] = f"LOAD{user_id}X{i}"
+            started = time.perf_counter()
+            response = client.post("/payment/stripe/create-intent", json={"payment_type": "tag"})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=checkout, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Stripe seconds per response")
+    parser.add_argument("--recurring", action="store_true", help="monthly plan: also create customers")
+    parser.add_argument("--distinct", action="store_true", help="a new tag, so a new intent, per request")
+    args = parser.parse_args()
+    logging.getLogger("stripe").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp, FakeStripeServer(latency=args.latency) as server:
+        app, user_ids = create_app_with_users(
+            f"sqlite:///{os.path.join(tmp, 'checkout.db')}", server.url, args.concurrency,
+            tags_per_user=args.requests // args.concurrency if args.distinct else 0,
+        )
+        elapsed, latencies, errors = run(app, user_ids, args.requests, args.recurring, args.distinct)
+
+    latencies.sort()
+    count = len(latencies)
+    print(f"{count} checkouts in {elapsed:.2f}s: {count / elapsed:.1f}/s, {len(errors)} errors")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(count * 0.95) - 1] * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms")
+    print(f"fake Stripe: {len(server.fake.requests)} requests over {server.fake.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
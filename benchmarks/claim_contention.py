@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tag claim contention benchmark.
+
+Creates --tags available tags and has --concurrency threads, each its own
+buyer, try to claim every one of them at the same time, in random order.
+Each tag must end up with exactly one owner. It reports claims, conflicts,
+double claims (tags some other thread believed it had won) and claims per
+second.
+
+By default each attempt is services.tag_claims.claim_tag(): one conditional
+UPDATE. --naive instead reads the tag, checks its status in Python and
+writes it back, as the payment routes used to, to show the lost updates
+that produces.
+
+Uses a throwaway SQLite file unless --database-url points at another
+database (which must be empty: the tables are created and dropped).
+
+Usage:
+    python benchmarks/claim_contention.py --tags 200 --concurrency 16 [--naive]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def create_app_with_tags(database_url, buyers, tags):
+    os.environ["DATABASE_URL"] = database_url
+    from app import create_app
+    from extensions import db
+    from models.models import Tag, User
+
+    app = create_app("development")
+    with app.app_context():
+        db.create_all()
+        users = [
+            User(username=f"claim{i}", email=f"claim{i}@example.com", password_hash="x",
+                 first_name="Claim", last_name=str(i))
+            for i in range(buyers)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all(
+            Tag(tag_id=f"RUSH{i:05d}", status="available", created_by=users[0].id) for i in range(tags)
+        )
+        db.session.commit()
+        user_ids = [user.id for user in users]
+    return app, user_ids
+
+
+def naive_claim(tag_id, user_id):
+    """Read-check-write, for comparison."""
+    from models.models import Tag
+
+    tag = Tag.query.filter_by(tag_id=tag_id).first()
+    if tag is None or tag.status != "available":
+        return None
+    time.sleep(0)  # let another thread in between the read and the write
+    tag.owner_id = user_id
+    tag.status = "claimed"
+    return tag.id
+
+
+def run(app, user_ids, tag_ids, naive):
+    from extensions import db
+    from services.tag_claims import claim_tag
+
+    claim = naive_claim if naive else claim_tag
+    wins = Counter()
+    outcomes = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(user_ids))
+
+    def buyer(user_id):
+        order = list(tag_ids)
+        random.shuffle(order)
+        with app.app_context():
+            barrier.wait()
+            for tag_id in order:
+                try:
+                    won = claim(tag_id, user_id)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    won, outcome = None, "errors"
+                else:
+                    outcome = "claims" if won else "conflicts"
+                with lock:
+                    outcomes[outcome] += 1
+                    if won:
+                        wins[tag_id] += 1
+
+    threads = [threading.Thread(target=buyer, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, wins, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--naive", action="store_true", help="read-check-write instead of claim_tag()")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'claims.db')}"
+        app, user_ids = create_app_with_tags(database_url, args.concurrency, args.tags)
+        tag_ids = [f"RUSH{i:05d}" for i in range(args.tags)]
+        elapsed, wins, outcomes = run(app, user_ids, tag_ids, args.naive)
+
+        from extensions import db
+        from models.models import Tag
+        with app.app_context():
+            claimed = Tag.query.filter_by(status="claimed").count()
+            db.drop_all()
+
+    attempts = sum(outcomes.values())
+    doubles = sum(count - 1 for count in wins.values() if count > 1)
+    print(f"{attempts} attempts on {args.tags} tags by {args.concurrency} buyers in {elapsed:.2f}s: "
+          f"{attempts / elapsed:.0f} attempts/s")
+    print(f"{outcomes['claims']} claims, {outcomes['conflicts']} conflicts, {outcomes['errors']} errors, "
+          f"{doubles} double claims, {claimed} tags claimed")
+
+
+if __name__ == "__main__":
+    main()
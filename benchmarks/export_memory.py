@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Export memory benchmark: streaming export versus loading every row.
+
+Fills a throwaway SQLite database with --scans tag scans, then exports them
+as CSV two ways under tracemalloc: stream_export() reading a chunk at a
+time, and SearchLog.query.all() written out in one piece, as an export
+built on the list views would. Prints each one's peak memory and time.
+
+Usage:
+    python benchmarks/export_memory.py --scans 500000
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(count):
+    from sqlalchemy import insert
+    from extensions import db
+    from models.models import SearchLog, Tag, User
+
+    user = User(username="exporter", email="exporter@example.com", password_hash="x",
+                first_name="Ex", last_name="Porter")
+    db.session.add(user)
+    db.session.flush()
+    tags = [Tag(tag_id=f"BENCH{i:04}", status="active", created_by=user.id) for i in range(100)]
+    db.session.add_all(tags)
+    db.session.commit()
+
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = [
+        {
+            "tag_id": tags[i % len(tags)].id,
+            "ip_address": f"10.0.{i % 256}.{i % 251}",
+            "user_agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile/15E148",
+            "timestamp": start + timedelta(seconds=i * 60),
+        }
+        for i in range(count)
+    ]
+    for offset in range(0, count, 10000):
+        db.session.execute(insert(SearchLog), rows[offset:offset + 10000])
+    db.session.commit()
+
+
+def streamed():
+    from services.exports import stream_export
+
+    size = 0
+    for chunk in stream_export("scans", "csv"):
+        size += len(chunk)
+    return size
+
+
+def loaded():
+    from models.models import SearchLog
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for scan in SearchLog.query.all():
+        writer.writerow([scan.id, scan.tag.tag_id, scan.timestamp, scan.ip_address, scan.user_agent])
+    return len(output.getvalue())
+
+
+def measure(function):
+    from extensions import db
+
+    db.session.remove()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = function()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scans", type=int, default=500000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'exports.db')}"
+        from app import create_app
+        from extensions import db
+
+        app = create_app("development")
+        with app.app_context():
+            db.create_all()
+            seed(args.scans)
+            for label, function in (("streamed", streamed), ("loaded", loaded)):
+                size, peak, elapsed = measure(function)
+                print(f"{label:>8}: {size / 2**20:.1f} MiB of CSV, peak {peak / 2**20:.1f} MiB, {elapsed:.2f}s")
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
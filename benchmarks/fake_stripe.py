@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the Stripe API that LTFPQRR uses.
+
+Point the Stripe SDK at it (stripe.api_base = server.url) to exercise payment
+code end to end without network access or a Stripe account: the real SDK
+sends real HTTP requests and gets Stripe-shaped JSON back.
+
+Supported: creating and retrieving customers, payment intents (optionally
+confirmed with a payment method) and refunds, and idempotency keys. Payment
+methods behave like Stripe's test ones: pm_card_chargeDeclined is declined,
+pm_card_authenticationRequired needs authentication and anything else
+succeeds. --latency adds a delay to every response, like a real round trip,
+and FakeStripe.fail_next() answers the next requests with an error, like an
+outage.
+
+Usage:
+    python benchmarks/fake_stripe.py --port 12111 --latency 0.2
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+DECLINES = {
+    "pm_card_chargeDeclined": ("card_declined", "generic_decline", "Your card was declined."),
+    "pm_card_authenticationRequired": (
+        "authentication_required", "authentication_required",
+        "This payment requires authentication.",
+    ),
+}
+
+
+def _parse_form(body):
+    """Decode Stripe's form encoding (metadata[key]=value) into a dict."""
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        if "[" in key and key.endswith("]"):
+            name, sub = key[:-1].split("[", 1)
+            params.setdefault(name, {})[sub] = value
+        else:
+            params[key] = value
+    return params
+
+
+class FakeStripe:
+    """In-memory Stripe objects, shared by every request handler thread."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self.requests = []
+        self.connections = 0
+        self._idempotent = {}
+        self._failures = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1, status=500):
+        """Answer the next count requests with an API error of that status."""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _id(self, prefix):
+        return f"{prefix}_fake{next(self._ids):010d}"
+
+    def create_customer(self, params):
+        customer = {
+            "id": self._id("cus"),
+            "object": "customer",
+            "email": params.get("email"),
+            "metadata": params.get("metadata", {}),
+        }
+        self.objects[customer["id"]] = customer
+        return 200, customer
+
+    def create_payment_intent(self, params):
+        intent_id = self._id("pi")
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(params["amount"]),
+            "currency": params.get("currency", "usd"),
+            "customer": params.get("customer"),
+            "payment_method": params.get("payment_method"),
+            "metadata": params.get("metadata", {}),
+            "setup_future_usage": params.get("setup_future_usage"),
+            "client_secret": f"{intent_id}_secret_fake",
+            "status": "requires_payment_method",
+            "created": int(time.time()),
+        }
+        if str(params.get("confirm")).lower() == "true" and intent["payment_method"]:
+            decline = DECLINES.get(intent["payment_method"])
+            if decline:
+                code, decline_code, message = decline
+                intent["status"] = "requires_payment_method"
+                self.objects[intent_id] = intent
+                return 402, {"error": {
+                    "type": "card_error",
+                    "code": code,
+                    "decline_code": decline_code,
+                    "message": message,
+                    "payment_intent": intent,
+                }}
+            intent["status"] = "succeeded"
+        self.objects[intent_id] = intent
+        return 200, intent
+
+    def create_refund(self, params):
+        intent = self.objects.get(params.get("payment_intent"))
+        if not intent or intent["status"] != "succeeded":
+            return 400, {"error": {
+                "type": "invalid_request_error",
+                "code": "charge_not_refundable" if intent else "resource_missing",
+                "message": f"Payment intent {params.get('payment_intent')!r} cannot be refunded.",
+            }}
+        refund = {
+            "id": self._id("re"),
+            "object": "refund",
+            "amount": int(params.get("amount") or intent["amount"]),
+            "currency": intent["currency"],
+            "payment_intent": intent["id"],
+            "reason": params.get("reason"),
+            "status": "succeeded",
+            "created": int(time.time()),
+        }
+        self.objects[refund["id"]] = refund
+        return 200, refund
+
+    def handle(self, method, path, params, idempotency_key):
+        with self._lock:
+            self.requests.append((method, path))
+            if self._failures:
+                return self._failures.pop(0), {"error": {
+                    "type": "api_error",
+                    "message": "Something went wrong on Stripe's end.",
+                }}
+            if idempotency_key and (method, path, idempotency_key) in self._idempotent:
+                return self._idempotent[(method, path, idempotency_key)]
+
+            parts = path.strip("/").split("/")
+            if method == "POST" and parts == ["v1", "customers"]:
+                result = self.create_customer(params)
+            elif method == "POST" and parts == ["v1", "payment_intents"]:
+                result = self.create_payment_intent(params)
+            elif method == "POST" and parts == ["v1", "refunds"]:
+                result = self.create_refund(params)
+            elif method == "GET" and len(parts) == 3 and parts[1] in ("customers", "payment_intents", "refunds"):
+                obj = self.objects.get(parts[2])
+                result = (200, obj) if obj else (404, {"error": {
+                    "type": "invalid_request_error",
+                    "code": "resource_missing",
+                    "message": f"No such object: '{parts[2]}'",
+                }})
+            else:
+                result = (404, {"error": {
+                    "type": "invalid_request_error",
+                    "message": f"Unrecognized request URL ({method}: {path}).",
+                }})
+
+            if idempotency_key:
+                self._idempotent[(method, path, idempotency_key)] = result
+            return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # One handler per TCP connection: counts how well clients reuse them
+        with self.server.fake._lock:
+            self.server.fake.connections += 1
+
+    def _respond(self, method):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        path, _, query = self.path.partition("?")
+        params = _parse_form(body or query)
+        if fake.latency:
+            time.sleep(fake.latency)
+        status, document = fake.handle(method, path, params, self.headers.get("Idempotency-Key"))
+
+        data = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Request-Id", f"req_fake{len(fake.requests)}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeStripeServer:
+    """Runs FakeStripe on a local port in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.fake = FakeStripe(latency)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self.fake
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+
+    server = FakeStripeServer(args.host, args.port, args.latency)
+    print(f"Fake Stripe API on {server.url} (stripe.api_base = {server.url!r})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
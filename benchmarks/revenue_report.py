@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Revenue report benchmark: ledger versus scanning payments.
+
+Fills a throwaway SQLite database with --payments payments spread over
+--days days, builds the revenue ledger with rebuild_ledger(), then times
+the admin report for the last 30 days two ways: revenue_report() reading
+revenue_ledger, and the same totals computed by loading Payment rows, as a
+report without the ledger would.
+
+Usage:
+    python benchmarks/revenue_report.py --payments 200000 --days 365
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(count, days):
+    from sqlalchemy import insert
+    from extensions import db
+    from models.models import Payment, User
+
+    user = User(username="finance", email="finance@example.com", password_hash="x",
+                first_name="Fin", last_name="Ance")
+    db.session.add(user)
+    db.session.commit()
+
+    start = datetime.utcnow() - timedelta(days=days)
+    rows = [
+        {
+            "user_id": user.id,
+            "payment_gateway": random.choice(("stripe", "stripe", "paypal")),
+            "payment_type": random.choice(("tag", "partner", "renewal")),
+            "amount": Decimal(random.choice(("9.99", "99.99", "29.99"))),
+            "currency": "USD",
+            "status": random.choice(("completed",) * 8 + ("failed", "refunded")),
+            "payment_metadata": {"subscription_type": "monthly", "note": "x" * 200},
+            "gateway_response": {"object": "payment_intent", "raw": "y" * 1000},
+            "created_at": start + timedelta(seconds=random.randrange(days * 86400)),
+        }
+        for _ in range(count)
+    ]
+    for offset in range(0, count, 10000):
+        db.session.execute(insert(Payment), rows[offset:offset + 10000])
+    db.session.commit()
+
+
+def report_from_payments(start, end):
+    from models.models import Payment
+
+    totals = {}
+    since = datetime.combine(start, datetime.min.time())
+    until = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    for payment in Payment.query.filter(Payment.created_at >= since, Payment.created_at < until):
+        day = totals.setdefault(payment.created_at.date(), [0, Decimal("0")])
+        if payment.status == "completed":
+            day[0] += 1
+            day[1] += payment.amount
+    return totals
+
+
+def timed(function, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--payments", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'revenue.db')}"
+        from app import create_app
+        from extensions import db
+        from services.revenue import parse_range, rebuild_ledger, revenue_report
+
+        app = create_app("development")
+        with app.app_context():
+            db.create_all()
+            seed(args.payments, args.days)
+            started = time.perf_counter()
+            rows = rebuild_ledger()
+            print(f"{args.payments} payments, ledger rebuilt in {time.perf_counter() - started:.2f}s: {rows} rows")
+
+            start, end = parse_range(None, None)
+            ledger = timed(revenue_report, start, end, "day")
+            scan = timed(report_from_payments, start, end, repeat=1)
+            print(f"30-day report from the ledger: {ledger * 1000:.1f} ms")
+            print(f"30-day report from payments:   {scan * 1000:.1f} ms")
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
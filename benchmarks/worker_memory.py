@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Memory-per-worker benchmark for the gunicorn server profile.
+
+Starts gunicorn (gunicorn.conf.py) once with preload_app and once without,
+serves a few pages from every worker and reads /proc/<pid>/smaps_rollup for
+the master and each worker. It also kills the workers and times how long the
+master takes to serve requests again from new ones.
+
+RSS counts shared pages in every process, so compare PSS (shared pages split
+between the processes using them) and USS (pages private to the worker).
+
+Usage (Linux only):
+    python benchmarks/worker_memory.py --workers 4 --requests 200
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGES = ["/", "/contact", "/privacy", "/found", "/auth/login", "/healthz"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def create_database(url):
+    """Create the schema once so both modes serve the same pages."""
+    os.environ["DATABASE_URL"] = url
+    from app import create_app
+    from extensions import db
+
+    app = create_app("production")
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+
+def children(pid):
+    """Worker pids of a gunicorn master."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def memory(pid):
+    """Rss, Pss and Uss of a process in KiB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def wait_for(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
+def run_mode(preload, workers, requests, env):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(env, GUNICORN_PRELOAD="true" if preload else "false")
+    started = time.monotonic()
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_for(f"{base}/healthz", 60):
+            raise RuntimeError("gunicorn did not start")
+        # Wait until every worker is up, not just the first one
+        while len(children(master.pid)) < workers:
+            time.sleep(0.01)
+        boot = time.monotonic() - started
+
+        # Enough traffic that every worker renders every page
+        for i in range(requests):
+            urllib.request.urlopen(base + PAGES[i % len(PAGES)], timeout=5).read()
+
+        worker_pids = children(master.pid)
+        stats = {"master": memory(master.pid), "workers": [memory(pid) for pid in worker_pids]}
+
+        # Time worker replacement: with every old worker gone, the first
+        # answer has to come from a freshly forked one
+        for pid in worker_pids:
+            os.kill(pid, signal.SIGKILL)
+        killed = time.monotonic()
+        while set(children(master.pid)) & set(worker_pids):
+            time.sleep(0.001)
+        wait_for(f"{base}/healthz", 60)
+        stats["respawn_ms"] = (time.monotonic() - killed) * 1000
+        stats["boot_s"] = boot
+        return stats
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+            master.wait()
+
+
+def report(name, stats):
+    workers = stats["workers"]
+    count = len(workers)
+    avg = {key: sum(w[key] for w in workers) / count / 1024 for key in ("rss", "pss", "uss")}
+    total_pss = (stats["master"]["pss"] + sum(w["pss"] for w in workers)) / 1024
+    print(f"{name:<12} boot {stats['boot_s']:6.2f}s  respawn {stats['respawn_ms']:8.1f}ms  "
+          f"worker rss {avg['rss']:6.1f}  pss {avg['pss']:6.1f}  uss {avg['uss']:6.1f} MiB  "
+          f"total pss {total_pss:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{tmp}/bench.db"
+        create_database(db_url)
+        env = dict(
+            os.environ,
+            FLASK_ENV="production",
+            DATABASE_URL=db_url,
+            # No broker or SMTP server is needed; fail their probes fast
+            REDIS_URL="redis://127.0.0.1:1/0",
+            HEALTH_PROBE_TIMEOUT="0.2",
+            PROMETHEUS_MULTIPROC_DIR=os.path.join(tmp, "metrics"),
+        )
+        for name, preload in (("preload", True), ("no-preload", False)):
+            report(name, run_mode(preload, args.workers, args.requests, env))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,13 +20,162 @@ class Config:
     UPLOAD_FOLDER = "static/uploads"
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
+    # Photo storage: "local" (UPLOAD_FOLDER) or "s3" (any S3-compatible bucket)
+    PHOTO_STORAGE = os.environ.get("PHOTO_STORAGE", "local")
+    PHOTO_STORAGE_S3_BUCKET = os.environ.get("PHOTO_STORAGE_S3_BUCKET")
+    PHOTO_STORAGE_S3_PREFIX = os.environ.get("PHOTO_STORAGE_S3_PREFIX", "photos/")
+    PHOTO_STORAGE_S3_ENDPOINT_URL = os.environ.get("PHOTO_STORAGE_S3_ENDPOINT_URL")
+    PHOTO_STORAGE_S3_REGION = os.environ.get("PHOTO_STORAGE_S3_REGION")
+    PHOTO_STORAGE_S3_PUBLIC_URL = os.environ.get("PHOTO_STORAGE_S3_PUBLIC_URL")
+    # Seconds an unreferenced photo is kept before the collector deletes it
+    PHOTO_BLOB_GC_GRACE = int(os.environ.get("PHOTO_BLOB_GC_GRACE", "3600"))
+    
+    # Photo serving (routes/media.py): let nginx (X-Accel-Redirect to this
+    # internal location) or Apache/lighttpd (X-Sendfile) send the files
+    MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX")
+    USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "false").lower() in ["true", "1", "yes"]
+    MEDIA_MAX_AGE = int(os.environ.get("MEDIA_MAX_AGE", "86400"))
+    
     # Celery config
     CELERY_BROKER_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
     CELERY_RESULT_BACKEND = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+    CELERY_ALWAYS_EAGER = False
+    # Periodic tasks (run with celery -A app.celery beat)
+    CELERYBEAT_SCHEDULE = {
+        "collect-orphaned-photo-blobs": {
+            "task": "tasks.storage.collect_orphaned_blobs",
+            "schedule": int(os.environ.get("PHOTO_BLOB_GC_INTERVAL", "3600")),
+        },
+        "expire-lapsed-subscriptions": {
+            "task": "tasks.subscriptions.expire_lapsed_subscriptions",
+            "schedule": int(os.environ.get("SUBSCRIPTION_EXPIRY_INTERVAL", "300")),
+        },
+        "renew-due-subscriptions": {
+            "task": "tasks.subscriptions.renew_due_subscriptions",
+            "schedule": int(os.environ.get("RENEWAL_INTERVAL", "3600")),
+        },
+        "rebuild-tag-filter": {
+            "task": "tasks.tags.rebuild_tag_filter",
+            "schedule": int(os.environ.get("TAG_FILTER_REBUILD_INTERVAL", "3600")),
+        },
+        "requeue-waiting-admin-jobs": {
+            "task": "tasks.admin_jobs.requeue_waiting_admin_jobs",
+            "schedule": int(os.environ.get("ADMIN_JOB_REQUEUE_INTERVAL", "300")),
+        },
+        "release-expired-tag-reservations": {
+            "task": "tasks.tags.release_expired_reservations",
+            "schedule": int(os.environ.get("TAG_RESERVATION_SWEEP_INTERVAL", "600")),
+        },
+    }
+    
+    # Subscription expiry sweeper (services/subscriptions.py)
+    SUBSCRIPTION_EXPIRY_BATCH_SIZE = int(os.environ.get("SUBSCRIPTION_EXPIRY_BATCH_SIZE", "500"))
+    SUBSCRIPTION_EXPIRY_EMAILS = os.environ.get("SUBSCRIPTION_EXPIRY_EMAILS", "true").lower() in ["true", "1", "yes"]
+    
+    # Auto-renewal engine (services/renewals.py): subscriptions ending within
+    # RENEWAL_LEAD_TIME seconds are charged, RENEWAL_CONCURRENCY at a time
+    RENEWAL_LEAD_TIME = int(os.environ.get("RENEWAL_LEAD_TIME", "86400"))
+    RENEWAL_BATCH_SIZE = int(os.environ.get("RENEWAL_BATCH_SIZE", "200"))
+    RENEWAL_CONCURRENCY = int(os.environ.get("RENEWAL_CONCURRENCY", "8"))
+    
+    # Checkout sessions (services/checkout.py): seconds a payment intent is
+    # reused for the same purchase (keep below Stripe's 24h idempotency window)
+    CHECKOUT_SESSION_TTL = int(os.environ.get("CHECKOUT_SESSION_TTL", "43200"))
+    
+    # Milliseconds between progress polls on admin job pages (services/admin_jobs.py)
+    ADMIN_JOB_POLL_INTERVAL = int(os.environ.get("ADMIN_JOB_POLL_INTERVAL", "1500"))
+    # Seconds a job waits in "queued" before the beat schedule queues it again
+    ADMIN_JOB_REQUEUE_AFTER = int(os.environ.get("ADMIN_JOB_REQUEUE_AFTER", "300"))
+    
+    # Payments per page of the admin payments list
+    ADMIN_PAYMENTS_PAGE_SIZE = int(os.environ.get("ADMIN_PAYMENTS_PAGE_SIZE", "50"))
+    
+    # Partner subscriptions per page of the admin review queue
+    ADMIN_REVIEW_PAGE_SIZE = int(os.environ.get("ADMIN_REVIEW_PAGE_SIZE", "50"))
+    
+    # Rows fetched per chunk by streaming CSV/NDJSON exports (services/exports.py)
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "1000"))
+    
+    # Metrics config (queues whose depth is reported on /metrics)
+    METRICS_CELERY_QUEUES = os.environ.get("METRICS_CELERY_QUEUES", "celery").split(",")
+    
+    # Health check config (probes run in the background, /readyz reads results)
+    HEALTH_PROBE_INTERVAL = int(os.environ.get("HEALTH_PROBE_INTERVAL", "10"))
+    HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", "2"))
+    HEALTH_CRITICAL_PROBES = os.environ.get("HEALTH_CRITICAL_PROBES", "database,broker").split(",")
+    
+    # Seconds before read-mostly snapshots (settings, homepage pricing) are reloaded
+    SNAPSHOT_TTL = int(os.environ.get("SNAPSHOT_TTL", "60"))
+    
+    # Application cache (in-process unless CACHE_REDIS_URL is set). Fragment and
+    # page cache invalidation only reaches every worker through Redis; with the
+    # in-process cache, other workers can serve stale fragments and pages for
+    # up to SNAPSHOT_TTL seconds. Set CACHE_REDIS_URL when running several workers.
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get("CACHE_DEFAULT_TIMEOUT", "300"))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "2048"))
+    FRAGMENT_CACHE_TIMEOUT = int(os.environ.get("FRAGMENT_CACHE_TIMEOUT", "3600"))
+    
+    # Anonymous page cache lifetimes in seconds (pages are also invalidated on
+    # change); capped at SNAPSHOT_TTL without CACHE_REDIS_URL
+    PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE_ENABLED", "true").lower() in ["true", "1", "yes"]
+    PAGE_CACHE_TTL = int(os.environ.get("PAGE_CACHE_TTL", "300"))
+    PAGE_CACHE_TTL_HOME = int(os.environ.get("PAGE_CACHE_TTL_HOME", "60"))
+    PAGE_CACHE_TTL_FOUND = int(os.environ.get("PAGE_CACHE_TTL_FOUND", "300"))
+    
+    # Bloom filter rejecting unknown tag IDs without a query (services/tag_filter.py)
+    TAG_FILTER_ENABLED = os.environ.get("TAG_FILTER_ENABLED", "true").lower() in ["true", "1", "yes"]
+    TAG_FILTER_ERROR_RATE = float(os.environ.get("TAG_FILTER_ERROR_RATE", "0.01"))
+    TAG_FILTER_MIN_CAPACITY = int(os.environ.get("TAG_FILTER_MIN_CAPACITY", "10000"))
+    # Seconds between checks for tags created by other processes
+    TAG_FILTER_SYNC_INTERVAL = int(os.environ.get("TAG_FILTER_SYNC_INTERVAL", "5"))
+    TAG_FILTER_REBUILD_INTERVAL = int(os.environ.get("TAG_FILTER_REBUILD_INTERVAL", "3600"))
+    
+    # Seconds a tag is held for a buyer during checkout (services/tag_claims.py)
+    TAG_RESERVATION_TTL = int(os.environ.get("TAG_RESERVATION_TTL", "900"))
+    
+    # Token-bucket rate limits of public endpoints (services/rate_limit.py);
+    # buckets are per process unless RATE_LIMIT_REDIS_URL is set
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ["true", "1", "yes"]
+    RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", os.environ.get("CACHE_REDIS_URL"))
+    # Number of reverse proxies in front of the app that append to X-Forwarded-For
+    RATE_LIMIT_PROXY_COUNT = int(os.environ.get("RATE_LIMIT_PROXY_COUNT", "0"))
+    RATE_LIMITS = {
+        "tag.found_pet": {"ip": "60/minute", "tag": "120/minute"},
+        "public.found_redirect": {"ip": "60/minute"},
+        "api.found": {"ip": "120/minute", "tag": "120/minute"},
+        "tag.contact_owner": {"ip": "30/minute"},
+        "tag.contact_owner:POST": {"ip": "5/hour", "tag": "20/day"},
+    }
+    
+    # Response compression for HTML/JSON (brotli when installed, else gzip)
+    COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "true").lower() in ["true", "1", "yes"]
+    COMPRESS_MIMETYPES = ["text/html", "application/json"]
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "500"))
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
+    COMPRESS_BR_LEVEL = int(os.environ.get("COMPRESS_BR_LEVEL", "4"))
+    
+    # Compiled template cache, filled at build time (empty disables it)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get(
+        "JINJA_BYTECODE_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jinja_cache"),
+    )
     
     # Payment gateway config (fallback to environment variables)
     STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
     STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
+    STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+    
+    # Stripe client: API base (e.g. benchmarks/fake_stripe.py), timeouts in
+    # seconds, retries with jittered backoff and the circuit breaker
+    STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE")
+    STRIPE_CONNECT_TIMEOUT = float(os.environ.get("STRIPE_CONNECT_TIMEOUT", "3.05"))
+    STRIPE_READ_TIMEOUT = float(os.environ.get("STRIPE_READ_TIMEOUT", "20"))
+    STRIPE_MAX_RETRIES = int(os.environ.get("STRIPE_MAX_RETRIES", "2"))
+    STRIPE_RETRY_BACKOFF = float(os.environ.get("STRIPE_RETRY_BACKOFF", "0.25"))
+    STRIPE_RETRY_BACKOFF_MAX = float(os.environ.get("STRIPE_RETRY_BACKOFF_MAX", "2"))
+    STRIPE_BREAKER_THRESHOLD = int(os.environ.get("STRIPE_BREAKER_THRESHOLD", "5"))
+    STRIPE_BREAKER_RESET = float(os.environ.get("STRIPE_BREAKER_RESET", "30"))
     
     PAYPAL_MODE = os.environ.get("PAYPAL_MODE", "sandbox")
     PAYPAL_CLIENT_ID = os.environ.get("PAYPAL_CLIENT_ID")
@@ -58,6 +207,10 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    HEALTH_CRITICAL_PROBES = ["database"]
+    JINJA_BYTECODE_CACHE_DIR = None
+    CELERY_ALWAYS_EAGER = True
+    RATE_LIMIT_REDIS_URL = None
 
 
 # Configuration mapping
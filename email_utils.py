@@ -13,27 +13,29 @@ from extensions import logger
 def get_smtp_config():
     """Get SMTP configuration from database settings"""
     try:
-        from models.models import SystemSetting
+        from services.snapshots import settings_snapshot
         
         smtp_settings = {}
-        settings = SystemSetting.query.filter(
-            SystemSetting.key.in_([
-                'smtp_server', 'smtp_port', 'smtp_username', 'smtp_password',
-                'smtp_use_tls', 'smtp_use_ssl', 'smtp_from_email', 'smtp_from_name'
-            ])
-        ).all()
-        
-        for setting in settings:
-            if setting.key in ['smtp_use_tls', 'smtp_use_ssl']:
+        settings = settings_snapshot.get()
+        smtp_keys = [
+            'smtp_server', 'smtp_port', 'smtp_username', 'smtp_password',
+            'smtp_use_tls', 'smtp_use_ssl', 'smtp_from_email', 'smtp_from_name'
+        ]
+        
+        for key in smtp_keys:
+            if key not in settings:
+                continue
+            value = settings[key]
+            if key in ['smtp_use_tls', 'smtp_use_ssl']:
                 # Handle both boolean and string values
-                if isinstance(setting.value, bool):
-                    smtp_settings[setting.key] = setting.value
+                if isinstance(value, bool):
+                    smtp_settings[key] = value
                 else:
-                    smtp_settings[setting.key] = str(setting.value).lower() == 'true'
-            elif setting.key == 'smtp_port':
-                smtp_settings[setting.key] = int(setting.value) if setting.value else 587
+                    smtp_settings[key] = str(value).lower() == 'true'
+            elif key == 'smtp_port':
+                smtp_settings[key] = int(value) if value else 587
             else:
-                smtp_settings[setting.key] = setting.value
+                smtp_settings[key] = value
         
         return smtp_settings
     except Exception as e:
@@ -86,7 +88,8 @@ def send_email(to_email, subject, html_body, text_body=None, from_email=None, fr
             logger.warning(f"Could not attach logo: {e}")
         
         # Send email
-        with smtplib.SMTP(smtp_config['smtp_server'], smtp_config.get('smtp_port', 587)) as server:
+        from services.metrics import time_email
+        with time_email(), smtplib.SMTP(smtp_config['smtp_server'], smtp_config.get('smtp_port', 587)) as server:
             if smtp_config.get('smtp_use_tls', True):
                 server.starttls()
             
@@ -924,6 +927,73 @@ def send_subscription_renewal_email(user, subscription):
         return False
 
 
+def send_subscription_expired_email(user, subscription):
+    """Send email to customer when a subscription has expired"""
+    try:
+        subject = "Subscription Expired - LTFPQRR"
+        
+        plan_name = subscription.pricing_plan.name if subscription.pricing_plan else "Subscription Plan"
+        expired_on = subscription.end_date.strftime('%B %d, %Y') if subscription.end_date else 'Today'
+        
+        content = f"""
+        <div class="greeting">Hello {user.get_full_name()},</div>
+        
+        <div class="title">Subscription Expired</div>
+        
+        <div class="subtitle">Your subscription has reached the end of its period.</div>
+        
+        <div class="error-box">
+            <div class="box-title">Expired Subscription</div>
+            <table class="details-table">
+                <tr>
+                    <td>Plan:</td>
+                    <td><strong>{plan_name}</strong></td>
+                </tr>
+                <tr>
+                    <td>Expired:</td>
+                    <td>{expired_on}</td>
+                </tr>
+            </table>
+        </div>
+        
+        <div class="info-box">
+            <div class="box-title">Keep Your Pets Protected</div>
+            <p>Renew your subscription from your dashboard to keep your tags active.</p>
+        </div>
+        
+        <a href="{current_app.config.get('BASE_URL', 'http://localhost:5000')}/dashboard" class="cta-button">Renew Subscription</a>
+        
+        <p>Best regards,<br>The LTFPQRR Team</p>
+        """
+        
+        template = get_email_template_base()
+        html_body = template.format(content=content)
+        
+        text_body = f"""
+        Hello {user.get_full_name()},
+        
+        Your subscription has expired.
+        
+        Expired Subscription:
+        - Plan: {plan_name}
+        - Expired: {expired_on}
+        
+        Renew your subscription from your dashboard to keep your tags active.
+        
+        Best regards,
+        The LTFPQRR Team
+        """
+        
+        success = send_email(user.email, subject, html_body, text_body)
+        if success:
+            logger.info(f"Subscription expired email sent to {user.email}")
+        return success
+        
+    except Exception as e:
+        logger.error(f"Error sending subscription expired email: {e}")
+        return False
+
+
 def send_test_email(to_email, test_type="basic"):
     """Send a test email to verify SMTP configuration"""
     try:
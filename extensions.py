@@ -3,17 +3,14 @@ Flask extensions initialization.
 """
 import os
 import logging
+import importlib.util
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from cryptography.fernet import Fernet
 
-# Optional imports with fallbacks
-try:
-    from celery import Celery
-    HAS_CELERY = True
-except ImportError:
-    HAS_CELERY = False
-    Celery = None
+# Optional imports with fallbacks. Celery is only imported when a Celery app
+# is actually created, so web workers and CLI scripts don't pay for it.
+HAS_CELERY = importlib.util.find_spec("celery") is not None
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -38,10 +35,14 @@ def init_login_manager(app):
 
 def make_celery(app):
     """Create Celery instance."""
+    from celery import Celery
+    from tasks import TASK_MODULES
+
     celery = Celery(
         app.import_name,
         backend=app.config.get("CELERY_RESULT_BACKEND"),
         broker=app.config.get("CELERY_BROKER_URL"),
+        include=TASK_MODULES,
     )
     celery.conf.update(app.config)
 
@@ -54,6 +55,37 @@ def make_celery(app):
     return celery
 
 
+def get_celery(app):
+    """Return the Celery instance of app, creating it on first use."""
+    celery = app.extensions.get("ltfpqrr_celery")
+    if celery is None:
+        celery = app.extensions["ltfpqrr_celery"] = make_celery(app)
+    return celery
+
+
+def enqueue(task, *args, inline=None):
+    """Queue a Celery task (a @shared_task of tasks/) with args.
+
+    When it can't be queued (no Celery, or the broker is down), inline(*args)
+    runs in this process instead, if given. Returns True if the task was
+    queued.
+    """
+    if HAS_CELERY:
+        from flask import current_app
+
+        try:
+            celery = get_celery(current_app._get_current_object())
+            celery.tasks[task.name].delay(*args)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not queue {task.name}{', running inline' if inline else ''}: {e}")
+    else:
+        logger.warning(f"Celery is not installed, cannot queue {task.name}")
+    if inline is not None:
+        inline(*args)
+    return False
+
+
 def get_cipher_suite(app):
     """Get encryption cipher suite."""
     encryption_key_str = os.environ.get("ENCRYPTION_KEY")
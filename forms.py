@@ -21,6 +21,15 @@ def get_payment_gateway_choices():
         # Fallback to default choices
         return [('stripe', 'Credit Card (Stripe)'), ('paypal', 'PayPal')]
 
+# Helper function to price subscription type choices from the pricing catalog
+def set_plan_choices(field, plan_type):
+    """Use the catalog's plans and prices for a subscription type select."""
+    from services.pricing import get_pricing_catalog
+    choices = get_pricing_catalog().choices(plan_type)
+    # Keep the default choices while no plans are configured
+    if choices:
+        field.choices = choices
+
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=80)])
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -61,6 +70,10 @@ class ClaimTagForm(FlaskForm):
                                           ('lifetime', 'Lifetime ($199.99)')], 
                                   validators=[DataRequired()])
     
+    def __init__(self, *args, **kwargs):
+        super(ClaimTagForm, self).__init__(*args, **kwargs)
+        set_plan_choices(self.subscription_type, "tag")
+    
     def validate_tag_id(self, field):
         from sqlalchemy import func
         tag = Tag.query.filter(func.upper(Tag.tag_id) == func.upper(field.data)).first()
@@ -167,6 +180,7 @@ class PartnerSubscriptionForm(FlaskForm):
     
     def __init__(self, *args, **kwargs):
         super(PartnerSubscriptionForm, self).__init__(*args, **kwargs)
+        set_plan_choices(self.subscription_type, "partner")
         self.payment_method.choices = get_payment_gateway_choices()
 
 class PricingPlanForm(FlaskForm):
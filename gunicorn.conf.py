@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for LTFPQRR.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+
+By default the app is preloaded: the master creates and warms it (templates,
+settings and pricing snapshots, URL map) once, then forks the workers, which
+start without importing anything and share the warm pages copy-on-write.
+Set GUNICORN_PRELOAD=false to have every worker load and warm its own copy.
+"""
+import os
+import shutil
+
+wsgi_app = "app:create_app()"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ["true", "1", "yes"]
+accesslog = "-"
+
+# Prometheus multiprocess mode: every worker writes its metric values to this
+# directory and /metrics aggregates them. It must be set before any worker
+# imports prometheus_client.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/ltfpqrr-metrics")
+
+# Imported here rather than in child_exit: that hook runs in the SIGCHLD
+# handler, where a second signal can interrupt a half-finished import.
+try:
+    from prometheus_client import multiprocess
+except ImportError:
+    multiprocess = None
+
+
+def on_starting(server):
+    """Start every master process with an empty metrics directory."""
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    """Warm the preloaded app in the master before the first fork."""
+    if server.cfg.preload_app:
+        from services.warmup import prepare_for_fork
+        prepare_for_fork(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    """Drop state inherited from the master that a worker must not share."""
+    if server.cfg.preload_app:
+        from services.warmup import after_fork
+        after_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a worker that has exited."""
+    if multiprocess is not None:
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """Warm caches before the worker reports ready on /readyz."""
+    if not worker.cfg.preload_app:
+        from services.warmup import warm_up
+        warm_up(worker.wsgi)
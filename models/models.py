@@ -10,17 +10,17 @@ from extensions import db
 
 # Import all models from their respective modules
 from models.user.user import User, Role, user_roles
-from models.pet.pet import Pet, Tag, SearchLog
-from models.payment.payment import Subscription, PaymentGateway, PricingPlan, Payment
-from models.system.system import NotificationPreference, SystemSetting
+from models.pet.pet import Pet, PhotoBlob, Tag, SearchLog
+from models.payment.payment import Subscription, PaymentGateway, PricingPlan, Payment, CheckoutSession, RevenueLedger
+from models.system.system import NotificationPreference, SystemSetting, AdminJob, AdminJobItem
 from models.partner.partner import Partner, PartnerAccessRequest, PartnerSubscription
 
 # Export all models for backward compatibility
 __all__ = [
     'db',
     'User', 'Role', 'user_roles',
-    'Pet', 'Tag', 'SearchLog',
-    'Subscription', 'PaymentGateway', 'PricingPlan', 'Payment',
-    'NotificationPreference', 'SystemSetting',
+    'Pet', 'PhotoBlob', 'Tag', 'SearchLog',
+    'Subscription', 'PaymentGateway', 'PricingPlan', 'Payment', 'CheckoutSession', 'RevenueLedger',
+    'NotificationPreference', 'SystemSetting', 'AdminJob', 'AdminJobItem',
     'Partner', 'PartnerAccessRequest', 'PartnerSubscription'
 ]
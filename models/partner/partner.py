@@ -127,6 +127,9 @@ class Partner(db.Model):
                 )
             )
             db.session.commit()
+            
+            from services.fragment_cache import bump_user_version
+            bump_user_version(user.id)
     
     def remove_user(self, user):
         """Remove a user from this partner"""
@@ -138,6 +141,9 @@ class Partner(db.Model):
                 )
             )
             db.session.commit()
+            
+            from services.fragment_cache import bump_user_version
+            bump_user_version(user.id)
     
     def __repr__(self):
         return f'<Partner {self.company_name}>'
@@ -190,6 +196,10 @@ class PartnerAccessRequest(db.Model):
 
 class PartnerSubscription(db.Model):
     """Partner-specific subscription model"""
+    __table_args__ = (
+        db.Index('ix_partner_subscription_status_end_date', 'status', 'end_date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     partner_id = db.Column(db.Integer, db.ForeignKey('partner.id'), nullable=False)
     pricing_plan_id = db.Column(db.Integer, db.ForeignKey('pricing_plans.id'))
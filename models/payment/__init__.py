@@ -1,4 +1,4 @@
 # Payment models module
-from .payment import Subscription, PaymentGateway, PricingPlan, Payment
+from .payment import Subscription, PaymentGateway, PricingPlan, Payment, CheckoutSession, RevenueLedger
 
-__all__ = ['Subscription', 'PaymentGateway', 'PricingPlan', 'Payment']
+__all__ = ['Subscription', 'PaymentGateway', 'PricingPlan', 'Payment', 'CheckoutSession', 'RevenueLedger']
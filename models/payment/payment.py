@@ -5,6 +5,11 @@ from models.base import db, datetime, timedelta, DECIMAL
 
 
 class Subscription(db.Model):
+    __table_args__ = (
+        # Expiry sweeper: active rows by end date (services/subscriptions.py)
+        db.Index('ix_subscription_status_end_date', 'status', 'end_date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'))  # For tag-specific subscriptions
@@ -26,6 +31,9 @@ class Subscription(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     auto_renew = db.Column(db.Boolean, default=False)  # Auto-renewal flag
     cancellation_requested = db.Column(db.Boolean, default=False)  # Cancellation requested by user
+    # Saved payment method charged by the renewal engine (services/renewals.py)
+    gateway_customer_id = db.Column(db.String(100))
+    gateway_payment_method_id = db.Column(db.String(100))
     
     # Relationships
     pricing_plan = db.relationship('PricingPlan', backref='subscriptions')
@@ -187,8 +195,10 @@ class Payment(db.Model):
     currency = db.Column(db.String(3), default='USD')
     status = db.Column(db.String(20), nullable=False)  # pending, completed, failed, refunded
     payment_type = db.Column(db.String(50), nullable=False)  # tag, partner, renewal
-    payment_metadata = db.Column(db.JSON)  # Store additional payment info
-    gateway_response = db.Column(db.JSON)  # Store full gateway response
+    pricing_plan_id = db.Column(db.Integer, db.ForeignKey('pricing_plans.id'))  # Plan paid for, for reporting
+    # Loaded on first access, so payment lists don't fetch the JSON blobs
+    payment_metadata = db.deferred(db.Column(db.JSON), group='blobs')  # Store additional payment info
+    gateway_response = db.deferred(db.Column(db.JSON), group='blobs')  # Store full gateway response
     processed_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -210,7 +220,68 @@ class Payment(db.Model):
     def mark_failed(self, reason=None):
         """Mark payment as failed"""
         self.status = 'failed'
-        if reason and self.payment_metadata:
-            self.payment_metadata['failure_reason'] = reason
-        elif reason:
-            self.payment_metadata = {'failure_reason': reason}
+        if reason:
+            self.payment_metadata = {**(self.payment_metadata or {}), 'failure_reason': reason}
+
+
+class CheckoutSession(db.Model):
+    """A checkout in progress, tied to one reusable gateway payment intent.
+
+    See services/checkout.py: the same user buying the same thing for the same
+    amount gets the same intent back until it is paid or the session expires.
+    """
+    __tablename__ = 'checkout_sessions'
+    __table_args__ = (
+        db.Index('ix_checkout_sessions_user_key', 'user_id', 'checkout_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    checkout_key = db.Column(db.String(64), nullable=False)  # Digest of what is being bought
+    payment_type = db.Column(db.String(50), nullable=False)  # tag, partner
+    subject = db.Column(db.String(100))  # Claimed tag ID or partner ID
+    subscription_type = db.Column(db.String(20))  # monthly, yearly, lifetime
+    pricing_plan_id = db.Column(db.Integer, db.ForeignKey('pricing_plans.id'))  # Plan being bought
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    currency = db.Column(db.String(3), default='USD')
+    payment_gateway = db.Column(db.String(50), nullable=False, default='stripe')
+    payment_intent_id = db.Column(db.String(200), unique=True)
+    client_secret = db.Column(db.String(255))
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, completed
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def is_reusable(self, now=None):
+        """Whether the intent can still be handed to the browser."""
+        return self.status == 'open' and self.expires_at > (now or datetime.utcnow())
+    
+    def __repr__(self):
+        return f'<CheckoutSession {self.payment_type} {self.payment_intent_id} - {self.status}>'
+
+
+class RevenueLedger(db.Model):
+    """Daily payment totals by gateway, payment type, plan, currency and status.
+
+    Kept in step with the payments table by services/revenue.py, so reports
+    read a few rows per day instead of scanning payments.
+    """
+    __tablename__ = 'revenue_ledger'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'payment_gateway', 'payment_type', 'pricing_plan_id', 'currency', 'status',
+                            name='uq_revenue_ledger_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # Day the payment was created (UTC)
+    payment_gateway = db.Column(db.String(50), nullable=False)
+    payment_type = db.Column(db.String(50), nullable=False)
+    pricing_plan_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = no plan
+    currency = db.Column(db.String(3), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # completed, failed, refunded, pending
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RevenueLedger {self.day} {self.payment_gateway} {self.status} {self.amount}>'
@@ -1,4 +1,4 @@
 # Pet models module
-from .pet import Pet, Tag, SearchLog
+from .pet import Pet, PhotoBlob, Tag, SearchLog
 
-__all__ = ['Pet', 'Tag', 'SearchLog']
+__all__ = ['Pet', 'PhotoBlob', 'Tag', 'SearchLog']
@@ -10,6 +10,7 @@ class Pet(db.Model):
     breed = db.Column(db.String(100))
     color = db.Column(db.String(50))
     photo = db.Column(db.String(255))
+    photo_variants = db.Column(db.JSON)  # Resized WebP/JPEG files, see services/photos.py
     vet_name = db.Column(db.String(100))
     vet_phone = db.Column(db.String(20))
     vet_address = db.Column(db.Text)
@@ -24,6 +25,28 @@ class Pet(db.Model):
         return f'<Pet {self.name}>'
 
 
+class PhotoBlob(db.Model):
+    """A stored photo file, identified by the SHA-256 of its content.
+
+    ref_count is the number of pet photo fields pointing at the file; blobs
+    that drop to zero are deleted by the orphan collector (services/storage.py).
+    """
+    __tablename__ = 'photo_blob'
+    __table_args__ = (db.Index('ix_photo_blob_orphans', 'ref_count', 'updated_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    key = db.Column(db.String(255), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100))
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PhotoBlob {self.key} refs={self.ref_count}>'
+
+
 class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tag_id = db.Column(db.String(20), unique=True, nullable=False)
@@ -32,6 +55,9 @@ class Tag(db.Model):
     partner_id = db.Column(db.Integer, db.ForeignKey('partner.id'))  # Partner company that owns this tag
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Customer who claimed the tag
     pet_id = db.Column(db.Integer, db.ForeignKey('pet.id'))
+    # Checkout hold on an available tag (services/tag_claims.py)
+    reserved_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    reserved_until = db.Column(db.DateTime, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -1,4 +1,4 @@
 # System models module
-from .system import NotificationPreference, SystemSetting
+from .system import AdminJob, AdminJobItem, NotificationPreference, SystemSetting
 
-__all__ = ['NotificationPreference', 'SystemSetting']
+__all__ = ['AdminJob', 'AdminJobItem', 'NotificationPreference', 'SystemSetting']
@@ -26,17 +26,19 @@ class SystemSetting(db.Model):
     
     @classmethod
     def get_value(cls, key, default=None):
-        setting = cls.query.filter_by(key=key).first()
-        if setting:
+        from services.snapshots import settings_snapshot
+
+        value = settings_snapshot.get().get(key)
+        if value is not None:
             # Convert string representations to appropriate types
-            if setting.value.lower() == 'true':
+            if value.lower() == 'true':
                 return True
-            elif setting.value.lower() == 'false':
+            elif value.lower() == 'false':
                 return False
-            elif setting.value.isdigit():
-                return int(setting.value)
+            elif value.isdigit():
+                return int(value)
             else:
-                return setting.value
+                return value
         return default
     
     @classmethod
@@ -49,6 +51,66 @@ class SystemSetting(db.Model):
             setting = cls(key=key, value=str(value))
             db.session.add(setting)
         db.session.commit()
+
+        from services.snapshots import settings_snapshot
+        settings_snapshot.invalidate()
     
     def __repr__(self):
         return f'<SystemSetting {self.key}>'
+
+
+class AdminJob(db.Model):
+    """A money-moving admin operation on one or more subscriptions.
+
+    Run by services/admin_jobs.py in a Celery worker; the admin pages poll its
+    counters for progress.
+    """
+    __tablename__ = 'admin_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # refund, cancel, extend
+    params = db.Column(db.JSON)  # e.g. {'action': 'extend_month'} for extend
+    idempotency_key = db.Column(db.String(100), unique=True, nullable=False)  # One job per submitted form
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    creator = db.relationship('User', backref='admin_jobs')
+    items = db.relationship('AdminJobItem', backref='job', order_by='AdminJobItem.id', lazy='dynamic')
+    
+    @property
+    def done(self):
+        return self.succeeded + self.failed + self.skipped
+    
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    def __repr__(self):
+        return f'<AdminJob {self.kind} {self.id} - {self.status}>'
+
+
+class AdminJobItem(db.Model):
+    """One subscription of an AdminJob, processed at most once."""
+    __tablename__ = 'admin_job_items'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'subscription_id', name='uq_admin_job_items_job_subscription'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('admin_jobs.id'), nullable=False)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, succeeded, failed, skipped
+    message = db.Column(db.String(255))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    subscription = db.relationship('Subscription')
+    
+    def __repr__(self):
+        return f'<AdminJobItem {self.job_id}/{self.subscription_id} - {self.status}>'
@@ -4,11 +4,22 @@ Admin routes
 from datetime import datetime
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
-from utils import admin_required, super_admin_required, update_payment_gateway_settings, configure_payment_gateways
+from utils import admin_required, super_admin_required, update_payment_gateway_settings
 from forms import PaymentGatewayForm, PricingPlanForm
+from services.snapshots import settings_snapshot
+from services.pricing import pricing_catalog
+from services.page_cache import invalidate_pages
 
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Groupings of the revenue report: ?by= value -> column heading
+REVENUE_GROUPS = {
+    "day": "Day",
+    "payment_gateway": "Gateway",
+    "payment_type": "Payment Type",
+    "plan": "Plan",
+}
+
 
 @admin.route("/dashboard")
 @admin_required
@@ -32,21 +43,13 @@ def dashboard():
 def users():
     """Admin user management."""
     from models.models import User
-    from extensions import db
+    from services.exports import user_search
     
     search = request.args.get("search", "")
     query = User.query
 
     if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                User.username.ilike(search_filter),
-                User.email.ilike(search_filter),
-                User.first_name.ilike(search_filter),
-                User.last_name.ilike(search_filter),
-            )
-        )
+        query = query.filter(user_search(f"%{search}%"))
 
     users = query.order_by(User.created_at.desc()).all()
     return render_template("admin/users.html", users=users, search=search)
@@ -142,24 +145,13 @@ def delete_user(user_id):
 def subscriptions():
     """Admin subscription management."""
     from models.models import Subscription, User
-    from extensions import db
+    from services.exports import subscription_search
     
     search = request.args.get("search", "")
     query = Subscription.query
 
     if search:
-        search_filter = f"%{search}%"
-        query = query.join(User).filter(
-            db.or_(
-                User.username.ilike(search_filter),
-                User.email.ilike(search_filter),
-                User.first_name.ilike(search_filter),
-                User.last_name.ilike(search_filter),
-                Subscription.subscription_type.ilike(search_filter),
-                Subscription.status.ilike(search_filter),
-                Subscription.payment_method.ilike(search_filter),
-            )
-        )
+        query = query.join(User, Subscription.user_id == User.id).filter(subscription_search(f"%{search}%"))
 
     subscriptions = query.order_by(Subscription.created_at.desc()).all()
     return render_template(
@@ -167,98 +159,188 @@ def subscriptions():
     )
 
 
+@admin.route("/payments")
+@admin_required
+def payments():
+    """Recent payments, newest first, a page at a time."""
+    from models.models import Payment, User
+    from flask import current_app
+    from sqlalchemy.orm import contains_eager
+    from services.exports import payment_search
+    
+    search = request.args.get("search", "")
+    before = request.args.get("before", type=int)
+    page_size = current_app.config.get("ADMIN_PAYMENTS_PAGE_SIZE", 50)
+    # payment_metadata and gateway_response are deferred, so no JSON is loaded here
+    query = Payment.query.join(User, Payment.user_id == User.id).options(contains_eager(Payment.user))
+
+    if search:
+        query = query.filter(payment_search(f"%{search}%"))
+    if before:
+        query = query.filter(Payment.id < before)
+
+    # Keyset pagination: one extra row says whether there is an older page
+    page = query.order_by(Payment.id.desc()).limit(page_size + 1).all()
+    older = page[page_size - 1].id if len(page) > page_size else None
+    return render_template(
+        "admin/payments.html", payments=page[:page_size], search=search, older=older
+    )
+
+
+@admin.route("/revenue")
+@admin_required
+def revenue():
+    """Revenue by day, gateway, payment type or plan, from the revenue ledger."""
+    from services.revenue import parse_range, revenue_report
+    
+    start, end = parse_range(request.args.get("start"), request.args.get("end"))
+    by = request.args.get("by", "day")
+    if by not in REVENUE_GROUPS:
+        by = "day"
+    rows, totals = revenue_report(start, end, by)
+    return render_template(
+        "admin/revenue.html", rows=rows, totals=totals, start=start, end=end, by=by, groups=REVENUE_GROUPS
+    )
+
+
+@admin.route("/revenue.csv")
+@admin_required
+def revenue_csv():
+    """The revenue ledger rows of a date range as CSV."""
+    import csv
+    import io
+    from flask import Response
+    from services.revenue import LEDGER_DIMENSIONS, ledger_rows, parse_range
+    
+    start, end = parse_range(request.args.get("start"), request.args.get("end"))
+    columns = LEDGER_DIMENSIONS + ("payment_count", "amount")
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for row in ledger_rows(start, end):
+        writer.writerow([getattr(row, column) for column in columns])
+    
+    return Response(
+        output.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=revenue-{start}-{end}.csv"},
+    )
+
+
+@admin.route("/export/<dataset>.<fmt>")
+@admin_required
+def export(dataset, fmt):
+    """Stream users, tags, subscriptions, payments or scans as CSV or NDJSON.
+
+    Takes the list view's search, plus optional start and end dates.
+    """
+    from flask import abort
+    from services.exports import export_response, parse_day
+    
+    try:
+        return export_response(
+            dataset,
+            fmt,
+            f"{dataset}-{datetime.utcnow():%Y%m%d}",
+            search=request.args.get("search", ""),
+            partner_id=request.args.get("partner_id", type=int),
+            start=parse_day(request.args.get("start")),
+            end=parse_day(request.args.get("end")),
+        )
+    except KeyError:
+        # Unknown export or format, or a partner filter on an export without one
+        abort(404)
+
+
 @admin.route("/partner-subscriptions")
 @admin_required
 def partner_subscriptions():
     """Manage partner subscription requests."""
-    from models.models import Subscription
-    
-    pending_subs = (
-        Subscription.query.filter_by(subscription_type="partner", admin_approved=False)
-        .order_by(Subscription.created_at.desc())
-        .all()
+    from models.models import Partner, Subscription
+    from flask import current_app
+    from sqlalchemy.orm import joinedload
+    from services.admin_jobs import new_form_token
+    from services.approvals import awaiting_review
+    
+    per_page = current_app.config.get("ADMIN_REVIEW_PAGE_SIZE", 50)
+    # Everything the rows show is loaded with the page
+    options = (
+        joinedload(Subscription.partner).joinedload(Partner.owner),
+        joinedload(Subscription.pricing_plan),
+        joinedload(Subscription.approver),
     )
 
-    approved_subs = (
+    pending = (
+        Subscription.query.filter(*awaiting_review())
+        .options(*options)
+        .order_by(Subscription.created_at.desc(), Subscription.id.desc())
+        .paginate(page=request.args.get("pending_page", 1, type=int), per_page=per_page, error_out=False)
+    )
+
+    approved = (
         Subscription.query.filter_by(subscription_type="partner", admin_approved=True)
-        .order_by(Subscription.created_at.desc())
-        .all()
+        .options(*options)
+        .order_by(Subscription.created_at.desc(), Subscription.id.desc())
+        .paginate(page=request.args.get("approved_page", 1, type=int), per_page=per_page, error_out=False)
     )
 
     return render_template(
         "admin/partner_subscriptions.html",
-        pending_subscriptions=pending_subs,
-        approved_subscriptions=approved_subs,
+        pending=pending,
+        approved=approved,
+        pending_subscriptions=pending.items,
+        approved_subscriptions=approved.items,
+        job_token=new_form_token(),
     )
 
 
-@admin.route("/partner-subscriptions/approve/<int:subscription_id>", methods=["POST"])
-@admin_required
-def approve_partner_subscription(subscription_id):
-    """Approve a partner subscription."""
-    from models.models import Subscription
-    from extensions import db
-    
-    subscription = Subscription.query.get_or_404(subscription_id)
-
-    if subscription.subscription_type != "partner":
-        flash("Invalid subscription type.", "error")
-        return redirect(url_for("admin.partner_subscriptions"))
-
-    if subscription.admin_approved:
-        flash("Subscription is already approved.", "warning")
-        return redirect(url_for("admin.partner_subscriptions"))
+def _review_partner_subscriptions(action, subscription_ids):
+    """Approve or reject a batch from the review queue and go back to it."""
+    from services.approvals import approve_partner_subscriptions, reject_partner_subscriptions
 
+    review = approve_partner_subscriptions if action == "approve" else reject_partner_subscriptions
     try:
-        subscription.approve(current_user)
-        db.session.commit()
-        
-        # Send approval email to customer
-        try:
-            from email_utils import send_subscription_approved_email
-            from extensions import logger
-            send_subscription_approved_email(subscription.user, subscription)
-        except Exception as email_error:
-            from extensions import logger
-            logger.error(f"Error sending approval email: {email_error}")
-            # Don't fail the approval if email fails
-        
-        flash(
-            f"Partner subscription for {subscription.partner.company_name} has been approved.",
-            "success",
-        )
+        done = review(subscription_ids, current_user)
     except Exception as e:
+        from extensions import db
         db.session.rollback()
-        flash(f"Error approving subscription: {str(e)}", "error")
+        flash(f"Error updating subscriptions: {str(e)}", "error")
+    else:
+        skipped = len(set(subscription_ids)) - len(done)
+        if done:
+            flash(f"{len(done)} partner subscription(s) {action}d.", "success")
+        if skipped:
+            flash(f"{skipped} subscription(s) were not awaiting review and were left unchanged.", "warning")
 
-    return redirect(url_for("admin.partner_subscriptions"))
+    return redirect(url_for("admin.partner_subscriptions", pending_page=request.form.get("pending_page", type=int)))
 
 
-@admin.route("/partner-subscriptions/reject/<int:subscription_id>", methods=["POST"])
+@admin.route("/partner-subscriptions/approve", methods=["POST"])
 @admin_required
-def reject_partner_subscription(subscription_id):
-    """Reject a partner subscription."""
-    from models.models import Subscription
-    from extensions import db
-    
-    subscription = Subscription.query.get_or_404(subscription_id)
+def approve_partner_subscriptions():
+    """Approve the selected partner subscriptions."""
+    return _review_partner_subscriptions("approve", request.form.getlist("subscription_ids", type=int))
 
-    if subscription.subscription_type != "partner":
-        flash("Invalid subscription type.", "error")
-        return redirect(url_for("admin.partner_subscriptions"))
 
-    try:
-        subscription.status = "cancelled"
-        db.session.commit()
-        flash(
-            f"Partner subscription for {subscription.partner.company_name} has been rejected.",
-            "success",
-        )
-    except Exception as e:
-        db.session.rollback()
-        flash(f"Error rejecting subscription: {str(e)}", "error")
+@admin.route("/partner-subscriptions/reject", methods=["POST"])
+@admin_required
+def reject_partner_subscriptions():
+    """Reject the selected partner subscriptions."""
+    return _review_partner_subscriptions("reject", request.form.getlist("subscription_ids", type=int))
+
+
+@admin.route("/partner-subscriptions/approve/<int:subscription_id>", methods=["POST"])
+@admin_required
+def approve_partner_subscription(subscription_id):
+    """Approve a partner subscription."""
+    return _review_partner_subscriptions("approve", [subscription_id])
 
-    return redirect(url_for("admin.partner_subscriptions"))
+
+@admin.route("/partner-subscriptions/reject/<int:subscription_id>", methods=["POST"])
+@admin_required
+def reject_partner_subscription(subscription_id):
+    """Reject a partner subscription."""
+    return _review_partner_subscriptions("reject", [subscription_id])
 
 
 @admin.route("/payment-gateways")
@@ -319,12 +401,12 @@ def tags():
     """Admin tag management page."""
     from models.models import Tag, User
     from extensions import db
+    from services.exports import tag_search
     
     search = request.args.get("search", "")
     query = Tag.query
 
     if search:
-        search_filter = f"%{search}%"
         # Create aliases for the User table to handle creator and owner joins
         creator = db.aliased(User)
         owner = db.aliased(User)
@@ -332,16 +414,7 @@ def tags():
         query = (
             query.outerjoin(creator, Tag.created_by == creator.id)
             .outerjoin(owner, Tag.owner_id == owner.id)
-            .filter(
-                db.or_(
-                    Tag.tag_id.ilike(search_filter),
-                    Tag.status.ilike(search_filter),
-                    creator.username.ilike(search_filter),
-                    creator.email.ilike(search_filter),
-                    owner.username.ilike(search_filter),
-                    owner.email.ilike(search_filter),
-                )
-            )
+            .filter(tag_search(f"%{search}%", creator, owner))
         )
 
     tags = query.order_by(Tag.created_at.desc()).all()
@@ -490,6 +563,8 @@ def create_pricing_plan():
 
             db.session.add(plan)
             db.session.commit()
+            pricing_catalog.invalidate()
+            invalidate_pages("pricing")
 
             flash("Pricing plan created successfully!", "success")
             return redirect(url_for("admin.pricing"))
@@ -539,6 +614,8 @@ def edit_pricing_plan(plan_id):
             plan.set_features_list(features_list)
 
             db.session.commit()
+            pricing_catalog.invalidate()
+            invalidate_pages("pricing")
 
             flash("Pricing plan updated successfully!", "success")
             return redirect(url_for("admin.pricing"))
@@ -561,6 +638,8 @@ def delete_pricing_plan(plan_id):
     try:
         db.session.delete(plan)
         db.session.commit()
+        pricing_catalog.invalidate()
+        invalidate_pages("pricing")
         flash("Pricing plan deleted successfully!", "success")
     except Exception as e:
         db.session.rollback()
@@ -581,6 +660,8 @@ def toggle_pricing_homepage(plan_id):
     try:
         plan.show_on_homepage = not plan.show_on_homepage
         db.session.commit()
+        pricing_catalog.invalidate()
+        invalidate_pages("pricing")
 
         status = "shown on" if plan.show_on_homepage else "hidden from"
         flash(f'Pricing plan "{plan.name}" is now {status} homepage.', "success")
@@ -662,6 +743,7 @@ def settings():
                 pass
         
         db.session.commit()
+        settings_snapshot.invalidate()
         flash("Settings updated successfully!", "success")
         return redirect(url_for("admin.settings"))
     
@@ -692,6 +774,7 @@ def add_setting():
     setting = SystemSetting(key=key, value=value, description=description)
     db.session.add(setting)
     db.session.commit()
+    settings_snapshot.invalidate()
 
     flash("Setting added successfully!", "success")
     return redirect(url_for("admin.settings"))
@@ -791,12 +874,26 @@ def partners():
     return render_template("admin/partners.html", partners=partners, search=search)
 
 
+def _start_subscription_job(kind, subscription_ids, params=None):
+    """Queue an admin job from a submitted form and show its progress page."""
+    from services.admin_jobs import start_job
+
+    try:
+        job = start_job(kind, subscription_ids, current_user.id, params=params,
+                        form_token=request.form.get("job_token"))
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("admin.partner_subscriptions"))
+
+    flash(f"{kind.title()} of {job.total} subscription(s) queued.", "info")
+    return redirect(url_for("admin.job", job_id=job.id))
+
+
 @admin.route("/partner-subscriptions/cancel/<int:subscription_id>", methods=["POST"])
 @admin_required
 def cancel_partner_subscription(subscription_id):
     """Cancel a partner subscription."""
     from models.models import Subscription
-    from extensions import db
     
     subscription = Subscription.query.get_or_404(subscription_id)
 
@@ -804,28 +901,14 @@ def cancel_partner_subscription(subscription_id):
         flash("Invalid subscription type.", "error")
         return redirect(url_for("admin.partner_subscriptions"))
 
-    try:
-        subscription.status = "cancelled"
-        subscription.end_date = datetime.utcnow()
-        db.session.commit()
-        flash(
-            f"Partner subscription for {subscription.partner.company_name} has been cancelled.",
-            "success",
-        )
-    except Exception as e:
-        db.session.rollback()
-        flash(f"Error cancelling subscription: {str(e)}", "error")
-
-    return redirect(url_for("admin.partner_subscriptions"))
+    return _start_subscription_job("cancel", [subscription.id])
 
 
 @admin.route("/partner-subscriptions/refund/<int:subscription_id>", methods=["POST"])
 @admin_required
 def refund_partner_subscription(subscription_id):
-    """Process a refund for a partner subscription."""
-    from models.models import Subscription, Payment
-    from extensions import db, logger
-    import stripe
+    """Refund a partner subscription through Stripe and cancel it, in the background."""
+    from models.models import Subscription
     
     subscription = Subscription.query.get_or_404(subscription_id)
 
@@ -833,80 +916,7 @@ def refund_partner_subscription(subscription_id):
         flash("Invalid subscription type.", "error")
         return redirect(url_for("admin.partner_subscriptions"))
 
-    try:
-        # Configure payment gateways to ensure Stripe is properly set up
-        configure_payment_gateways()
-        
-        # Find associated payment record using the subscription link
-        payment = Payment.query.filter_by(subscription_id=subscription.id).first()
-        
-        stripe_refund_successful = False
-        
-        if payment and payment.payment_intent_id:
-            try:
-                # Process Stripe refund
-                refund = stripe.Refund.create(
-                    payment_intent=payment.payment_intent_id,
-                    reason='requested_by_customer'
-                )
-                
-                if refund.status == 'succeeded':
-                    stripe_refund_successful = True
-                    logger.info(f"Stripe refund successful for payment {payment.payment_intent_id}: {refund.id}")
-                    
-                    # Mark payment as refunded with Stripe refund ID
-                    payment.status = "refunded"
-                    payment.updated_at = datetime.utcnow()
-                    if not payment.payment_metadata:
-                        payment.payment_metadata = {}
-                    payment.payment_metadata['stripe_refund_id'] = refund.id
-                    payment.payment_metadata['refund_date'] = datetime.utcnow().isoformat()
-                    
-                else:
-                    logger.error(f"Stripe refund failed for payment {payment.payment_intent_id}: {refund.status}")
-                    
-            except stripe.error.StripeError as stripe_error:
-                logger.error(f"Stripe refund error for payment {payment.payment_intent_id}: {str(stripe_error)}")
-                flash(f"Stripe refund failed: {str(stripe_error)}", "error")
-                return redirect(url_for("admin.partner_subscriptions"))
-            except Exception as e:
-                logger.error(f"Unexpected error during Stripe refund: {str(e)}")
-                flash(f"Refund processing error: {str(e)}", "error")
-                return redirect(url_for("admin.partner_subscriptions"))
-        else:
-            logger.warning(f"No payment record found for subscription {subscription_id} or missing payment_intent_id")
-        
-        # Cancel the subscription regardless of Stripe refund status
-        subscription.status = "refunded"
-        subscription.end_date = datetime.utcnow()
-        
-        db.session.commit()
-        
-        # Send cancellation email to customer
-        try:
-            from email_utils import send_subscription_cancelled_email
-            from extensions import logger
-            send_subscription_cancelled_email(subscription.user, subscription, refunded=stripe_refund_successful)
-        except Exception as email_error:
-            logger.error(f"Error sending cancellation email: {email_error}")
-            # Don't fail the refund if email fails
-        
-        if stripe_refund_successful:
-            flash(
-                f"Partner subscription for {subscription.partner.company_name} has been successfully refunded through Stripe and cancelled.",
-                "success",
-            )
-        else:
-            flash(
-                f"Partner subscription for {subscription.partner.company_name} has been cancelled. No Stripe payment found to refund.",
-                "warning",
-            )
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Error processing refund for subscription {subscription_id}: {str(e)}")
-        flash(f"Error processing refund: {str(e)}", "error")
-
-    return redirect(url_for("admin.partner_subscriptions"))
+    return _start_subscription_job("refund", [subscription.id])
 
 
 @admin.route("/partner-subscriptions/extend/<int:subscription_id>", methods=["GET", "POST"])
@@ -914,8 +924,7 @@ def refund_partner_subscription(subscription_id):
 def extend_partner_subscription(subscription_id):
     """Extend or modify the expiration date of a partner subscription."""
     from models.models import Subscription
-    from extensions import db
-    from datetime import datetime, timedelta
+    from services.admin_jobs import new_form_token
     
     subscription = Subscription.query.get_or_404(subscription_id)
 
@@ -924,39 +933,88 @@ def extend_partner_subscription(subscription_id):
         return redirect(url_for("admin.partner_subscriptions"))
     
     if request.method == "POST":
-        try:
-            action = request.form.get("action")
-            
-            if action == "extend_month":
-                if subscription.end_date:
-                    subscription.end_date += timedelta(days=30)
-                else:
-                    subscription.end_date = datetime.utcnow() + timedelta(days=30)
-            elif action == "extend_year":
-                if subscription.end_date:
-                    subscription.end_date += timedelta(days=365)
-                else:
-                    subscription.end_date = datetime.utcnow() + timedelta(days=365)
-            elif action == "set_custom":
-                custom_date = request.form.get("custom_date")
-                if custom_date:
-                    subscription.end_date = datetime.strptime(custom_date, "%Y-%m-%d")
-            elif action == "set_unlimited":
-                subscription.end_date = None
-                
-            db.session.commit()
-            flash(
-                f"Subscription expiration updated for {subscription.partner.company_name}.",
-                "success",
-            )
-        except Exception as e:
-            db.session.rollback()
-            flash(f"Error updating subscription: {str(e)}", "error")
-            
-        return redirect(url_for("admin.partner_subscriptions"))
+        params = {"action": request.form.get("action"), "end_date": request.form.get("custom_date")}
+        return _start_subscription_job("extend", [subscription.id], params)
     
     # GET request - show form
     return render_template(
         "admin/extend_subscription.html",
-        subscription=subscription
+        subscription=subscription,
+        job_token=new_form_token(),
+    )
+
+
+@admin.route("/partner-subscriptions/bulk", methods=["POST"])
+@admin_required
+def bulk_partner_subscriptions():
+    """Refund, cancel or extend the selected partner subscriptions."""
+    from models.models import Subscription
+    from extensions import db
+    
+    action = request.form.get("action")
+    selected = [value for value in request.form.getlist("subscription_ids") if value.isdigit()]
+    subscription_ids = [
+        subscription_id for (subscription_id,) in db.session.query(Subscription.id).filter(
+            Subscription.id.in_(selected), Subscription.subscription_type == "partner"
+        )
+    ]
+    
+    if action in ("refund", "cancel"):
+        return _start_subscription_job(action, subscription_ids)
+    return _start_subscription_job("extend", subscription_ids, {"action": action})
+
+
+@admin.route("/jobs")
+@admin_required
+def jobs():
+    """Recent admin jobs."""
+    from models.models import AdminJob
+    
+    recent = AdminJob.query.order_by(AdminJob.id.desc()).limit(50).all()
+    return render_template("admin/jobs.html", jobs=recent)
+
+
+@admin.route("/jobs/<int:job_id>")
+@admin_required
+def job(job_id):
+    """Progress and per-subscription results of an admin job."""
+    from models.models import AdminJob
+    from flask import current_app
+    
+    admin_job = AdminJob.query.get_or_404(job_id)
+    return render_template(
+        "admin/job.html",
+        job=admin_job,
+        items=admin_job.items.all(),
+        poll_interval=current_app.config.get("ADMIN_JOB_POLL_INTERVAL", 1500),
     )
+
+
+@admin.route("/jobs/<int:job_id>/resume", methods=["POST"])
+@admin_required
+def resume_job(job_id):
+    """Queue a waiting or failed admin job again."""
+    from models.models import AdminJob
+    from services.admin_jobs import requeue_job
+    
+    admin_job = AdminJob.query.get_or_404(job_id)
+    if admin_job.status not in ("queued", "failed"):
+        flash(f"Job #{job_id} is {admin_job.status}.", "info")
+    elif requeue_job(job_id):
+        flash(f"Job #{job_id} queued again.", "success")
+    else:
+        flash(f"Job #{job_id} could not be queued; it will be retried automatically.", "warning")
+    return redirect(url_for("admin.job", job_id=job_id))
+
+
+@admin.route("/jobs/<int:job_id>/progress")
+@admin_required
+def job_progress(job_id):
+    """Counters of an admin job, polled by the job page."""
+    from flask import jsonify
+    from models.models import AdminJob
+    from services.admin_jobs import job_progress as progress
+    
+    response = jsonify(progress(AdminJob.query.get_or_404(job_id)))
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,81 @@
+"""
+JSON API routes (version 1)
+
+GET /api/v1/found/<tag_id> is the scan endpoint for scanner apps and the PWA:
+the pet's name, photo URLs and how to contact the owner, without rendering
+the found page. Responses go through the found-page cache (same invalidation
+as the page, ETag/304) and scans are logged exactly like page scans.
+
+URLs in responses are relative to the API host unless they are absolute
+(photos in S3). Cached responses are shared by every Host, so they must not
+contain the host name.
+"""
+from flask import Blueprint, jsonify, url_for
+from services.metrics import count_scan
+from services.page_cache import cache_page, found_page_tag, set_page_meta
+from services.scans import cached_scan_hit, find_tag, record_scan
+from services.storage import photo_url
+from services.tag_filter import reject_unknown_tags
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _photo(pet):
+    if not pet.photo:
+        return None
+    photo = {"url": photo_url(pet.photo)}
+    if pet.photo_variants:
+        photo["variants"] = {
+            name: {
+                "webp": photo_url(variant["webp"]),
+                "jpeg": photo_url(variant["jpeg"]),
+                "width": variant["width"],
+                "height": variant["height"],
+            }
+            for name, variant in pet.photo_variants.items()
+        }
+    return photo
+
+
+def _invalid_tag(tag_id):
+    count_scan("api", "invalid")
+    return jsonify({"status": "invalid", "tag_id": tag_id}), 404
+
+
+@api.route("/found/<tag_id>")
+@reject_unknown_tags(_invalid_tag)
+@cache_page(ttl="PAGE_CACHE_TTL_FOUND", tags=lambda tag_id: [found_page_tag(tag_id)], on_hit=cached_scan_hit)
+def found(tag_id):
+    """Scan a tag: compact JSON version of the found page."""
+    from models.models import Pet
+
+    tag_obj = find_tag(tag_id)
+    if not tag_obj:
+        return _invalid_tag(tag_id)
+
+    if not tag_obj.pet_id:
+        count_scan("api", "unregistered")
+        set_page_meta(channel="api", result="unregistered")
+        return jsonify({"status": "unregistered", "tag_id": tag_obj.tag_id})
+
+    count_scan("api", "found")
+    pet = Pet.query.get(tag_obj.pet_id)
+    document = {
+        "status": "found",
+        "tag_id": tag_obj.tag_id,
+        "pet": {
+            "name": pet.name,
+            "breed": pet.breed,
+            "color": pet.color,
+            "photo": _photo(pet),
+        },
+        # Owner details stay private; finders use the contact form
+        "contact": {
+            "method": "form",
+            "url": url_for("tag.contact_owner", tag_id=tag_obj.tag_id),
+        },
+    }
+    response = jsonify(document)
+    set_page_meta(channel="api", result="found", tag_pk=tag_obj.id, pet_id=pet.id, owner_id=pet.owner_id)
+    record_scan(tag_obj.id, pet.id, pet.owner_id)
+    return response
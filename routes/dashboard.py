@@ -30,11 +30,10 @@ def dashboard():
 @login_required
 def customer_dashboard():
     """Customer dashboard."""
-    from models.models import Tag, Pet
+    from services.dashboards import load_customer_dashboard
     
     # All users have customer access
     # Get customer's claimed tags and pets
-    tags = Tag.query.filter_by(owner_id=current_user.id).all()
-    pets = Pet.query.filter_by(owner_id=current_user.id).all()
+    data = load_customer_dashboard(current_user.id)
 
-    return render_template("customer/dashboard.html", tags=tags, pets=pets)
+    return render_template("customer/dashboard.html", tags=data.tags, pets=data.pets)
@@ -0,0 +1,67 @@
+"""
+Media routes (stored pet photos)
+
+Photos in local storage are served from /media/<key>. Content-addressed keys
+never change, so they are cached for a year as immutable and their SHA-256 is
+the ETag; photos stored before content addressing are revalidated after
+MEDIA_MAX_AGE seconds. Conditional and Range requests are answered by
+send_file.
+
+Behind nginx, set MEDIA_ACCEL_REDIRECT_PREFIX and the worker only checks the
+key and returns an X-Accel-Redirect header; nginx sends the file (including
+ranges and 304s) from an internal location:
+
+    location /_media/ {
+        internal;
+        alias /app/static/uploads/;
+    }
+
+With Apache or lighttpd, set USE_X_SENDFILE instead. Photos in S3 storage are
+redirected to the bucket.
+"""
+import mimetypes
+import os
+import re
+from flask import Blueprint, abort, current_app, redirect, send_file
+from services.storage import IMMUTABLE_CACHE_CONTROL, LocalStorage, get_storage
+
+media = Blueprint('media', __name__, url_prefix='/media')
+
+CONTENT_KEY = re.compile(r"^[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+$")
+
+
+@media.route("/<path:key>")
+def photo(key):
+    """Serve a stored photo."""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        return redirect(storage.url(key))
+
+    try:
+        path = storage.path(key)
+    except ValueError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    content_addressed = CONTENT_KEY.match(key)
+    accel_prefix = current_app.config.get("MEDIA_ACCEL_REDIRECT_PREFIX")
+    if accel_prefix:
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(key)[0] or "application/octet-stream"
+        )
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + key
+    else:
+        response = send_file(
+            path,
+            etag=content_addressed.group(1) if content_addressed else True,
+            conditional=True,
+        )
+        # Werkzeug only advertises ranges on responses to Range requests
+        response.headers.setdefault("Accept-Ranges", "bytes")
+
+    if content_addressed:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={current_app.config.get('MEDIA_MAX_AGE', 86400)}"
+    return response
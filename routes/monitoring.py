@@ -0,0 +1,30 @@
+"""
+Monitoring routes (metrics, liveness and readiness)
+"""
+from flask import Blueprint, Response, current_app, jsonify
+from services.metrics import render_metrics
+from services import health
+
+monitoring = Blueprint('monitoring', __name__)
+
+
+@monitoring.route("/metrics")
+def metrics():
+    """Prometheus metrics endpoint."""
+    output, content_type = render_metrics(current_app)
+    return Response(output, mimetype=None, content_type=content_type)
+
+
+@monitoring.route("/healthz")
+def healthz():
+    """Liveness check: the process is up. Performs no I/O."""
+    return jsonify({"status": "ok"})
+
+
+@monitoring.route("/readyz")
+def readyz():
+    """Readiness check from cached dependency probe results."""
+    health.start_probes(current_app._get_current_object())
+    ready, details = health.readiness(current_app)
+    details["status"] = "ready" if ready else "unavailable"
+    return jsonify(details), 200 if ready else 503
@@ -152,6 +152,37 @@ def detail(partner_id):
                          prompt_subscription=prompt_subscription)
 
 
+@partner.route("/<int:partner_id>/export/<dataset>.<fmt>")
+@login_required
+def export(partner_id, dataset, fmt):
+    """Stream this partner's tags or tag scans as CSV or NDJSON."""
+    from flask import abort
+    from datetime import datetime
+    from models.models import Partner
+    from services.exports import PARTNER_EXPORTS, export_response, parse_day
+    
+    partner_obj = Partner.query.get_or_404(partner_id)
+    
+    if not partner_obj.user_has_access(current_user):
+        flash('You do not have access to this partner.', 'error')
+        return redirect(url_for('partner.management_dashboard'))
+    
+    if dataset not in PARTNER_EXPORTS:
+        abort(404)
+    try:
+        return export_response(
+            dataset,
+            fmt,
+            f"{dataset}-partner-{partner_id}-{datetime.utcnow():%Y%m%d}",
+            partner_id=partner_id,
+            start=parse_day(request.args.get("start")),
+            end=parse_day(request.args.get("end")),
+            exports=PARTNER_EXPORTS,
+        )
+    except KeyError:
+        abort(404)
+
+
 @partner.route("/subscription")
 @partner.route("/<int:partner_id>/subscription")
 @login_required
@@ -193,17 +224,14 @@ def subscription(partner_id=None):
 @login_required
 def purchase_subscription(partner_id=None):
     """Show subscription purchase options for partners."""
-    from models.models import PricingPlan
+    from services.pricing import get_pricing_catalog
     
     if not current_user.has_partner_role():
         flash("Partner access required to purchase subscriptions.", "error")
         return redirect(url_for("dashboard.dashboard"))
     
     # Get available partner pricing plans
-    partner_plans = PricingPlan.query.filter_by(
-        plan_type="partner",
-        is_active=True
-    ).order_by(PricingPlan.price).all()
+    partner_plans = sorted(get_pricing_catalog().for_type("partner"), key=lambda plan: plan.price)
     
     # Get user's partners
     owned_partners = current_user.get_owned_partners()
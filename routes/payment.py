@@ -4,10 +4,8 @@ Payment processing routes
 from datetime import datetime, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
-from utils import get_enabled_payment_gateways, decrypt_value
+from utils import get_enabled_payment_gateways
 from extensions import logger
-from models.models import PaymentGateway
-import stripe
 
 payment = Blueprint('payment', __name__, url_prefix='/payment')
 
@@ -20,13 +18,16 @@ def tag_payment():
         flash("No tag selected for claiming.", "error")
         return redirect(url_for("tag.claim_tag"))
 
+    from services.pricing import get_pricing_catalog
+
     tag_id = session["claiming_tag_id"]
     subscription_type = session["subscription_type"]
 
-    # Define pricing
-    pricing = {"monthly": 9.99, "yearly": 99.99, "lifetime": 199.99}
-
-    amount = pricing.get(subscription_type, 9.99)
+    plan = get_pricing_catalog().get("tag", subscription_type)
+    if not plan:
+        flash("The selected subscription plan is not available.", "error")
+        return redirect(url_for("tag.claim_tag"))
+    amount = float(plan.price)
 
     # Get enabled payment gateways
     enabled_gateways, gateway_config = get_enabled_payment_gateways()
@@ -53,8 +54,11 @@ def tag_payment():
 @login_required
 def success():
     """Handle successful payment."""
-    from models.models import Tag, Subscription, PartnerSubscription
+    from models.models import Subscription, PartnerSubscription
     from extensions import db
+    from services.pricing import get_pricing_catalog
+    
+    catalog = get_pricing_catalog()
     
     # Handle tag claim payments
     if "claiming_tag_id" in session:
@@ -63,40 +67,39 @@ def success():
 
         # In a real implementation, you would verify the payment here
         # For now, we'll just create the subscription
-        from sqlalchemy import func
-        tag_obj = Tag.query.filter(func.upper(Tag.tag_id) == func.upper(tag_id)).first()
-        if tag_obj:
-            tag_obj.owner_id = current_user.id
-            tag_obj.status = "claimed"
-
-            # Create subscription
-            subscription = Subscription(
-                user_id=current_user.id,
-                tag_id=tag_obj.id,
-                subscription_type=subscription_type,
-                status="active",
-                payment_method="stripe",  # default
-                amount=(
-                    9.99
+        from services.tag_claims import claim_tag
+        tag_pk = claim_tag(tag_id, current_user.id)
+        if not tag_pk:
+            db.session.rollback()
+            flash(f"Tag {tag_id} is no longer available.", "error")
+            return redirect(url_for("tag.claim_tag"))
+
+        # Create subscription
+        plan = catalog.get("tag", subscription_type)
+        subscription = Subscription(
+            user_id=current_user.id,
+            tag_id=tag_pk,
+            pricing_plan_id=plan.id if plan else None,
+            subscription_type=subscription_type,
+            status="active",
+            payment_method="stripe",  # default
+            amount=plan.price if plan else None,
+            start_date=datetime.utcnow(),
+            end_date=(
+                datetime.utcnow() + timedelta(days=365)
+                if subscription_type == "yearly"
+                else (
+                    datetime.utcnow() + timedelta(days=30)
                     if subscription_type == "monthly"
-                    else (99.99 if subscription_type == "yearly" else 199.99)
-                ),
-                start_date=datetime.utcnow(),
-                end_date=(
-                    datetime.utcnow() + timedelta(days=365)
-                    if subscription_type == "yearly"
-                    else (
-                        datetime.utcnow() + timedelta(days=30)
-                        if subscription_type == "monthly"
-                        else None
-                    )
-                ),
-            )
-            db.session.add(subscription)
-            db.session.commit()
+                    else None
+                )
+            ),
+        )
+        db.session.add(subscription)
+        db.session.commit()
 
-            flash(f"Payment successful! Tag {tag_id} has been claimed.", "success")
-            return redirect(url_for("dashboard.customer_dashboard"))
+        flash(f"Payment successful! Tag {tag_id} has been claimed.", "success")
+        return redirect(url_for("dashboard.customer_dashboard"))
     
     # Handle partner subscription payments
     elif "partner_subscription_type" in session:
@@ -106,13 +109,14 @@ def success():
         # Create partner subscription
         try:
             # Create a partner subscription record
+            plan = catalog.get("partner", subscription_type)
             partner_subscription = PartnerSubscription(
                 partner_id=partner_id,
                 status="pending" if not partner_id else "active",
                 admin_approved=False if not partner_id else True,
                 max_tags=0,
                 payment_method="stripe",
-                amount=29.99 if subscription_type == "monthly" else 299.99,
+                amount=plan.price if plan else None,
                 start_date=datetime.utcnow(),
                 end_date=(
                     datetime.utcnow() + timedelta(days=365)
@@ -150,25 +154,20 @@ def partner_subscription_payment(partner_id=None):
     subscription_type = request.form.get("subscription_type")
     pricing_plan_id = request.form.get("pricing_plan_id")
     
-    # Get pricing plan from database
-    from models.models import PricingPlan
+    from services.pricing import get_pricing_catalog
+    
+    catalog = get_pricing_catalog()
     if pricing_plan_id:
-        pricing_plan = PricingPlan.query.filter_by(
-            id=pricing_plan_id,
-            plan_type="partner",
-            is_active=True,
-        ).first()
+        pricing_plan = catalog.by_id(pricing_plan_id)
+        if pricing_plan and pricing_plan.plan_type != "partner":
+            pricing_plan = None
     else:
         # Fallback to billing period lookup for backwards compatibility
         if subscription_type not in ["monthly", "yearly"]:
             flash("Invalid subscription type.", "error")
             return redirect(url_for("partner.subscription", partner_id=partner_id))
         
-        pricing_plan = PricingPlan.query.filter_by(
-            plan_type="partner",
-            billing_period=subscription_type,
-            is_active=True,
-        ).first()
+        pricing_plan = catalog.get("partner", subscription_type)
     
     if not pricing_plan:
         flash("Invalid subscription plan selected.", "error")
@@ -222,20 +221,18 @@ def partner_subscription_payment(partner_id=None):
 @payment.route("/stripe/webhook", methods=["POST"])
 def stripe_webhook():
     """Handle Stripe webhook events"""
+    from services.stripe_client import get_stripe_client
+
+    client = get_stripe_client()
+    stripe = client.stripe
     payload = request.get_data()
     sig_header = request.headers.get("Stripe-Signature")
 
     try:
-        # Get Stripe configuration
-        stripe_gateway = PaymentGateway.query.filter_by(
-            name="stripe", enabled=True
-        ).first()
-        if not stripe_gateway or not stripe_gateway.webhook_secret:
+        if not client.settings.webhook_secret:
             return jsonify({"error": "Webhook not configured"}), 400
 
-        endpoint_secret = decrypt_value(stripe_gateway.webhook_secret)
-
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+        event = client.construct_event(payload, sig_header)
 
         # Handle the event
         if event["type"] == "payment_intent.succeeded":
@@ -246,6 +243,7 @@ def stripe_webhook():
             payment_type = payment_intent["metadata"].get("payment_type")
             claiming_tag_id = payment_intent["metadata"].get("claiming_tag_id")
             subscription_type = payment_intent["metadata"].get("subscription_type")
+            pricing_plan_id = payment_intent["metadata"].get("pricing_plan_id")
 
             if user_id and payment_type:
                 from utils import process_successful_payment
@@ -257,6 +255,9 @@ def stripe_webhook():
                     payment_intent_id=payment_intent["id"],
                     claiming_tag_id=claiming_tag_id,
                     subscription_type=subscription_type,
+                    pricing_plan_id=pricing_plan_id,
+                    customer_id=payment_intent.get("customer"),
+                    payment_method_id=payment_intent.get("payment_method"),
                 )
 
         return jsonify({"status": "success"})
@@ -276,47 +277,23 @@ def stripe_webhook():
 @login_required
 def create_stripe_payment_intent():
     """Create a Stripe payment intent for processing payments"""
+    from services.checkout import open_checkout
+    from services.pricing import get_pricing_catalog
+    from services.stripe_client import get_stripe_client
+    from services.tag_claims import reserve_tag
+
     try:
-        # Log request details for debugging
-        logger.info(f"Stripe payment intent request - Content-Type: {request.content_type}")
-        logger.info(f"Request headers: {dict(request.headers)}")
-        
         # Try to get JSON data first, fall back to form data
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if not data:
-            logger.info("No JSON data found, trying form data")
-            # Fallback to form data
-            data = {
-                'amount': request.form.get('amount', 0),
-                'currency': request.form.get('currency', 'usd'),
-                'payment_type': request.form.get('payment_type', 'tag')
-            }
-            logger.info(f"Form data extracted: {data}")
-        else:
-            logger.info(f"JSON data received: {data}")
+            data = {'payment_type': request.form.get('payment_type', 'tag')}
         
-        amount = data.get("amount", 0)
-        currency = data.get("currency", "usd")
         payment_type = data.get("payment_type", "tag")
         
-        # Convert amount to cents for Stripe (multiply by 100)
-        amount_cents = int(float(amount) * 100)
-        
-        # Get Stripe configuration
-        stripe_gateway = PaymentGateway.query.filter_by(name="stripe", enabled=True).first()
-        if not stripe_gateway or not stripe_gateway.secret_key:
+        client = get_stripe_client()
+        if not client.configured:
             return jsonify({"error": "Stripe payment gateway not configured"}), 400
         
-        # Decrypt keys
-        secret_key = decrypt_value(stripe_gateway.secret_key)
-        publishable_key = decrypt_value(stripe_gateway.publishable_key)
-        
-        # Configure Stripe API
-        stripe.api_key = secret_key
-        
-        # Log for debugging (without exposing the full key)
-        logger.info(f"Using Stripe key: {secret_key[:7]}... (environment: {stripe_gateway.environment})")
-        
         # Get metadata from session
         metadata = {
             "user_id": current_user.id,
@@ -324,23 +301,44 @@ def create_stripe_payment_intent():
         }
         
         # Add specific metadata based on payment type
+        subject = None
         if payment_type == "tag":
-            metadata["claiming_tag_id"] = session.get("claiming_tag_id", "")
+            metadata["claiming_tag_id"] = subject = session.get("claiming_tag_id", "")
             metadata["subscription_type"] = session.get("subscription_type", "")
         elif payment_type == "partner":
             metadata["subscription_type"] = session.get("partner_subscription_type", "")
-            metadata["partner_id"] = session.get("partner_id", "")
+            metadata["partner_id"] = subject = session.get("partner_id", "")
+        
+        # Renew the buyer's hold on the tag for the checkout window
+        if payment_type == "tag" and subject and not reserve_tag(subject, current_user.id):
+            return jsonify({"error": "Tag is no longer available"}), 409
         
-        # Create payment intent
-        intent = stripe.PaymentIntent.create(
-            amount=amount_cents,
-            currency=currency,
-            metadata=metadata
+        # The price comes from the catalog, never from the browser
+        catalog = get_pricing_catalog()
+        plan = catalog.get(payment_type, metadata.get("subscription_type"))
+        if payment_type == "partner":
+            plan = catalog.by_id(session.get("pricing_plan_id")) or plan
+        if not plan:
+            return jsonify({"error": "Unknown pricing plan"}), 400
+        # Credited to this plan when paid, whatever else shares its period
+        metadata["pricing_plan_id"] = plan.id
+        
+        # The same purchase reuses its payment intent until paid or expired
+        checkout = open_checkout(
+            client,
+            current_user,
+            payment_type,
+            plan.price,
+            currency=plan.currency,
+            subject=subject,
+            subscription_type=metadata.get("subscription_type"),
+            pricing_plan_id=plan.id,
+            metadata=metadata,
         )
         
         return jsonify({
-            "client_secret": intent.client_secret,
-            "publishable_key": publishable_key
+            "client_secret": checkout.client_secret,
+            "publishable_key": client.publishable_key
         })
         
     except Exception as e:
@@ -352,6 +350,8 @@ def create_stripe_payment_intent():
 @login_required
 def confirm_stripe_payment():
     """Confirm and process a successful Stripe payment (for local testing without webhooks)"""
+    from services.stripe_client import get_stripe_client
+
     try:
         data = request.get_json()
         payment_intent_id = data.get("payment_intent_id")
@@ -359,15 +359,12 @@ def confirm_stripe_payment():
         if not payment_intent_id:
             return jsonify({"error": "Payment intent ID required"}), 400
         
-        # Configure Stripe
-        stripe_gateway = PaymentGateway.query.filter_by(name="stripe", enabled=True).first()
-        if not stripe_gateway:
+        client = get_stripe_client()
+        if not client.configured:
             return jsonify({"error": "Stripe not configured"}), 400
         
-        stripe.api_key = decrypt_value(stripe_gateway.secret_key)
-        
         # Retrieve payment intent from Stripe to verify it succeeded
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        payment_intent = client.retrieve_payment_intent(payment_intent_id)
         
         if payment_intent.status != "succeeded":
             return jsonify({"error": "Payment not successful"}), 400
@@ -378,6 +375,7 @@ def confirm_stripe_payment():
         payment_type = metadata.get("payment_type")
         claiming_tag_id = metadata.get("claiming_tag_id")
         subscription_type = metadata.get("subscription_type")
+        pricing_plan_id = metadata.get("pricing_plan_id")
         
         # Verify user matches current user
         if user_id != current_user.id:
@@ -394,6 +392,9 @@ def confirm_stripe_payment():
             payment_intent_id=payment_intent_id,
             claiming_tag_id=claiming_tag_id,
             subscription_type=subscription_type,
+            pricing_plan_id=pricing_plan_id,
+            customer_id=payment_intent.get("customer"),
+            payment_method_id=payment_intent.get("payment_method"),
         )
         
         if success:
@@ -1,13 +1,12 @@
 """
 Pet management routes
 """
-import os
-import uuid
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
 from forms import PetForm
+from services.photos import delete_pet_photo, enqueue_photo_processing, store_pet_photo
 
 pet = Blueprint('pet', __name__, url_prefix='/pet')
 
@@ -28,19 +27,19 @@ def create_pet():
 
     if form.validate_on_submit():
         # Handle file upload
-        photo_filename = None
+        photo_key = None
         if form.photo.data:
-            photo_filename = secure_filename(form.photo.data.filename)
-            photo_filename = f"{uuid.uuid4()}_{photo_filename}"
-            form.photo.data.save(
-                os.path.join(current_app.config["UPLOAD_FOLDER"], photo_filename)
-            )
+            try:
+                photo_key = store_pet_photo(form.photo.data)
+            except ValueError:
+                form.photo.errors.append("The photo could not be read as an image.")
+                return render_template("pet/create.html", form=form)
 
         pet_obj = Pet(
             name=form.name.data,
             breed=form.breed.data,
             color=form.color.data,
-            photo=photo_filename,
+            photo=photo_key,
             vet_name=form.vet_name.data,
             vet_phone=form.vet_phone.data,
             vet_address=form.vet_address.data,
@@ -53,6 +52,9 @@ def create_pet():
         db.session.add(pet_obj)
         db.session.commit()
 
+        if photo_key:
+            enqueue_photo_processing(pet_obj.id, photo_key)
+
         # Assign tag to pet
         if form.tag_id.data:
             tag = Tag.query.get(form.tag_id.data)
@@ -100,20 +102,18 @@ def edit_pet(pet_id):
 
     if form.validate_on_submit():
         # Handle file upload
-        if form.photo.data:
-            photo_filename = secure_filename(form.photo.data.filename)
-            photo_filename = f"{uuid.uuid4()}_{photo_filename}"
-            form.photo.data.save(
-                os.path.join(current_app.config["UPLOAD_FOLDER"], photo_filename)
-            )
-
-            # Delete old photo if it exists
-            if pet_obj.photo:
-                old_photo_path = os.path.join(current_app.config["UPLOAD_FOLDER"], pet_obj.photo)
-                if os.path.exists(old_photo_path):
-                    os.remove(old_photo_path)
-
-            pet_obj.photo = photo_filename
+        photo_key = None
+        # Without a new upload the field still holds the current photo key
+        if isinstance(form.photo.data, FileStorage):
+            try:
+                photo_key = store_pet_photo(form.photo.data)
+            except ValueError:
+                form.photo.errors.append("The photo could not be read as an image.")
+                return render_template("pet/edit.html", form=form, pet=pet_obj)
+
+            # Release old photo and its variants if they exist
+            delete_pet_photo(pet_obj)
+            pet_obj.photo = photo_key
 
         pet_obj.name = form.name.data
         pet_obj.breed = form.breed.data
@@ -127,6 +127,9 @@ def edit_pet(pet_id):
 
         db.session.commit()
 
+        if photo_key:
+            enqueue_photo_processing(pet_obj.id, photo_key)
+
         flash("Pet updated successfully!", "success")
         return redirect(url_for("dashboard.customer_dashboard"))
 
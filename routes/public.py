@@ -2,11 +2,13 @@
 Public routes (homepage, contact, privacy, etc.)
 """
 from flask import Blueprint, render_template, request, redirect, url_for
+from services.page_cache import cache_page
 
 public = Blueprint('public', __name__)
 
 
 @public.route("/")
+@cache_page(ttl="PAGE_CACHE_TTL_HOME", query_args=("tag_id",), tags=("pricing",))
 def index():
     """Homepage."""
     # Handle tag search from homepage
@@ -15,13 +17,10 @@ def index():
         return redirect(url_for("tag.found_pet", tag_id=tag_id))
 
     # Get pricing plans for homepage
-    from models.models import PricingPlan, Pet
+    from models.models import Pet
+    from services.pricing import get_pricing_catalog
     
-    pricing_plans = (
-        PricingPlan.query.filter_by(show_on_homepage=True, is_active=True)
-        .order_by(PricingPlan.sort_order.asc())
-        .all()
-    )
+    pricing_plans = get_pricing_catalog().homepage
 
     # Get stats for homepage
     total_pets = Pet.query.count()
@@ -32,18 +31,21 @@ def index():
 
 
 @public.route("/contact")
+@cache_page()
 def contact():
     """Contact page."""
     return render_template("contact.html")
 
 
 @public.route("/privacy")
+@cache_page()
 def privacy():
     """Privacy policy page."""
     return render_template("privacy.html")
 
 
 @public.route("/found")
+@cache_page()
 def found_index():
     """Found pet search page."""
     return render_template("found/index.html")
@@ -52,4 +54,12 @@ def found_index():
 @public.route("/found/<tag_id>")
 def found_redirect(tag_id):
     """Redirect /found/<tag_id> to the tag blueprint route."""
+    from services.tag_filter import render_invalid_tag, tag_may_exist
+
+    # Unknown IDs get their answer without the extra round trip
+    if not tag_may_exist(tag_id):
+        from services.metrics import count_scan
+
+        count_scan("page", "invalid")
+        return render_invalid_tag(tag_id)
     return redirect(url_for("tag.found_pet", tag_id=tag_id))
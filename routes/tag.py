@@ -3,9 +3,12 @@ Tag management routes
 """
 import uuid
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort, make_response
 from flask_login import login_required, current_user
 from forms import TagForm, ClaimTagForm, TransferTagForm, ContactOwnerForm
+from services.page_cache import cache_page, found_page_tag, set_page_meta
+from services.scans import cached_scan_hit, find_tag, record_scan
+from services.tag_filter import reject_unknown_tags, render_invalid_tag
 
 tag = Blueprint('tag', __name__, url_prefix='/tag')
 
@@ -175,6 +178,12 @@ def claim_tag():
             flash("Tag is not available for claiming.", "error")
             return redirect(url_for("tag.claim_tag"))
 
+        # Hold the tag for this buyer while they pay
+        from services.tag_claims import reserve_tag
+        if not reserve_tag(tag_obj.tag_id, current_user.id):
+            flash("This tag is being claimed by someone else. Please try again later.", "error")
+            return redirect(url_for("tag.claim_tag"))
+
         # Store tag_id and subscription_type in session for payment
         session["claiming_tag_id"] = tag_obj.tag_id
         session["subscription_type"] = form.subscription_type.data
@@ -223,55 +232,80 @@ def transfer_tag(tag_id):
     return render_template("tag/transfer.html", form=form, tag=tag_obj)
 
 
+@tag.route("/qr/<tag_id>")
+@login_required
+def qr_code(tag_id):
+    """QR code (PNG) pointing at a tag's found page."""
+    import qrcode
+    from io import BytesIO
+    from sqlalchemy import func
+    from models.models import Tag
+
+    tag_obj = Tag.query.filter(func.upper(Tag.tag_id) == tag_id.upper()).first_or_404()
+    partner_access = tag_obj.partner and tag_obj.partner.user_has_access(current_user)
+    if tag_obj.owner_id != current_user.id and not partner_access and not current_user.has_role("admin"):
+        abort(403)
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(url_for("tag.found_pet", tag_id=tag_obj.tag_id, _external=True))
+    qr.make(fit=True)
+    buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+
+    response = make_response(buffer.getvalue())
+    response.mimetype = "image/png"
+    response.headers["Cache-Control"] = "private, max-age=86400"
+    return response
+
+
+def _unknown_tag_page(tag_id):
+    from services.metrics import count_scan
+
+    count_scan("page", "invalid")
+    return render_invalid_tag(tag_id)
+
+
 @tag.route("/found/<tag_id>")
+@reject_unknown_tags(_unknown_tag_page)
+@cache_page(ttl="PAGE_CACHE_TTL_FOUND", tags=lambda tag_id: [found_page_tag(tag_id)], on_hit=cached_scan_hit)
 def found_pet(tag_id):
     """Display found pet information."""
-    from models.models import Tag, Pet, User, SearchLog, NotificationPreference
-    from extensions import db
-    from utils import send_notification_email
-    from sqlalchemy import func
+    from models.models import Pet, User
+    from services.metrics import count_scan
     
-    # Case-insensitive tag lookup
-    tag_obj = Tag.query.filter(func.upper(Tag.tag_id) == func.upper(tag_id)).first()
+    tag_obj = find_tag(tag_id)
 
     if not tag_obj:
+        count_scan("page", "invalid")
+        set_page_meta(channel="page", result="invalid")
         return render_template("found/invalid_tag.html", tag_id=tag_id)
 
     if not tag_obj.pet_id:
+        count_scan("page", "unregistered")
+        set_page_meta(channel="page", result="unregistered")
         return render_template("found/not_registered.html", tag_id=tag_id)
 
+    count_scan("page", "found")
+
     pet = Pet.query.get(tag_obj.pet_id)
     owner = User.query.get(pet.owner_id)
 
-    # Log the search
-    search_log = SearchLog(
-        tag_id=tag_obj.id,
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get("User-Agent"),
-    )
-    db.session.add(search_log)
-    db.session.commit()
-
-    # Check if owner wants notifications
-    notification_pref = NotificationPreference.query.filter_by(
-        user_id=owner.id, notification_type="tag_search"
-    ).first()
-
-    if notification_pref and notification_pref.enabled:
-        send_notification_email(owner, tag_obj, pet)
-
-    return render_template("found/pet_info.html", pet=pet, owner=owner, tag=tag_obj)
+    # Render before logging: the commit in record_scan expires loaded objects
+    page = render_template("found/pet_info.html", pet=pet, owner=owner, tag=tag_obj)
+    set_page_meta(channel="page", result="found", tag_pk=tag_obj.id, pet_id=pet.id, owner_id=owner.id)
+    record_scan(tag_obj.id, pet.id, owner.id)
+    return page
 
 
 @tag.route("/found/<tag_id>/contact", methods=["GET", "POST"])
+@reject_unknown_tags(render_invalid_tag)
 def contact_owner(tag_id):
     """Contact pet owner."""
-    from models.models import Tag, Pet, User
+    from models.models import Pet, User
+    from services.bots import is_bot_request
     from utils import send_contact_email
-    from sqlalchemy import func
     
-    # Case-insensitive tag lookup
-    tag_obj = Tag.query.filter(func.upper(Tag.tag_id) == func.upper(tag_id)).first()
+    tag_obj = find_tag(tag_id)
 
     if not tag_obj:
         return render_template("found/invalid_tag.html", tag_id=tag_id)
@@ -285,10 +319,11 @@ def contact_owner(tag_id):
 
     form = ContactOwnerForm()
     if form.validate_on_submit():
-        # Send email to owner
-        send_contact_email(
-            owner, pet, form.finder_name.data, form.finder_email.data, form.message.data
-        )
+        # Bots get the same answer, but owners don't get their messages
+        if not is_bot_request():
+            send_contact_email(
+                owner, pet, form.finder_name.data, form.finder_email.data, form.message.data
+            )
 
         flash("Your message has been sent to the pet owner.", "success")
         return redirect(url_for("tag.found_pet", tag_id=tag_id))
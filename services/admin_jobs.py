@@ -0,0 +1,348 @@
+"""
+Background admin jobs for LTFPQRR.
+
+Refunding, cancelling and extending subscriptions talk to the payment
+gateway and send email, so the admin routes no longer do them inline: they
+call start_job(), which records an AdminJob with one AdminJobItem per
+subscription and hands it to a Celery worker, and then show a page that
+polls job_progress() until the job finishes.
+
+- A job is created once per submitted form: the key combines the token
+  rendered into the page with what the form asks for, so a double-submitted
+  form gets the existing job back.
+- run_job() claims the job, then each item, with a conditional UPDATE, so a
+  redelivered task does not process anything twice. Each item's changes, its
+  status and the job's counters are committed together; emails go out after
+  the commit.
+- Refunds use the idempotency key refund-<payment intent>, so retrying a
+  refund that reached Stripe returns the original refund.
+- Jobs never run in the admin's request. A job that could not be queued
+  (the broker was down) stays "queued"; requeue_waiting_jobs(), run by the
+  beat schedule, queues it again once it has waited ADMIN_JOB_REQUEUE_AFTER
+  seconds, and the job page has a Resume button for it.
+- An item interrupted by a crashed worker stays "running";
+  `python -m services.admin_jobs resume <id>` puts it back to pending and
+  runs the rest of the job.
+
+Usage:
+    python -m services.admin_jobs resume <job id>
+"""
+import hashlib
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta
+from extensions import enqueue, logger
+
+EXTEND_ACTIONS = ("extend_month", "extend_year", "set_custom", "set_unlimited")
+EXTEND_DAYS = {"extend_month": 30, "extend_year": 365}
+
+
+def _extend_params(params):
+    action = params.get("action")
+    if action not in EXTEND_ACTIONS:
+        raise ValueError(f"Unknown extend action: {action}")
+    if action != "set_custom":
+        return {"action": action}
+    end_date = params.get("end_date") or ""
+    datetime.strptime(end_date, "%Y-%m-%d")  # ValueError if malformed
+    return {"action": action, "end_date": end_date}
+
+
+def _refund(subscription, params, now):
+    from models.models import Payment
+    from services.stripe_client import get_stripe_client
+    from email_utils import send_subscription_cancelled_email
+
+    if subscription.status == "refunded":
+        return "skipped", "Already refunded", None
+
+    refunded = False
+    payment = Payment.query.filter_by(subscription_id=subscription.id).first()
+    if payment and payment.payment_intent_id:
+        # Gateway errors propagate: the item fails and the subscription is left as it was
+        refund = get_stripe_client().create_refund(
+            payment_intent=payment.payment_intent_id,
+            reason="requested_by_customer",
+            idempotency_key=f"refund-{payment.payment_intent_id}",
+        )
+        refunded = refund.status == "succeeded"
+        if refunded:
+            payment.status = "refunded"
+        payment.payment_metadata = {
+            **(payment.payment_metadata or {}),
+            "stripe_refund_id": refund.id,
+            "refund_date": now.isoformat(),
+        }
+        message = f"Stripe refund {refund.id} {refund.status}"
+    else:
+        message = "Cancelled; no Stripe payment to refund"
+
+    subscription.status = "refunded"
+    subscription.end_date = now
+    return "succeeded", message, lambda: send_subscription_cancelled_email(
+        subscription.user, subscription, refunded=refunded
+    )
+
+
+def _cancel(subscription, params, now):
+    if subscription.status in ("cancelled", "refunded"):
+        return "skipped", f"Already {subscription.status}", None
+    subscription.status = "cancelled"
+    subscription.end_date = now
+    return "succeeded", "Cancelled", None
+
+
+def _extend(subscription, params, now):
+    action = params["action"]
+    if action in EXTEND_DAYS:
+        subscription.end_date = (subscription.end_date or now) + timedelta(days=EXTEND_DAYS[action])
+    elif action == "set_custom":
+        subscription.end_date = datetime.strptime(params["end_date"], "%Y-%m-%d")
+    else:
+        subscription.end_date = None
+    end = subscription.end_date.strftime("%Y-%m-%d") if subscription.end_date else "never"
+    return "succeeded", f"Ends {end}", None
+
+
+# kind: (item handler, params validator)
+JOB_KINDS = {
+    "refund": (_refund, dict),
+    "cancel": (_cancel, dict),
+    "extend": (_extend, _extend_params),
+}
+
+
+def new_form_token():
+    """A token for the hidden job_token field of a page's job forms."""
+    return uuid.uuid4().hex
+
+
+def job_key(form_token, kind, subscription_ids, params):
+    """The idempotency key of the job a form submission asks for."""
+    request = json.dumps([kind, sorted(subscription_ids), params], sort_keys=True)
+    return f"{form_token}-{kind}-{hashlib.sha1(request.encode()).hexdigest()[:16]}"
+
+
+def start_job(kind, subscription_ids, created_by, params=None, form_token=None):
+    """Record a job over subscription_ids and queue it; returns the AdminJob.
+
+    Raises ValueError for an unknown kind, bad params or no subscriptions.
+    With form_token, submitting the same form twice returns the first job.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from extensions import db
+    from models.models import AdminJob, AdminJobItem
+
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    params = JOB_KINDS[kind][1](params or {})
+    subscription_ids = sorted({int(subscription_id) for subscription_id in subscription_ids})
+    if not subscription_ids:
+        raise ValueError("No subscriptions selected")
+
+    key = job_key(form_token, kind, subscription_ids, params) if form_token else uuid.uuid4().hex
+    job = AdminJob.query.filter_by(idempotency_key=key).first()
+    if job:
+        return job
+
+    job = AdminJob(kind=kind, params=params, idempotency_key=key, status="queued",
+                   total=len(subscription_ids), created_by=created_by)
+    db.session.add(job)
+    try:
+        db.session.flush()
+        db.session.add_all(AdminJobItem(job_id=job.id, subscription_id=subscription_id, status="pending")
+                           for subscription_id in subscription_ids)
+        db.session.commit()
+    except IntegrityError:
+        # The same form was submitted concurrently
+        db.session.rollback()
+        return AdminJob.query.filter_by(idempotency_key=key).one()
+
+    logger.info(f"Admin job {job.id}: {kind} of {job.total} subscriptions by user {created_by}")
+    enqueue_admin_job(job.id)
+    return job
+
+
+def _finish_item(job_id, item_id, outcome, message):
+    from models.models import AdminJob, AdminJobItem
+
+    AdminJobItem.query.filter_by(id=item_id).update(
+        {AdminJobItem.status: outcome, AdminJobItem.message: (message or "")[:255]},
+        synchronize_session=False,
+    )
+    counter = getattr(AdminJob, outcome)
+    AdminJob.query.filter_by(id=job_id).update({counter: counter + 1}, synchronize_session=False)
+
+
+def _run_item(job, item_id, now):
+    from extensions import db
+    from models.models import AdminJobItem
+
+    handler = JOB_KINDS[job.kind][0]
+    item = db.session.get(AdminJobItem, item_id)
+    try:
+        outcome, message, after_commit = handler(item.subscription, job.params or {}, now)
+        _finish_item(job.id, item_id, outcome, message)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Admin job {job.id}: {job.kind} of subscription {item.subscription_id} failed: {e}")
+        _finish_item(job.id, item_id, "failed", str(e))
+        db.session.commit()
+        return
+
+    if after_commit:
+        try:
+            after_commit()
+        except Exception as e:
+            # The operation itself is done; don't fail the item over an email
+            logger.error(f"Admin job {job.id}: notification for subscription {item.subscription_id} failed: {e}")
+
+
+def run_job(job_id, now=None):
+    """Process every pending item of a queued job; returns the AdminJob.
+
+    Does nothing if the job was already claimed by another run.
+    """
+    from extensions import db
+    from models.models import AdminJob, AdminJobItem
+
+    now = now or datetime.utcnow()
+    claimed = AdminJob.query.filter_by(id=job_id, status="queued").update(
+        {AdminJob.status: "running", AdminJob.started_at: now}, synchronize_session=False
+    )
+    db.session.commit()
+    job = db.session.get(AdminJob, job_id)
+    if not claimed:
+        logger.info(f"Admin job {job_id} is not queued, skipping")
+        return job
+
+    try:
+        item_ids = [item_id for (item_id,) in db.session.query(AdminJobItem.id)
+                    .filter_by(job_id=job_id, status="pending").order_by(AdminJobItem.id)]
+        for item_id in item_ids:
+            if not AdminJobItem.query.filter_by(id=item_id, status="pending").update(
+                {AdminJobItem.status: "running"}, synchronize_session=False
+            ):
+                db.session.commit()
+                continue
+            db.session.commit()
+            _run_item(job, item_id, now)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Admin job {job_id} failed: {e}")
+        AdminJob.query.filter_by(id=job_id).update(
+            {AdminJob.status: "failed", AdminJob.error: str(e), AdminJob.finished_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        raise
+
+    AdminJob.query.filter_by(id=job_id).update(
+        {AdminJob.status: "completed", AdminJob.finished_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    db.session.refresh(job)
+    logger.info(f"Admin job {job_id} completed: {job.succeeded} succeeded, "
+                f"{job.failed} failed, {job.skipped} skipped")
+    return job
+
+
+def _reset_job(job_id, statuses):
+    """Put a job in one of statuses back to queued, and its running items back to pending."""
+    from extensions import db
+    from models.models import AdminJob, AdminJobItem
+
+    reset = AdminJob.query.filter(AdminJob.id == job_id, AdminJob.status.in_(statuses)).update(
+        {AdminJob.status: "queued", AdminJob.error: None}, synchronize_session=False
+    )
+    if reset:
+        AdminJobItem.query.filter_by(job_id=job_id, status="running").update(
+            {AdminJobItem.status: "pending"}, synchronize_session=False
+        )
+    db.session.commit()
+
+
+def resume_job(job_id):
+    """Requeue an interrupted job and run its unfinished items in this process."""
+    _reset_job(job_id, ("running", "failed"))
+    return run_job(job_id)
+
+
+def requeue_job(job_id):
+    """Queue a waiting or failed job again from the job page; returns whether it was queued.
+
+    A running job is left alone: its worker may still be at it.
+    """
+    _reset_job(job_id, ("failed",))
+    return enqueue_admin_job(job_id)
+
+
+def requeue_waiting_jobs(older_than=None):
+    """Queue again the jobs that have been waiting longer than older_than seconds.
+
+    Catches jobs whose task never reached the broker. A job that was queued
+    and is only waiting for a busy worker gets a second task, which finds it
+    claimed and does nothing. Returns the ids of the jobs queued.
+    """
+    from flask import current_app
+    from models.models import AdminJob
+
+    if older_than is None:
+        older_than = current_app.config.get("ADMIN_JOB_REQUEUE_AFTER", 300)
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    waiting = [job_id for (job_id,) in AdminJob.query.with_entities(AdminJob.id)
+               .filter(AdminJob.status == "queued", AdminJob.created_at <= cutoff).order_by(AdminJob.id)]
+    queued = [job_id for job_id in waiting if enqueue_admin_job(job_id)]
+    if waiting:
+        logger.info(f"Requeued {len(queued)} of {len(waiting)} waiting admin jobs")
+    return queued
+
+
+def job_progress(job):
+    """The JSON the job page polls."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total": job.total,
+        "done": job.done,
+        "succeeded": job.succeeded,
+        "failed": job.failed,
+        "skipped": job.skipped,
+        "finished": job.is_finished(),
+        "error": job.error,
+    }
+
+
+def enqueue_admin_job(job_id):
+    """Run a job in a Celery worker; returns whether it was queued.
+
+    Never runs the job inline: if the broker is down it stays queued for
+    requeue_waiting_jobs().
+    """
+    from tasks.admin_jobs import run_admin_job as job_task
+
+    return enqueue(job_task, job_id)
+
+
+def main(argv):
+    if len(argv) != 3 or argv[1] != "resume" or not argv[2].isdigit():
+        print("Usage: python -m services.admin_jobs resume <job id>")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        job = resume_job(int(argv[2]))
+    if job is None:
+        print(f"No admin job {argv[2]}")
+        return 1
+    print(f"Admin job {job.id} {job.status}: {job.done}/{job.total} done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
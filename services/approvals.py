@@ -0,0 +1,112 @@
+"""
+Partner subscription review for LTFPQRR.
+
+Admins approve or reject pending partner subscriptions in batches from the
+review queue. Each batch is one transaction: the ids that are still pending
+are read (locked where the database supports it) and changed with a single
+UPDATE, so a subscription approved twice, or by two admins at once, is
+only counted and emailed once. Approval emails for the whole batch go to one
+Celery task after the commit.
+"""
+from datetime import datetime
+from extensions import enqueue, logger
+
+REVIEWABLE_STATUSES = ("pending", "active")
+
+
+def awaiting_review():
+    """Filter for partner subscriptions in the review queue (see Partner.get_pending_subscription)."""
+    from models.models import Subscription
+
+    return (
+        Subscription.subscription_type == "partner",
+        Subscription.admin_approved.isnot(True),
+        Subscription.status.in_(REVIEWABLE_STATUSES),
+    )
+
+
+def _pending(subscription_ids):
+    """Ids among subscription_ids still awaiting review, locked for this transaction."""
+    from extensions import db
+    from models.models import Subscription
+
+    if not subscription_ids:
+        return []
+    return [
+        subscription_id for (subscription_id,) in db.session.query(Subscription.id)
+        .filter(Subscription.id.in_(subscription_ids), *awaiting_review())
+        .with_for_update()
+    ]
+
+
+def approve_partner_subscriptions(subscription_ids, admin_user, now=None):
+    """Approve the ones awaiting review; returns the ids approved.
+
+    Pending subscriptions become active. Commits, then queues the approval
+    emails.
+    """
+    from sqlalchemy import case
+    from extensions import db
+    from models.models import Subscription
+
+    now = now or datetime.utcnow()
+    approved = _pending(subscription_ids)
+    if approved:
+        Subscription.query.filter(Subscription.id.in_(approved)).update(
+            {
+                Subscription.admin_approved: True,
+                Subscription.approved_by: admin_user.id,
+                Subscription.approved_at: now,
+                Subscription.status: case((Subscription.status == "pending", "active"), else_=Subscription.status),
+                Subscription.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+    db.session.commit()
+
+    if approved:
+        logger.info(f"Admin {admin_user.id} approved partner subscriptions {approved}")
+        enqueue_approval_notices(approved)
+    return approved
+
+
+def reject_partner_subscriptions(subscription_ids, admin_user, now=None):
+    """Cancel the ones awaiting review; returns the ids rejected. Commits."""
+    from extensions import db
+    from models.models import Subscription
+
+    now = now or datetime.utcnow()
+    rejected = _pending(subscription_ids)
+    if rejected:
+        Subscription.query.filter(Subscription.id.in_(rejected)).update(
+            {Subscription.status: "cancelled", Subscription.updated_at: now},
+            synchronize_session=False,
+        )
+    db.session.commit()
+
+    if rejected:
+        logger.info(f"Admin {admin_user.id} rejected partner subscriptions {rejected}")
+    return rejected
+
+
+def send_approval_notices(subscription_ids):
+    """Email the owners of newly approved partner subscriptions."""
+    from sqlalchemy.orm import joinedload
+    from email_utils import send_subscription_approved_email
+    from models.models import Subscription
+
+    subscriptions = Subscription.query.filter(Subscription.id.in_(subscription_ids)).options(
+        joinedload(Subscription.user), joinedload(Subscription.partner), joinedload(Subscription.pricing_plan)
+    )
+    for subscription in subscriptions:
+        try:
+            send_subscription_approved_email(subscription.user, subscription)
+        except Exception as e:
+            logger.error(f"Error sending approval email for subscription {subscription.id}: {e}")
+
+
+def enqueue_approval_notices(subscription_ids):
+    """Send approval emails from a Celery worker, or inline if it can't be queued."""
+    from tasks.subscriptions import send_approval_notices as notices_task
+
+    enqueue(notices_task, subscription_ids, inline=send_approval_notices)
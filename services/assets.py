@@ -0,0 +1,190 @@
+"""
+Static asset fingerprinting for LTFPQRR.
+
+The build step copies every file under static/ (except uploads) to
+static/dist/ with a content hash in its name, writes gzip and brotli variants
+of text assets next to it and records the mapping in static/dist/manifest.json.
+Templates link assets with static_url("css/custom.css"), which resolves to the
+fingerprinted file when the manifest exists and to the plain file otherwise.
+
+Fingerprinted files never change, so they are served with a one-year
+immutable Cache-Control header and the precompressed variant the browser
+accepts.
+
+Usage (run at build time):
+    python -m services.assets build
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+from flask import current_app, request, send_from_directory, url_for
+from extensions import logger
+
+# Optional imports with fallbacks
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+SKIP_DIRS = {"uploads", DIST_DIR}
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".xml", ".map"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _source_files(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root == ".":
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith(".") or name.endswith(".md"):
+                continue
+            yield posixpath.normpath(posixpath.join(rel_root.replace(os.sep, "/"), name))
+
+
+def _fingerprinted_name(logical_name, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    base, ext = posixpath.splitext(logical_name)
+    return f"{DIST_DIR}/{base}.{digest}{ext}"
+
+
+def _rewrite_css_urls(logical_name, css, manifest, static_url_path):
+    """Point url() references inside a stylesheet at fingerprinted files."""
+    css_dir = posixpath.dirname(logical_name)
+    target_dir = posixpath.dirname(f"{DIST_DIR}/{logical_name}")
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        # Keep ?query and #fragment suffixes (font cache busters, SVG ids)
+        path, sep, suffix = url, "", ""
+        split = re.search(r"[?#]", url)
+        if split:
+            path, sep, suffix = url[:split.start()], split.group(0), url[split.end():]
+        if path.startswith(static_url_path + "/"):
+            referenced = path[len(static_url_path) + 1:]
+        elif path.startswith("/"):
+            return match.group(0)
+        else:
+            referenced = posixpath.normpath(posixpath.join(css_dir, path))
+        if referenced not in manifest:
+            return match.group(0)
+        new_path = posixpath.relpath(manifest[referenced], target_dir)
+        return f"url({quote}{new_path}{sep}{suffix}{quote})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _write_compressed(path, data):
+    """Write .gz and .br variants when they are meaningfully smaller."""
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if HAS_BROTLI:
+        variants[".br"] = brotli.compress(data, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data) * 0.9:
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+
+
+def build_assets(static_folder, static_url_path="/static"):
+    """Fingerprint and precompress every static asset; returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    names = list(_source_files(static_folder))
+    # Stylesheets last, so the files they reference are already in the manifest
+    names.sort(key=lambda name: name.endswith(".css"))
+
+    manifest = {}
+    for name in names:
+        with open(os.path.join(static_folder, name), "rb") as f:
+            data = f.read()
+        if name.endswith(".css"):
+            css = data.decode("utf-8")
+            data = _rewrite_css_urls(name, css, manifest, static_url_path).encode("utf-8")
+
+        target_name = _fingerprinted_name(name, data)
+        target = os.path.join(static_folder, target_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        if posixpath.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            _write_compressed(target, data)
+        manifest[name] = target_name
+
+    with open(os.path.join(dist, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def static_url(filename):
+    """URL of a static asset, fingerprinted when the manifest has it."""
+    manifest = current_app.extensions.get("ltfpqrr_asset_manifest", {})
+    return url_for("static", filename=manifest.get(filename, filename))
+
+
+def _serve_static(filename):
+    """Static view: fingerprinted assets get immutable caching and precompression."""
+    app = current_app
+    if not filename.startswith(f"{DIST_DIR}/"):
+        return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encodings = request.accept_encodings
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encodings[encoding] and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = app.send_static_file(filename)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_assets(app):
+    """Load the asset manifest and register static_url() for templates."""
+    manifest_path = app.config.get("ASSET_MANIFEST") or os.path.join(
+        app.static_folder, DIST_DIR, MANIFEST_NAME
+    )
+    manifest = {}
+    if os.path.isfile(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read asset manifest {manifest_path}: {e}")
+    app.extensions["ltfpqrr_asset_manifest"] = manifest
+    app.jinja_env.globals["static_url"] = static_url
+    app.view_functions["static"] = _serve_static
+
+
+def main(argv):
+    if argv[1:] != ["build"]:
+        print("Usage: python -m services.assets build")
+        return 2
+
+    static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+    manifest = build_assets(static_folder)
+    print(f"Fingerprinted {len(manifest)} assets into {os.path.join(static_folder, DIST_DIR)}")
+    if not HAS_BROTLI:
+        print("brotli is not installed, only gzip variants were written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,38 @@
+"""
+Bot detection for LTFPQRR.
+
+Crawlers and link previewers (a chat app unfurling a found-page link) load
+found pages too. Their scans still get an answer, but they are not written
+to SearchLog (which the scan statistics are built from) and never trigger
+owner notifications or contact emails.
+
+Generic HTTP clients (okhttp, axios, python-requests, curl...) and requests
+without a User-Agent are not bots: the partner scanner apps calling
+/api/v1/found are built on them, and their scans are real finders.
+
+Classification is a regex over the User-Agent; the same few user agents make
+most requests, so results are memoized.
+"""
+import re
+from functools import lru_cache
+from flask import request
+
+_BOT_PATTERN = re.compile(
+    r"bot\b|bot/|crawl|spider|slurp|scrapy|archiver|"
+    r"facebookexternalhit|facebookcatalog|slack-imgproxy|whatsapp/|embedly|iframely|"
+    r"preview|headlesschrome|lighthouse",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=4096)
+def is_bot(user_agent):
+    """True for crawler and link previewer user agents."""
+    if not user_agent:
+        return False
+    return _BOT_PATTERN.search(user_agent) is not None
+
+
+def is_bot_request():
+    """Whether the current request comes from a known bot."""
+    return is_bot(request.headers.get("User-Agent", ""))
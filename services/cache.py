@@ -0,0 +1,141 @@
+"""
+Application cache for LTFPQRR.
+
+A small key/value cache shared by the caching features (template fragments,
+page caches). By default it is an in-process LRU with per-key expiry; set
+CACHE_REDIS_URL to share it between workers and hosts through Redis.
+
+Invalidation works by changing a version key, which only reaches other
+workers through a shared cache. With the in-process cache those keys expire
+after SNAPSHOT_TTL (see coherent_timeout()), so other workers serve stale
+fragments and pages for at most that long.
+
+Cache errors never fail a request: a broken backend behaves like a miss.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from extensions import logger
+
+
+class LocalCache:
+    """Thread-safe in-process LRU cache with per-key expiry."""
+
+    shared = False
+
+    def __init__(self, max_entries=2048, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expires_at(self, timeout):
+        if timeout is None:
+            timeout = self.default_timeout
+        return time.monotonic() + timeout if timeout else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        """Store value; timeout None uses the default, 0 never expires."""
+        with self._lock:
+            self._data[key] = (value, self._expires_at(timeout))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Cache stored in Redis, shared by every process."""
+
+    shared = True
+
+    def __init__(self, url, key_prefix="ltfpqrr:", default_timeout=300):
+        import redis
+
+        self.key_prefix = key_prefix
+        self.default_timeout = default_timeout
+        self._client = redis.Redis.from_url(url, socket_connect_timeout=0.5, socket_timeout=0.5)
+
+    def get(self, key):
+        try:
+            value = self._client.get(self.key_prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {e}")
+            return None
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        """Store value; timeout None uses the default, 0 never expires."""
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            self._client.set(self.key_prefix + key, pickle.dumps(value), ex=timeout or None)
+        except Exception as e:
+            logger.warning(f"Cache set failed for {key}: {e}")
+
+    def delete(self, key):
+        try:
+            self._client.delete(self.key_prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache delete failed for {key}: {e}")
+
+    def clear(self):
+        try:
+            keys = list(self._client.scan_iter(f"{self.key_prefix}*"))
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache clear failed: {e}")
+
+
+def init_cache(app):
+    """Create the application cache from the CACHE_* settings."""
+    redis_url = app.config.get("CACHE_REDIS_URL")
+    timeout = app.config.get("CACHE_DEFAULT_TIMEOUT", 300)
+    if redis_url:
+        cache = RedisCache(redis_url, app.config.get("CACHE_KEY_PREFIX", "ltfpqrr:"), timeout)
+    else:
+        cache = LocalCache(app.config.get("CACHE_MAX_ENTRIES", 2048), timeout)
+    app.extensions["ltfpqrr_cache"] = cache
+    return cache
+
+
+def get_cache(app=None):
+    """Return the application cache of app (or the current app)."""
+    app = app or current_app
+    return app.extensions["ltfpqrr_cache"]
+
+
+def coherent_timeout(timeout, app=None):
+    """Lifetime of an entry that other workers must see change, such as a version key.
+
+    A shared cache keeps timeout (0 never expires). The in-process cache caps
+    it at SNAPSHOT_TTL, since a change made in one worker never reaches the
+    others' copies and expiry is what makes them re-read it.
+    """
+    app = app or current_app
+    if get_cache(app).shared:
+        return timeout
+    limit = app.config.get("SNAPSHOT_TTL", 60)
+    return min(timeout, limit) if timeout else limit
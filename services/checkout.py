@@ -0,0 +1,161 @@
+"""
+Checkout sessions for LTFPQRR.
+
+The payment pages ask /payment/stripe/create-intent for a client secret on
+every load or click. Instead of a new PaymentIntent each time, open_checkout()
+ties the user, what is being bought (tag claim or partner subscription, plan)
+and the amount to one CheckoutSession row holding one PaymentIntent, and
+hands the same intent back until it is paid or CHECKOUT_SESSION_TTL seconds
+have passed. A repeat request is one indexed query and no Stripe call.
+
+New intents are created with an idempotency key naming the user, the
+checkout and how many sessions it had before, so two concurrent first clicks
+get the same intent from Stripe (the second insert loses on the unique key
+and reads the winner's row).
+
+The plan being bought is kept on the session and in the intent's metadata
+(pricing_plan_id), so the payment is credited to that plan even when several
+plans share a type and billing period; purchased_plan_id() reads it back.
+
+Payment confirmation (webhook and the confirm route) goes through
+claim_checkout(), which flips the session to 'completed' with a conditional
+UPDATE: whichever arrives second sees it already done and does not record the
+payment again.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from extensions import logger
+
+RECURRING = ("monthly", "yearly")
+
+
+def to_cents(amount):
+    """Amount in the smallest currency unit, without float rounding errors."""
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+def checkout_key(payment_type, subject, subscription_type, amount_cents, currency, pricing_plan_id=None):
+    """Digest of what is being bought; equal keys share a payment intent."""
+    parts = (payment_type, subject, subscription_type, amount_cents, currency.lower(), pricing_plan_id)
+    return hashlib.sha256("|".join(str(part or "") for part in parts).encode()).hexdigest()
+
+
+def stripe_customer_id(client, user):
+    """The user's Stripe customer (from an earlier subscription) or a new one."""
+    from models.models import Subscription
+
+    row = (
+        Subscription.query.with_entities(Subscription.gateway_customer_id)
+        .filter(Subscription.user_id == user.id, Subscription.gateway_customer_id.isnot(None))
+        .order_by(Subscription.id.desc())
+        .first()
+    )
+    if row:
+        return row[0]
+    return client.create_customer(
+        email=user.email, metadata={"user_id": user.id}, idempotency_key=f"customer-{user.id}"
+    )["id"]
+
+
+def open_checkout(client, user, payment_type, amount, currency="usd", subject=None,
+                  subscription_type=None, pricing_plan_id=None, metadata=None, now=None):
+    """The user's open CheckoutSession for this purchase, creating it if needed."""
+    from sqlalchemy.exc import IntegrityError
+    from extensions import db
+    from models.models import CheckoutSession
+
+    now = now or datetime.utcnow()
+    amount_cents = to_cents(amount)
+    currency = currency.lower()
+    subject = str(subject) if subject else None
+    key = checkout_key(payment_type, subject, subscription_type, amount_cents, currency, pricing_plan_id)
+
+    previous = (
+        CheckoutSession.query.filter_by(user_id=user.id, checkout_key=key)
+        .order_by(CheckoutSession.id.desc())
+        .all()
+    )
+    if previous and previous[0].is_reusable(now):
+        return previous[0]
+
+    idempotency_key = f"checkout-{user.id}-{key[:32]}-{len(previous)}"
+    params = {"amount": amount_cents, "currency": currency, "metadata": metadata or {}}
+    # Recurring plans keep the card on a customer for automatic renewals
+    if subscription_type in RECURRING:
+        params["customer"] = stripe_customer_id(client, user)
+        params["setup_future_usage"] = "off_session"
+    intent = client.create_payment_intent(idempotency_key=idempotency_key, **params)
+
+    checkout = CheckoutSession(
+        user_id=user.id,
+        checkout_key=key,
+        payment_type=payment_type,
+        subject=subject,
+        subscription_type=subscription_type,
+        pricing_plan_id=pricing_plan_id,
+        amount=Decimal(amount_cents) / 100,
+        currency=currency.upper(),
+        payment_gateway="stripe",
+        payment_intent_id=intent["id"],
+        client_secret=intent["client_secret"],
+        idempotency_key=idempotency_key,
+        expires_at=now + timedelta(seconds=current_app.config.get("CHECKOUT_SESSION_TTL", 43200)),
+    )
+    db.session.add(checkout)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request created the same intent first
+        db.session.rollback()
+        checkout = CheckoutSession.query.filter_by(idempotency_key=idempotency_key).one()
+    logger.info(f"Checkout {checkout.id} opened with payment intent {checkout.payment_intent_id}")
+    return checkout
+
+
+def claim_checkout(payment_intent_id, now=None):
+    """Mark the intent's checkout completed; False if it already was.
+
+    Runs in the caller's transaction, which must commit: the updated row stays
+    locked until then, so a concurrent confirmation waits and then sees it
+    completed. Intents without a checkout session count as claimed unless a
+    completed payment already records them.
+    """
+    from extensions import db
+    from models.models import CheckoutSession, Payment
+
+    table = CheckoutSession.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.payment_intent_id == payment_intent_id, table.c.status == "open")
+        .values(status="completed", updated_at=now or datetime.utcnow())
+    )
+    if result.rowcount:
+        return True
+    if db.session.query(CheckoutSession.id).filter_by(payment_intent_id=payment_intent_id).first():
+        return False
+    return db.session.query(Payment.id).filter_by(
+        payment_intent_id=payment_intent_id, status="completed"
+    ).first() is None
+
+
+def purchased_plan_id(payment_intent_id, metadata_plan_id=None):
+    """The pricing plan a payment intent was opened for, or None.
+
+    The checkout session is the record; the intent's metadata covers intents
+    without one.
+    """
+    from extensions import db
+    from models.models import CheckoutSession
+
+    if payment_intent_id:
+        row = db.session.query(CheckoutSession.pricing_plan_id).filter_by(
+            payment_intent_id=payment_intent_id
+        ).first()
+        if row and row[0]:
+            return row[0]
+    try:
+        return int(metadata_plan_id) if metadata_plan_id else None
+    except (TypeError, ValueError):
+        return None
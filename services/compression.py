@@ -0,0 +1,84 @@
+"""
+Response compression for LTFPQRR.
+
+HTML and JSON responses above COMPRESS_MIN_SIZE bytes are compressed with
+brotli or gzip, whichever the client prefers (brotli only when the module is
+installed). Files, streamed responses and anything already encoded are left
+alone; fingerprinted static files are precompressed at build time instead.
+
+Responses with a strong ETag (cached pages) are compressed once per encoding;
+the compressed body is remembered under the ETag.
+"""
+import gzip
+from flask import request
+from services.assets import HAS_BROTLI
+from services.cache import LocalCache
+
+if HAS_BROTLI:
+    import brotli
+
+_compressed_bodies = LocalCache(max_entries=256, default_timeout=0)
+
+
+def _choose_encoding(accept_encodings):
+    br = accept_encodings["br"] if HAS_BROTLI else 0
+    gz = accept_encodings["gzip"]
+    if br and br >= gz:
+        return "br"
+    if gz:
+        return "gzip"
+    return None
+
+
+def _should_compress(app, response):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return False
+    if "Content-Encoding" in response.headers:
+        return False
+    if response.mimetype not in app.config.get("COMPRESS_MIMETYPES", ["text/html", "application/json"]):
+        return False
+    return response.content_length is not None and response.content_length >= app.config.get(
+        "COMPRESS_MIN_SIZE", 500
+    )
+
+
+def compress_response(app, response):
+    """Compress response in place if the client accepts it."""
+    if not _should_compress(app, response):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    memo_key = f"{encoding}:{request.path}:{etag}" if etag and not weak else None
+    compressed = _compressed_bodies.get(memo_key) if memo_key else None
+    if compressed is None:
+        data = response.get_data()
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=app.config.get("COMPRESS_BR_LEVEL", 4))
+        else:
+            compressed = gzip.compress(data, compresslevel=app.config.get("COMPRESS_LEVEL", 6))
+        if memo_key:
+            _compressed_bodies.set(memo_key, compressed)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+
+    # The compressed body is a different representation of the same page
+    if memo_key:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Compress responses after every other after_request hook has run."""
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+
+    # after_request hooks run in reverse order of registration, so this
+    # must be registered before the other extensions
+    @app.after_request
+    def _compress(response):
+        return compress_response(app, response)
@@ -0,0 +1,72 @@
+"""
+Dashboard data loaders for LTFPQRR.
+
+Dashboards list a user's tags and pets, and rendering them straight from ORM
+objects issues a query per row (pet.tag, tag.pet, tag.subscriptions). The
+loaders here fetch everything a dashboard shows in a fixed number of
+set-based queries and return plain read-only rows for the templates.
+"""
+from collections import namedtuple
+
+PetCard = namedtuple("PetCard", "id name breed color photo photo_variants tag_id")
+TagRow = namedtuple("TagRow", "id tag_id pet_id pet_name subscription_type subscription_active")
+CustomerDashboard = namedtuple("CustomerDashboard", "tags pets")
+
+
+def _latest_tag_subscriptions(tag_ids_query):
+    """Latest subscription of each tag, keyed by tag id (one query)."""
+    from sqlalchemy import func
+    from extensions import db
+    from models.models import Subscription
+
+    latest_ids = (
+        db.session.query(func.max(Subscription.id))
+        .filter(Subscription.tag_id.in_(tag_ids_query))
+        .group_by(Subscription.tag_id)
+    )
+    subscriptions = Subscription.query.filter(Subscription.id.in_(latest_ids.scalar_subquery())).all()
+    return {subscription.tag_id: subscription for subscription in subscriptions}
+
+
+def load_customer_dashboard(user_id):
+    """Tags and pets of a customer in three queries, whatever their number."""
+    from extensions import db
+    from models.models import Pet, Tag
+
+    owned_tag_ids = db.session.query(Tag.id).filter(Tag.owner_id == user_id)
+    subscriptions = _latest_tag_subscriptions(owned_tag_ids.scalar_subquery())
+
+    tag_rows = (
+        db.session.query(Tag.id, Tag.tag_id, Tag.pet_id, Pet.name)
+        .outerjoin(Pet, Pet.id == Tag.pet_id)
+        .filter(Tag.owner_id == user_id)
+        .order_by(Tag.id)
+        .all()
+    )
+    tags = []
+    for tag_pk, tag_id, pet_id, pet_name in tag_rows:
+        subscription = subscriptions.get(tag_pk)
+        tags.append(TagRow(
+            id=tag_pk,
+            tag_id=tag_id,
+            pet_id=pet_id,
+            pet_name=pet_name,
+            subscription_type=subscription.subscription_type if subscription else None,
+            subscription_active=bool(subscription and subscription.is_active()),
+        ))
+
+    # A pet can have several tags (pet.tag is the first one)
+    pet_rows = (
+        db.session.query(
+            Pet.id, Pet.name, Pet.breed, Pet.color, Pet.photo, Pet.photo_variants, Tag.tag_id
+        )
+        .outerjoin(Tag, Tag.pet_id == Pet.id)
+        .filter(Pet.owner_id == user_id)
+        .order_by(Pet.id, Tag.id)
+        .all()
+    )
+    pets = {}
+    for row in pet_rows:
+        pets.setdefault(row[0], PetCard(*row))
+
+    return CustomerDashboard(tags=tags, pets=list(pets.values()))
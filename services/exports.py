@@ -0,0 +1,281 @@
+"""
+Streaming exports for LTFPQRR.
+
+Users, tags, subscriptions, payments and scan logs export as CSV or NDJSON
+(one JSON object per line). Each export is one SELECT of plain columns run
+with stream_results, which is a server-side cursor on MySQL and PostgreSQL,
+and fetched EXPORT_CHUNK_SIZE rows at a time. stream_export() turns each
+chunk into text and yields it, so a response built on it holds one chunk in
+memory however many rows match, and no ORM objects are created.
+
+The search filters are the admin list views' own (*_search() below), so
+exporting a filtered list gives the same rows as the list. Partners export
+from PARTNER_EXPORTS, which leaves out the finders' IP addresses and browsers.
+CSV cells that a spreadsheet would run as a formula are prefixed with "'".
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# First characters that make a spreadsheet treat a cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def user_search(pattern):
+    """Admin users search."""
+    from extensions import db
+    from models.models import User
+
+    return db.or_(
+        User.username.ilike(pattern),
+        User.email.ilike(pattern),
+        User.first_name.ilike(pattern),
+        User.last_name.ilike(pattern),
+    )
+
+
+def subscription_search(pattern):
+    """Admin subscriptions search; the subscription's user must be joined."""
+    from extensions import db
+    from models.models import Subscription
+
+    return db.or_(
+        user_search(pattern),
+        Subscription.subscription_type.ilike(pattern),
+        Subscription.status.ilike(pattern),
+        Subscription.payment_method.ilike(pattern),
+    )
+
+
+def payment_search(pattern):
+    """Admin payments search; the payment's user must be joined."""
+    from extensions import db
+    from models.models import Payment, User
+
+    return db.or_(
+        User.username.ilike(pattern),
+        User.email.ilike(pattern),
+        Payment.transaction_id.ilike(pattern),
+        Payment.payment_intent_id.ilike(pattern),
+        Payment.status.ilike(pattern),
+    )
+
+
+def tag_search(pattern, creator, owner):
+    """Admin tags search; creator and owner are User aliases joined to the tag."""
+    from extensions import db
+    from models.models import Tag
+
+    return db.or_(
+        Tag.tag_id.ilike(pattern),
+        Tag.status.ilike(pattern),
+        creator.username.ilike(pattern),
+        creator.email.ilike(pattern),
+        owner.username.ilike(pattern),
+        owner.email.ilike(pattern),
+    )
+
+
+# Each returns (statement, date column, partner column or None)
+
+def _users(pattern):
+    from sqlalchemy import select
+    from models.models import User
+
+    statement = select(
+        User.id, User.username, User.email, User.first_name, User.last_name, User.phone, User.created_at,
+    )
+    if pattern:
+        statement = statement.where(user_search(pattern))
+    return statement, User.created_at, None
+
+
+def _tags(pattern):
+    from sqlalchemy import select
+    from extensions import db
+    from models.models import Tag, User
+
+    creator = db.aliased(User)
+    owner = db.aliased(User)
+    statement = (
+        select(
+            Tag.id, Tag.tag_id, Tag.status, Tag.partner_id,
+            creator.username.label("created_by"), owner.username.label("owner"),
+            Tag.pet_id, Tag.created_at, Tag.updated_at,
+        )
+        .outerjoin(creator, Tag.created_by == creator.id)
+        .outerjoin(owner, Tag.owner_id == owner.id)
+    )
+    if pattern:
+        statement = statement.where(tag_search(pattern, creator, owner))
+    return statement, Tag.created_at, Tag.partner_id
+
+
+def _subscriptions(pattern):
+    from sqlalchemy import select
+    from models.models import Subscription, User
+
+    statement = select(
+        Subscription.id, Subscription.user_id, User.email.label("user_email"), Subscription.subscription_type,
+        Subscription.status, Subscription.tag_id, Subscription.partner_id, Subscription.pricing_plan_id,
+        Subscription.amount, Subscription.payment_method, Subscription.admin_approved,
+        Subscription.start_date, Subscription.end_date, Subscription.auto_renew, Subscription.created_at,
+    ).join(User, Subscription.user_id == User.id)
+    if pattern:
+        statement = statement.where(subscription_search(pattern))
+    return statement, Subscription.created_at, Subscription.partner_id
+
+
+def _payments(pattern):
+    from sqlalchemy import select
+    from models.models import Payment, User
+
+    # Not the deferred JSON blobs
+    statement = select(
+        Payment.id, Payment.user_id, User.email.label("user_email"), Payment.subscription_id,
+        Payment.payment_gateway, Payment.payment_type, Payment.pricing_plan_id, Payment.status,
+        Payment.amount, Payment.currency, Payment.transaction_id, Payment.payment_intent_id,
+        Payment.processed_at, Payment.created_at,
+    ).join(User, Payment.user_id == User.id)
+    if pattern:
+        statement = statement.where(payment_search(pattern))
+    return statement, Payment.created_at, None
+
+
+def _scans(pattern):
+    from sqlalchemy import select
+    from models.models import SearchLog, Tag
+
+    statement = select(
+        SearchLog.id, Tag.tag_id, SearchLog.timestamp, SearchLog.ip_address, SearchLog.user_agent,
+    ).join(Tag, SearchLog.tag_id == Tag.id)
+    if pattern:
+        statement = statement.where(Tag.tag_id.ilike(pattern))
+    return statement, SearchLog.timestamp, Tag.partner_id
+
+
+def _partner_scans(pattern):
+    from sqlalchemy import select
+    from models.models import SearchLog, Tag
+
+    statement = select(SearchLog.id, Tag.tag_id, SearchLog.timestamp).join(Tag, SearchLog.tag_id == Tag.id)
+    if pattern:
+        statement = statement.where(Tag.tag_id.ilike(pattern))
+    return statement, SearchLog.timestamp, Tag.partner_id
+
+
+EXPORTS = {
+    "users": _users,
+    "tags": _tags,
+    "subscriptions": _subscriptions,
+    "payments": _payments,
+    "scans": _scans,
+}
+
+# What partners may export about their own tags
+PARTNER_EXPORTS = {
+    "tags": _tags,
+    "scans": _partner_scans,
+}
+
+
+def export_statement(name, search="", partner_id=None, start=None, end=None, exports=EXPORTS):
+    """The SELECT of an export, oldest row first.
+
+    search is the admin list search; partner_id limits tags, subscriptions
+    and scans to one partner; start and end are dates, both inclusive.
+    exports is EXPORTS or PARTNER_EXPORTS.
+    """
+    statement, date_column, partner_column = exports[name](f"%{search}%" if search else None)
+    if partner_id is not None:
+        if partner_column is None:
+            raise KeyError(name)
+        statement = statement.where(partner_column == partner_id)
+    if start:
+        statement = statement.where(date_column >= datetime.combine(start, datetime.min.time()))
+    if end:
+        statement = statement.where(date_column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return statement.order_by(statement.selected_columns[0])
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv_cell(value):
+    # Text such as names and tag IDs comes from users
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return _plain(value)
+
+
+def _csv_chunk(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerows([_csv_cell(value) for value in row] for row in rows)
+    return output.getvalue()
+
+
+def _ndjson_chunk(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, (_plain(value) for value in row)))) + "\n" for row in rows
+    )
+
+
+def stream_export(name, fmt, chunk_size=None, **filters):
+    """Generator of text chunks of an export in fmt ("csv" or "ndjson").
+
+    Raises KeyError for an unknown export, format or filter before anything
+    is queried.
+    """
+    from extensions import db
+
+    if fmt not in EXPORT_FORMATS:
+        raise KeyError(fmt)
+    statement = export_statement(name, **filters)
+    chunk_size = chunk_size or current_app.config.get("EXPORT_CHUNK_SIZE", 1000)
+
+    def generate():
+        result = db.session.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+        try:
+            columns = list(result.keys())
+            if fmt == "csv":
+                yield _csv_chunk([columns])
+            for rows in result.partitions():
+                yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(columns, rows)
+        finally:
+            result.close()
+
+    return generate()
+
+
+def export_response(name, fmt, filename, **filters):
+    """A streamed download of an export; the request context lasts until it is sent."""
+    from flask import Response, stream_with_context
+
+    chunks = stream_export(name, fmt, **filters)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{fmt}",
+            # Let proxies pass chunks on as they come
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+def parse_day(value):
+    """A YYYY-MM-DD query argument as a date, or None."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,147 @@
+"""
+Template fragment caching for LTFPQRR.
+
+Usage in a template:
+
+    {% cache "navigation", request.endpoint %} ... {% endcache %}
+
+The rendered block is stored in the application cache under the fragment
+name, the current user's id and version, and the extra arguments (anything
+else the block depends on, such as the active endpoint). A user's version
+changes whenever their roles, name or partner memberships change, so the
+fragment is rendered again once per change instead of once per page view.
+"""
+import hashlib
+import uuid
+from flask import current_app, has_app_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from services.cache import coherent_timeout, get_cache
+from services.metrics import observe_cache
+
+_PENDING_KEY = "ltfpqrr_user_version_changes"
+_events_registered = False
+
+
+def _version_key(user_id):
+    return f"user_version:{user_id}"
+
+
+def user_version(user_id):
+    """Current version token of a user (created on first use)."""
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = bump_user_version(user_id)
+    return version
+
+
+def bump_user_version(user_id):
+    """Give the user a new version so their cached fragments are not reused.
+
+    Versions are random tokens rather than counters: a version that was
+    evicted from the cache can never come back and match old fragments.
+    Without a shared cache the bump only reaches this worker, so versions
+    expire after SNAPSHOT_TTL and other workers pick a new one by then.
+    """
+    version = uuid.uuid4().hex
+    get_cache().set(_version_key(user_id), version, timeout=coherent_timeout(0))
+    return version
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the {% cache name, *vary %}...{% endcache %} tag."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, args, caller):
+        if not current_app.config.get("FRAGMENT_CACHE_ENABLED", True):
+            return caller()
+
+        from flask_login import current_user
+
+        name, vary = args[0], args[1:]
+        if current_user and current_user.is_authenticated:
+            user_key = f"{current_user.id}:{user_version(current_user.id)}"
+        else:
+            user_key = "anonymous"
+        digest = hashlib.sha1(repr(vary).encode("utf-8")).hexdigest()
+        key = f"fragment:{name}:{user_key}:{digest}"
+
+        cache = get_cache()
+        rendered = cache.get(key)
+        observe_cache("fragment", rendered is not None)
+        if rendered is None:
+            rendered = caller()
+            cache.set(key, str(rendered), timeout=current_app.config.get("FRAGMENT_CACHE_TIMEOUT", 3600))
+        return Markup(rendered)
+
+
+def _mark_user_changed(user):
+    """Queue a version bump for when the user's session commits."""
+    from sqlalchemy.orm import object_session
+
+    session = object_session(user)
+    if session is not None and user.id is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(user.id)
+
+
+def _register_user_version_events():
+    global _events_registered
+    if _events_registered:
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from models.models import User
+    from models.partner.partner import Partner
+
+    def roles_changed(target, value, initiator):
+        _mark_user_changed(target)
+
+    def name_changed(target, value, oldvalue, initiator):
+        if value != oldvalue:
+            _mark_user_changed(target)
+
+    def partner_users_changed(target, value, initiator):
+        _mark_user_changed(value)
+
+    for identifier in ("append", "remove"):
+        event.listen(User.roles, identifier, roles_changed)
+        event.listen(Partner.users, identifier, partner_users_changed)
+    event.listen(User.roles, "bulk_replace", lambda target, values, initiator: _mark_user_changed(target))
+    event.listen(User.first_name, "set", name_changed)
+    event.listen(User.last_name, "set", name_changed)
+
+    # Bump after commit so a concurrent render cannot cache the old state
+    # under the new version
+    @event.listens_for(Session, "after_commit")
+    def bump_changed_users(session):
+        changed = session.info.pop(_PENDING_KEY, ())
+        if not has_app_context():
+            return
+        for user_id in changed:
+            bump_user_version(user_id)
+
+    @event.listens_for(Session, "after_rollback")
+    def forget_changed_users(session):
+        session.info.pop(_PENDING_KEY, None)
+
+    _events_registered = True
+
+
+def init_fragment_cache(app):
+    """Register the {% cache %} tag and the user version events."""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    _register_user_version_events()
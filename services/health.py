@@ -0,0 +1,224 @@
+"""
+Health checks for LTFPQRR.
+
+Dependency probes (database pool, Celery broker, SMTP server) run in a
+background thread per process and store their latest result, so /readyz only
+reads cached values and never adds load or latency to the dependencies.
+
+Usage (wait for the database before starting the server):
+    python -m services.health wait-db
+"""
+import os
+import socket
+import sys
+import threading
+import time
+from extensions import logger
+
+_lock = threading.Lock()
+_results = {}
+_probe_thread = None
+_probe_pid = None
+_probes_deferred = False
+_ready = False
+
+
+def mark_ready():
+    """Open the readiness gate (called once warm-up has finished)."""
+    global _ready
+    _ready = True
+
+
+def is_ready():
+    """Check whether this process has finished warming up."""
+    return _ready
+
+
+def probe_database(app):
+    """Check out a pooled connection and run a trivial statement."""
+    from sqlalchemy import text
+    from extensions import db
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        pool = db.engine.pool
+        return {"pool": pool.status() if hasattr(pool, "status") else type(pool).__name__}
+
+
+def probe_broker(app):
+    """Ping the Celery broker (Redis)."""
+    broker_url = app.config.get("CELERY_BROKER_URL")
+    if not broker_url or not broker_url.startswith("redis"):
+        return {"skipped": "broker is not redis"}
+
+    import redis
+    timeout = app.config.get("HEALTH_PROBE_TIMEOUT", 2.0)
+    client = redis.Redis.from_url(
+        broker_url, socket_connect_timeout=timeout, socket_timeout=timeout
+    )
+    try:
+        client.ping()
+    finally:
+        client.close()
+    return {}
+
+
+def probe_smtp(app):
+    """Open a TCP connection to the configured SMTP server."""
+    from email_utils import get_smtp_config
+
+    with app.app_context():
+        smtp_config = get_smtp_config()
+    server = smtp_config.get("smtp_server")
+    if not server:
+        return {"skipped": "smtp not configured"}
+
+    port = smtp_config.get("smtp_port", 587)
+    timeout = app.config.get("HEALTH_PROBE_TIMEOUT", 2.0)
+    with socket.create_connection((server, port), timeout=timeout):
+        pass
+    return {"server": f"{server}:{port}"}
+
+
+PROBES = {
+    "database": probe_database,
+    "broker": probe_broker,
+    "smtp": probe_smtp,
+}
+
+
+def run_probes(app):
+    """Run every probe once and store the results."""
+    for name, probe in PROBES.items():
+        started = time.perf_counter()
+        try:
+            details = probe(app) or {}
+            result = {"ok": True, **details}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["checked_at"] = time.time()
+        with _lock:
+            _results[name] = result
+
+
+def _probe_loop(app, interval):
+    while True:
+        try:
+            run_probes(app)
+        except Exception as e:
+            logger.error(f"Health probe loop error: {e}")
+        time.sleep(interval)
+
+
+def defer_probes():
+    """Keep the probe thread from starting in this process.
+
+    Used in the gunicorn master before it forks: a thread holding _lock at
+    fork time would leave the lock held forever in the worker.
+    """
+    global _probes_deferred
+    _probes_deferred = True
+
+
+def resume_probes(app):
+    """Allow the probe thread again and start it (called in a forked worker)."""
+    global _probes_deferred
+    _probes_deferred = False
+    start_probes(app)
+
+
+def start_probes(app):
+    """Start the background probe thread for this process (no-op if running)."""
+    global _probe_thread, _probe_pid
+    if _probes_deferred:
+        return
+    # Threads do not survive fork, so track the process that owns the thread
+    if _probe_thread is not None and _probe_pid == os.getpid() and _probe_thread.is_alive():
+        return
+    with _lock:
+        if _probe_thread is not None and _probe_pid == os.getpid() and _probe_thread.is_alive():
+            return
+        interval = app.config.get("HEALTH_PROBE_INTERVAL", 10)
+        _probe_thread = threading.Thread(
+            target=_probe_loop, args=(app, interval), name="health-probes", daemon=True
+        )
+        _probe_pid = os.getpid()
+        _probe_thread.start()
+
+
+def init_health(app):
+    """Prime the probes during warm-up so /readyz has results immediately."""
+    from services.warmup import register_warmer
+
+    def prime_probes(app):
+        run_probes(app)
+        start_probes(app)
+
+    register_warmer("health_probes", prime_probes)
+
+
+def get_probe_results():
+    """Copy of the latest probe results."""
+    with _lock:
+        return {name: dict(result) for name, result in _results.items()}
+
+
+def readiness(app):
+    """Compute readiness from the cached probe results.
+
+    Returns (ready, details). A probe result older than three probe intervals
+    counts as failing, so a stuck probe thread cannot report stale success.
+    """
+    interval = app.config.get("HEALTH_PROBE_INTERVAL", 10)
+    critical = app.config.get("HEALTH_CRITICAL_PROBES", ["database", "broker"])
+    results = get_probe_results()
+    now = time.time()
+
+    checks = {}
+    ready = is_ready()
+    for name in PROBES:
+        result = results.get(name)
+        if result is None:
+            checks[name] = {"ok": False, "error": "pending"}
+        elif now - result["checked_at"] > interval * 3:
+            checks[name] = {**result, "ok": False, "error": "stale"}
+        else:
+            checks[name] = result
+        if name in critical and not checks[name]["ok"]:
+            ready = False
+
+    return ready, {"warmed": is_ready(), "checks": checks}
+
+
+def wait_for_database(url, timeout=120):
+    """Block until the database accepts connections (used by the start script)."""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(url, pool_pre_ping=True)
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    try:
+        while True:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                if time.monotonic() >= deadline:
+                    print(f"Database connection failed: {e}")
+                    return False
+                print(f"Database not ready, retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
+                delay = min(delay * 2, 5)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "wait-db":
+        db_url = os.environ.get("DATABASE_URL", "sqlite:///ltfpqrr.db")
+        sys.exit(0 if wait_for_database(db_url) else 1)
+    print("Usage: python -m services.health wait-db")
+    sys.exit(2)
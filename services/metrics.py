@@ -0,0 +1,244 @@
+"""
+Prometheus metrics for LTFPQRR.
+
+Request latency is recorded per blueprint endpoint, database time is measured
+with SQLAlchemy cursor events and the remaining helpers are called from the
+code paths they measure (caches, email delivery, tag scans).
+
+When the PROMETHEUS_MULTIPROC_DIR environment variable is set (gunicorn), the
+values are written to shared files and aggregated across workers at scrape time.
+"""
+import os
+import time
+from contextlib import contextmanager
+from flask import g, request
+from extensions import logger
+
+# Optional imports with fallbacks
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Histogram,
+        generate_latest,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+if HAS_PROMETHEUS:
+    REQUEST_LATENCY = Histogram(
+        "ltfpqrr_http_request_duration_seconds",
+        "HTTP request latency by blueprint endpoint",
+        ["blueprint", "endpoint", "method", "status"],
+    )
+    DB_TIME = Histogram(
+        "ltfpqrr_db_query_duration_seconds",
+        "Database statement execution time",
+        ["endpoint"],
+        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    )
+    DB_QUERIES = Counter(
+        "ltfpqrr_db_queries_total",
+        "Database statements executed",
+        ["endpoint"],
+    )
+    CACHE_REQUESTS = Counter(
+        "ltfpqrr_cache_requests_total",
+        "Cache lookups by cache name and result (hit or miss)",
+        ["cache", "result"],
+    )
+    EMAIL_LATENCY = Histogram(
+        "ltfpqrr_email_send_duration_seconds",
+        "Time spent delivering an email over SMTP",
+        ["result"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    )
+    TAG_SCANS = Counter(
+        "ltfpqrr_tag_scans_total",
+        "Found-pet tag scans",
+        ["channel", "result"],
+    )
+    RATE_LIMITED = Counter(
+        "ltfpqrr_rate_limited_total",
+        "Requests rejected by a rate limit",
+        ["endpoint", "scope"],
+    )
+    GATEWAY_LATENCY = Histogram(
+        "ltfpqrr_gateway_request_duration_seconds",
+        "Payment gateway API calls by operation and result",
+        ["gateway", "operation", "result"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0),
+    )
+
+
+def init_metrics(app):
+    """Register request timing hooks and database listeners."""
+    if not HAS_PROMETHEUS:
+        logger.warning("prometheus_client is not installed, metrics are disabled")
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request_latency(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            REQUEST_LATENCY.labels(
+                blueprint=request.blueprint or "",
+                endpoint=_endpoint_label(),
+                method=request.method,
+                status=str(response.status_code),
+            ).observe(time.perf_counter() - started)
+        return response
+
+    # Listen on the Engine class so no engine has to exist yet
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _endpoint_label():
+    """Endpoint label for the current request; unmatched URLs share one label."""
+    try:
+        if request.url_rule is not None:
+            return request.url_rule.endpoint
+    except RuntimeError:
+        return "none"
+    return "unmatched"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the statement's own execution context, so a statement that raises
+    # leaves nothing behind on the pooled connection
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    try:
+        endpoint = _endpoint_label() if request else "none"
+    except RuntimeError:
+        endpoint = "none"
+    DB_TIME.labels(endpoint=endpoint).observe(elapsed)
+    DB_QUERIES.labels(endpoint=endpoint).inc()
+
+
+def observe_cache(cache_name, hit):
+    """Record a cache lookup result."""
+    if HAS_PROMETHEUS:
+        CACHE_REQUESTS.labels(cache=cache_name, result="hit" if hit else "miss").inc()
+
+
+def count_scan(channel="page", result="found"):
+    """Record a tag scan (channel: page, api; result: found, unregistered, invalid)."""
+    if HAS_PROMETHEUS:
+        TAG_SCANS.labels(channel=channel, result=result).inc()
+
+
+def count_rate_limited(endpoint, scope):
+    """Record a request rejected by the rate limit of scope (ip, tag)."""
+    if HAS_PROMETHEUS:
+        RATE_LIMITED.labels(endpoint=endpoint, scope=scope).inc()
+
+
+def observe_gateway(gateway, operation, result, seconds):
+    """Record one payment gateway API attempt (result: ok or the error kind)."""
+    if HAS_PROMETHEUS:
+        GATEWAY_LATENCY.labels(gateway=gateway, operation=operation, result=result).observe(seconds)
+
+
+@contextmanager
+def time_email():
+    """Time an email delivery; exceptions are recorded as errors and re-raised."""
+    started = time.perf_counter()
+    outcome = {"result": "sent"}
+    try:
+        yield outcome
+    except Exception:
+        outcome["result"] = "error"
+        raise
+    finally:
+        if HAS_PROMETHEUS:
+            EMAIL_LATENCY.labels(result=outcome["result"]).observe(time.perf_counter() - started)
+
+
+class CeleryQueueCollector:
+    """Reports Celery queue depth by asking the Redis broker at scrape time."""
+
+    def __init__(self, broker_url, queues):
+        self.broker_url = broker_url
+        self.queues = queues
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(
+                self.broker_url, socket_connect_timeout=0.5, socket_timeout=0.5
+            )
+        return self._client
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "ltfpqrr_celery_queue_depth",
+            "Messages waiting in each Celery queue",
+            labels=["queue"],
+        )
+        if self.broker_url and self.broker_url.startswith("redis"):
+            try:
+                client = self._redis()
+                for queue in self.queues:
+                    family.add_metric([queue], client.llen(queue))
+            except Exception as e:
+                logger.warning(f"Could not read Celery queue depth: {e}")
+        yield family
+
+
+def render_metrics(app):
+    """Render all metrics in the Prometheus text format."""
+    if not HAS_PROMETHEUS:
+        return b"", CONTENT_TYPE_LATEST
+
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY
+        registry = REGISTRY
+
+    queue_collector = app.extensions.get("ltfpqrr_queue_collector")
+    if queue_collector is None:
+        queue_collector = CeleryQueueCollector(
+            app.config.get("CELERY_BROKER_URL"),
+            app.config.get("METRICS_CELERY_QUEUES", ["celery"]),
+        )
+        app.extensions["ltfpqrr_queue_collector"] = queue_collector
+
+    output = generate_latest(registry)
+    output += generate_latest(_SingleCollectorRegistry(queue_collector))
+    return output, CONTENT_TYPE_LATEST
+
+
+class _SingleCollectorRegistry:
+    """Minimal registry wrapper so a collector can be rendered on its own."""
+
+    def __init__(self, collector):
+        self._collector = collector
+
+    def collect(self):
+        return self._collector.collect()
@@ -0,0 +1,191 @@
+"""
+Anonymous full-page cache for LTFPQRR.
+
+Public pages look the same for every anonymous visitor, so their rendered
+responses are stored in the application cache, keyed by path, the query
+arguments the view actually reads and the generation of each invalidation
+tag. Cached pages carry a strong ETag; a matching If-None-Match gets a 304
+without running the view.
+
+Pages are invalidated by tag: invalidate_pages("pricing") gives the tag a new
+generation, so every key built with the old generation is no longer used.
+Tag and Pet changes invalidate the found page of the affected tag IDs.
+Invalidation reaches every worker only through a shared cache
+(CACHE_REDIS_URL); with the in-process cache, generations and pages expire
+after at most SNAPSHOT_TTL instead.
+"""
+import hashlib
+import uuid
+from functools import wraps
+from flask import current_app, g, has_app_context, make_response, request, session
+from flask_login import current_user
+from werkzeug.wrappers import Response
+from services.cache import coherent_timeout, get_cache
+from services.metrics import observe_cache
+
+_PENDING_KEY = "ltfpqrr_page_cache_tags"
+_events_registered = False
+
+
+def _generation(tag):
+    cache = get_cache()
+    generation = cache.get(f"page_gen:{tag}")
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(f"page_gen:{tag}", generation, timeout=coherent_timeout(0))
+    return generation
+
+
+def invalidate_pages(*tags):
+    """Drop every cached page built with one of the given tags."""
+    cache = get_cache()
+    for tag in tags:
+        cache.set(f"page_gen:{tag}", uuid.uuid4().hex, timeout=coherent_timeout(0))
+
+
+def found_page_tag(tag_id):
+    """Invalidation tag of the found page of a tag ID (case-insensitive)."""
+    return f"found:{tag_id.upper()}"
+
+
+def invalidate_found_page_on_commit(session, tag_id):
+    """Invalidate a found page when session commits.
+
+    For bulk UPDATEs of tags, which the flush events do not see.
+    """
+    session.info.setdefault(_PENDING_KEY, set()).add(found_page_tag(tag_id))
+
+
+def set_page_meta(**meta):
+    """Attach data to the cached page; it is passed to on_hit on every hit."""
+    g.page_cache_meta = meta
+
+
+def _cacheable_request():
+    if not current_app.config.get("PAGE_CACHE_ENABLED", True):
+        return False
+    if request.method not in ("GET", "HEAD"):
+        return False
+    # Flashed messages are rendered into the page
+    if session.get("_flashes"):
+        return False
+    return not current_user.is_authenticated
+
+
+def _cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and "Set-Cookie" not in response.headers
+        and not session.modified
+    )
+
+
+def _page_key(query_args, tags):
+    args = "&".join(f"{name}={request.args.get(name, '')}" for name in query_args)
+    generations = ",".join(_generation(tag) for tag in tags)
+    return f"page:{request.path}?{args}|{generations}"
+
+
+def _set_cache_headers(response, etag):
+    response.set_etag(etag)
+    # Browsers revalidate every time (cheap 304s); shared caches must not
+    # give the anonymous page to a signed-in user
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Cookie")
+
+
+def _cached_response(entry):
+    # If-None-Match uses weak comparison: compressed responses carry W/"..."
+    if request.if_none_match.contains_weak(entry["etag"]):
+        response = Response(status=304)
+    else:
+        response = Response(entry["body"], status=200, content_type=entry["content_type"])
+    _set_cache_headers(response, entry["etag"])
+    return response
+
+
+def cache_page(ttl="PAGE_CACHE_TTL", query_args=(), tags=(), on_hit=None):
+    """Cache a view's response for anonymous visitors.
+
+    ttl names the config setting holding the lifetime in seconds, query_args
+    are the request arguments that change the page, tags is a list of
+    invalidation tags or a function of the view arguments returning one, and
+    on_hit(meta) runs on every cache hit (see set_page_meta).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable_request():
+                return view(*args, **kwargs)
+
+            page_tags = tags(**kwargs) if callable(tags) else tags
+            key = _page_key(query_args, page_tags)
+            cache = get_cache()
+            entry = cache.get(key)
+            observe_cache("page", entry is not None)
+            if entry is not None:
+                if on_hit is not None:
+                    on_hit(entry["meta"])
+                return _cached_response(entry)
+
+            g.page_cache_meta = {}
+            response = make_response(view(*args, **kwargs))
+            if not _cacheable_response(response):
+                return response
+
+            body = response.get_data()
+            entry = {
+                "body": body,
+                "content_type": response.content_type,
+                "etag": hashlib.sha1(body).hexdigest(),
+                "meta": g.page_cache_meta,
+            }
+            cache.set(key, entry, timeout=coherent_timeout(current_app.config.get(ttl, 300)))
+            _set_cache_headers(response, entry["etag"])
+            return response.make_conditional(request)
+
+        return wrapper
+    return decorator
+
+
+def _register_invalidation_events():
+    global _events_registered
+    if _events_registered:
+        return
+
+    from sqlalchemy import event, inspect as sa_inspect, select
+    from sqlalchemy.orm import Session
+    from models.models import Pet, Tag
+
+    @event.listens_for(Session, "after_flush")
+    def collect_changed_found_pages(session, flush_context):
+        changed = session.info.setdefault(_PENDING_KEY, set())
+        pet_ids = []
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Tag):
+                changed.add(found_page_tag(obj.tag_id))
+                history = sa_inspect(obj).attrs.tag_id.history
+                changed.update(found_page_tag(old) for old in history.deleted or () if old)
+            elif isinstance(obj, Pet) and obj.id is not None:
+                pet_ids.append(obj.id)
+        if pet_ids:
+            rows = session.connection().execute(select(Tag.tag_id).where(Tag.pet_id.in_(pet_ids)))
+            changed.update(found_page_tag(tag_id) for (tag_id,) in rows)
+
+    @event.listens_for(Session, "after_commit")
+    def invalidate_changed_found_pages(session):
+        changed = session.info.pop(_PENDING_KEY, ())
+        if changed and has_app_context():
+            invalidate_pages(*changed)
+
+    @event.listens_for(Session, "after_rollback")
+    def forget_changed_found_pages(session):
+        session.info.pop(_PENDING_KEY, None)
+
+    _events_registered = True
+
+
+def init_page_cache(app):
+    """Register the ORM events that invalidate found pages."""
+    _register_invalidation_events()
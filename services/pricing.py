@@ -0,0 +1,112 @@
+"""
+Pricing catalog for LTFPQRR.
+
+Every active PricingPlan is loaded once into an immutable PricingCatalog,
+indexed by id and by (plan_type, billing_period). The claim form, the payment
+pages, checkout (services/checkout.py), payment processing and the homepage
+all read prices from it, so they agree with each other and with the admin
+pricing pages, and none of them queries pricing_plans per request.
+
+The catalog is a snapshot (services/snapshots.py): it is reloaded after
+SNAPSHOT_TTL seconds, or at once in the process where an admin pricing route
+calls pricing_catalog.invalidate().
+"""
+from collections import namedtuple
+from decimal import Decimal
+from types import MappingProxyType
+from services.snapshots import Snapshot
+
+PERIOD_UNITS = {"monthly": "month", "yearly": "year"}
+
+_PLAN_FIELDS = (
+    "id name description price currency billing_period plan_type max_tags max_pets "
+    "features requires_approval is_featured show_on_homepage sort_order"
+)
+
+
+class Plan(namedtuple("Plan", _PLAN_FIELDS)):
+    """A read-only PricingPlan, with the display helpers templates use."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_model(cls, plan):
+        features = plan.features.get("features", []) if isinstance(plan.features, dict) else []
+        return cls(
+            plan.id, plan.name, plan.description, Decimal(plan.price), plan.currency or "USD",
+            plan.billing_period, plan.plan_type, plan.max_tags or 0, plan.max_pets or 0,
+            tuple(features), bool(plan.requires_approval), bool(plan.is_featured),
+            bool(plan.show_on_homepage), plan.sort_order or 0,
+        )
+
+    def get_features_list(self):
+        return list(self.features)
+
+    def get_price_display(self):
+        return f"${self.price:.2f}"
+
+    def get_max_tags_display(self):
+        return "Unlimited" if self.max_tags == 0 else str(self.max_tags)
+
+    def get_max_pets_display(self):
+        return "Unlimited" if self.max_pets == 0 else str(self.max_pets)
+
+    def choice_label(self):
+        """Label for a subscription type select, e.g. 'Monthly ($9.99/month)'."""
+        unit = PERIOD_UNITS.get(self.billing_period)
+        price = f"{self.get_price_display()}/{unit}" if unit else self.get_price_display()
+        return f"{self.billing_period.title()} ({price})"
+
+
+class PricingCatalog:
+    """Active pricing plans in display order, with lookups by id and key."""
+
+    def __init__(self, plans):
+        self.plans = tuple(sorted(plans, key=lambda plan: (plan.sort_order, plan.id)))
+        by_key = {}
+        for plan in self.plans:
+            # The first plan in display order wins for a (type, period) key
+            by_key.setdefault((plan.plan_type, plan.billing_period), plan)
+        self._by_key = MappingProxyType(by_key)
+        self._by_id = MappingProxyType({plan.id: plan for plan in self.plans})
+        self.homepage = tuple(plan for plan in self.plans if plan.show_on_homepage)
+
+    def get(self, plan_type, billing_period):
+        """The plan for (plan_type, billing_period), or None."""
+        return self._by_key.get((plan_type, billing_period))
+
+    def by_id(self, plan_id):
+        """The active plan with that id (int or numeric string), or None."""
+        try:
+            return self._by_id.get(int(plan_id))
+        except (TypeError, ValueError):
+            return None
+
+    def for_type(self, plan_type):
+        """Plans of one type, in display order."""
+        return tuple(plan for plan in self.plans if plan.plan_type == plan_type)
+
+    def price(self, plan_type, billing_period):
+        """Price of the (plan_type, billing_period) plan, or None."""
+        plan = self.get(plan_type, billing_period)
+        return plan.price if plan else None
+
+    def choices(self, plan_type):
+        """(billing_period, label) pairs for a subscription type select."""
+        return [(plan.billing_period, plan.choice_label())
+                for plan in self.for_type(plan_type)
+                if self.get(plan_type, plan.billing_period) is plan]
+
+
+def _load_catalog():
+    from models.models import PricingPlan
+
+    return PricingCatalog(Plan.from_model(plan) for plan in PricingPlan.query.filter_by(is_active=True))
+
+
+pricing_catalog = Snapshot("pricing", _load_catalog)
+
+
+def get_pricing_catalog():
+    """The current PricingCatalog."""
+    return pricing_catalog.get()
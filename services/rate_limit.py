@@ -0,0 +1,204 @@
+"""
+Rate limiting for LTFPQRR.
+
+The scan endpoints are public: a scraper enumerating tag IDs costs database
+queries and SearchLog rows, and the contact form emails owners. Requests to
+an endpoint listed in RATE_LIMITS take a token from a bucket per client IP
+and/or per tag ID; an empty bucket means 429 with Retry-After. The IP buckets
+are checked first and the first empty bucket stops the check, so a rejected
+request takes no tag tokens. The check runs in before_request, before the
+view (and before any database work).
+
+Policies map an endpoint, optionally suffixed with ":<METHOD>", to limits per
+scope; both the endpoint and the endpoint:METHOD policy apply:
+
+    RATE_LIMITS = {
+        "tag.found_pet": {"ip": "60/minute", "tag": "120/minute"},
+        "tag.contact_owner:POST": {"ip": "5/hour", "tag": "20/day"},
+    }
+
+A limit "N/period" (period: second, minute, hour or day) allows bursts of N
+requests and refills N tokens per period. Buckets live in process memory, or
+in Redis when RATE_LIMIT_REDIS_URL is set so that every worker shares them. A
+Redis error lets the request through.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import TooManyRequests
+from extensions import logger
+from services.metrics import count_rate_limited
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+Limit = namedtuple("Limit", "capacity period")
+
+# Atomic token bucket: refill since the last request, then take one token.
+# Uses the Redis clock so that hosts with skewed clocks share buckets.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+def parse_limit(text):
+    """Parse "N/period" into a Limit."""
+    try:
+        count, period = text.split("/")
+        return Limit(int(count), PERIODS[period.strip()])
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit {text!r}, expected e.g. '60/minute'") from None
+
+
+class LocalRateStore:
+    """Token buckets in process memory (least recently used are dropped)."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """Take a token; returns 0 or the seconds until one is available."""
+        rate = limit.capacity / limit.period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * rate)
+            retry_after = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisRateStore:
+    """Token buckets in Redis, shared by every process."""
+
+    def __init__(self, url, key_prefix="ltfpqrr:rl:"):
+        import redis
+
+        self.key_prefix = key_prefix
+        self._client = redis.Redis.from_url(url, socket_connect_timeout=0.5, socket_timeout=0.5)
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, limit):
+        """Take a token; returns 0 or the seconds until one is available."""
+        try:
+            retry_after = self._script(
+                keys=[self.key_prefix + key], args=[limit.capacity, limit.capacity / limit.period]
+            )
+            return float(retry_after)
+        except Exception as e:
+            logger.warning(f"Rate limit check failed for {key}: {e}")
+            return 0
+
+    def clear(self):
+        try:
+            keys = list(self._client.scan_iter(f"{self.key_prefix}*"))
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Rate limit clear failed: {e}")
+
+
+def client_ip():
+    """Client address, skipping RATE_LIMIT_PROXY_COUNT trusted proxies."""
+    proxies = current_app.config.get("RATE_LIMIT_PROXY_COUNT", 0)
+    route = request.access_route
+    if proxies and len(route) > proxies:
+        # access_route lists X-Forwarded-For addresses, nearest proxy last
+        return route[-proxies - 1]
+    return request.remote_addr or "unknown"
+
+
+def _scope_value(scope):
+    if scope == "ip":
+        return client_ip()
+    if scope == "tag":
+        tag_id = (request.view_args or {}).get("tag_id")
+        return tag_id.upper() if tag_id else None
+    raise ValueError(f"Unknown rate limit scope {scope!r}")
+
+
+def _too_many_requests(retry_after):
+    retry_after = max(1, int(retry_after + 0.999))
+    if request.blueprint == "api":
+        response = jsonify({"status": "rate_limited", "retry_after": retry_after})
+        response.status_code = 429
+    else:
+        response = TooManyRequests().get_response()
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def check_rate_limits(app):
+    """Take a token from every bucket of the request; 429 at the first empty one.
+
+    The IP buckets come first, so a client over its own limit cannot drain a
+    tag's bucket and lock the real finders of that tag out.
+    """
+    policies = app.extensions["ltfpqrr_rate_limits"]
+    endpoint = request.endpoint
+    store = app.extensions["ltfpqrr_rate_store"]
+    checks = [
+        (name, scope, limit)
+        for name in (endpoint, f"{endpoint}:{request.method}")
+        for scope, limit in policies.get(name, {}).items()
+    ]
+    checks.sort(key=lambda check: check[1] != "ip")
+    for name, scope, limit in checks:
+        value = _scope_value(scope)
+        if value is None:
+            continue
+        wait = store.take(f"{name}:{scope}:{value}", limit)
+        if wait:
+            count_rate_limited(endpoint, scope)
+            return _too_many_requests(wait)
+    return None
+
+
+def init_rate_limit(app):
+    """Parse the RATE_LIMITS policies and enforce them before every view."""
+    if not app.config.get("RATE_LIMIT_ENABLED", True):
+        return
+
+    policies = {
+        name: {scope: parse_limit(limit) for scope, limit in limits.items()}
+        for name, limits in app.config.get("RATE_LIMITS", {}).items()
+    }
+    redis_url = app.config.get("RATE_LIMIT_REDIS_URL")
+    store = RedisRateStore(redis_url) if redis_url else LocalRateStore()
+    app.extensions["ltfpqrr_rate_limits"] = policies
+    app.extensions["ltfpqrr_rate_store"] = store
+
+    @app.before_request
+    def _rate_limit():
+        if request.endpoint in policies or f"{request.endpoint}:{request.method}" in policies:
+            return check_rate_limits(app)
+        return None
@@ -0,0 +1,248 @@
+"""
+Subscription auto-renewal for LTFPQRR.
+
+renew_due_subscriptions() (a periodic Celery task) charges every active
+auto-renewing Stripe subscription that ends within RENEWAL_LEAD_TIME seconds
+and has a saved payment method:
+
+- due subscriptions are read in keyset batches of RENEWAL_BATCH_SIZE
+  (id > last id seen), as plain rows;
+- each batch is charged off-session by a pool of RENEWAL_CONCURRENCY threads
+  that only talk to Stripe, so the gateway never sees more than that many
+  requests at once and no database connection is held while waiting on it;
+- the idempotency key names the subscription and the period being paid for,
+  so a retried or overlapping run gets Stripe's original answer instead of
+  charging twice;
+- results are written per batch in one transaction: an UPDATE per paid
+  subscription extending it, guarded by the end_date it was charged for, and
+  one bulk INSERT of Payment rows; then renewal emails are queued for a
+  Celery worker. A paid subscription whose end_date changed meanwhile is not
+  extended or emailed, and its payment is flagged with
+  payment_metadata["reconcile"] for an admin to refund or apply.
+
+Declined cards are recorded as failed payments and the subscription runs out
+(see services/subscriptions.py); network and rate-limit errors that outlast
+the Stripe client's retries, or hit its open circuit breaker, are left for
+the next run.
+
+Usage:
+    python -m services.renewals run
+"""
+import sys
+import uuid
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from extensions import enqueue, logger
+
+RENEWAL_PERIODS = {"monthly": timedelta(days=30), "yearly": timedelta(days=365)}
+
+DueRenewal = namedtuple(
+    "DueRenewal",
+    "subscription_id user_id amount currency end_date billing_period customer_id payment_method_id "
+    "pricing_plan_id",
+)
+ChargeResult = namedtuple("ChargeResult", "renewal status intent_id failure_reason")
+
+
+def idempotency_key(renewal):
+    """Same subscription and period, same key: Stripe charges it once."""
+    return f"renewal-{renewal.subscription_id}-{renewal.end_date:%Y%m%d%H%M%S}"
+
+
+def _due_batch(after_id, horizon, batch_size):
+    from extensions import db
+    from models.models import PricingPlan, Subscription
+
+    rows = (
+        db.session.query(
+            Subscription.id, Subscription.user_id, Subscription.amount, PricingPlan.currency,
+            Subscription.end_date, PricingPlan.billing_period,
+            Subscription.gateway_customer_id, Subscription.gateway_payment_method_id,
+            Subscription.pricing_plan_id,
+        )
+        .join(PricingPlan, PricingPlan.id == Subscription.pricing_plan_id)
+        .filter(
+            Subscription.id > after_id,
+            Subscription.status == "active",
+            Subscription.auto_renew.is_(True),
+            Subscription.cancellation_requested.isnot(True),
+            Subscription.payment_method == "stripe",
+            Subscription.gateway_payment_method_id.isnot(None),
+            Subscription.amount.isnot(None),
+            Subscription.end_date <= horizon,
+            PricingPlan.billing_period.in_(list(RENEWAL_PERIODS)),
+        )
+        .order_by(Subscription.id)
+        .limit(batch_size)
+        .all()
+    )
+    # Nothing lazy-loads from these in the worker threads
+    db.session.rollback()
+    return [DueRenewal(*row) for row in rows]
+
+
+def _charge(client, renewal):
+    """Charge one renewal; runs in a pool thread without app or DB access."""
+    from services.stripe_client import GatewayUnavailable
+
+    stripe = client.stripe
+    amount_cents = int((Decimal(renewal.amount) * 100).to_integral_value())
+    try:
+        intent = client.create_payment_intent(
+            amount=amount_cents,
+            currency=(renewal.currency or "USD").lower(),
+            customer=renewal.customer_id,
+            payment_method=renewal.payment_method_id,
+            off_session=True,
+            confirm=True,
+            metadata={"subscription_id": renewal.subscription_id, "payment_type": "renewal"},
+            idempotency_key=idempotency_key(renewal),
+        )
+    except stripe.error.CardError as e:
+        intent = (e.json_body or {}).get("error", {}).get("payment_intent") or {}
+        return ChargeResult(renewal, "failed", intent.get("id"), e.code or "card_error")
+    except (stripe.error.StripeError, GatewayUnavailable) as e:
+        # Connection problems, rate limits, outages: try again next run
+        logger.warning(f"Renewal of subscription {renewal.subscription_id} deferred: {e}")
+        return ChargeResult(renewal, "deferred", None, None)
+
+    if intent["status"] == "succeeded":
+        return ChargeResult(renewal, "completed", intent["id"], None)
+    return ChargeResult(renewal, "failed", intent["id"], intent["status"])
+
+
+def _record(results, now):
+    """Store the charges of one batch; returns the ids of renewed subscriptions.
+
+    Each paid subscription is extended by an UPDATE guarded by the end_date
+    it was charged for. One whose end_date changed in the meantime (an admin
+    extension, a cancellation) is left alone, not reported as renewed, and its
+    payment is flagged for refund or reconciliation.
+    """
+    from sqlalchemy import insert
+    from extensions import db
+    from models.models import Payment, Subscription
+    from services.revenue import record_payment_rows
+
+    results = [result for result in results if result.status != "deferred"]
+    intent_ids = [result.intent_id for result in results if result.intent_id]
+    # A retried run gets the same intents back; they are already recorded
+    recorded = {
+        intent_id for (intent_id,) in db.session.query(Payment.payment_intent_id)
+        .filter(Payment.payment_intent_id.in_(intent_ids))
+    } if intent_ids else set()
+
+    table = Subscription.__table__
+    payments = []
+    renewed = []
+    for result in results:
+        if result.intent_id in recorded:
+            continue
+        renewal = result.renewal
+        metadata = {"subscription_id": renewal.subscription_id, "period_end": renewal.end_date.isoformat()}
+        if result.failure_reason:
+            metadata["failure_reason"] = result.failure_reason
+        if result.status == "completed":
+            # rowcount of a single-row UPDATE is reliable on every backend
+            extended = db.session.execute(
+                table.update()
+                .where(table.c.id == renewal.subscription_id, table.c.end_date == renewal.end_date)
+                .values(end_date=renewal.end_date + RENEWAL_PERIODS[renewal.billing_period], updated_at=now)
+            ).rowcount
+            if extended:
+                renewed.append(renewal.subscription_id)
+            else:
+                metadata["reconcile"] = "subscription_changed"
+                logger.error(f"Renewal charge {result.intent_id} of subscription {renewal.subscription_id} "
+                             f"not applied: its end date changed during the run; refund or apply it")
+        payments.append({
+            "user_id": renewal.user_id,
+            "subscription_id": renewal.subscription_id,
+            "payment_gateway": "stripe",
+            "payment_intent_id": result.intent_id,
+            "transaction_id": f"TXN_{now:%Y%m%d}_{uuid.uuid4().hex[:8].upper()}",
+            "amount": renewal.amount,
+            "currency": renewal.currency or "USD",
+            "status": result.status,
+            "payment_type": "renewal",
+            "pricing_plan_id": renewal.pricing_plan_id,
+            "payment_metadata": metadata,
+            "processed_at": now if result.status == "completed" else None,
+            "created_at": now,
+        })
+
+    if payments:
+        db.session.execute(insert(Payment), payments)
+        record_payment_rows(db.session, payments)
+    db.session.commit()
+    return renewed
+
+
+def renew_due_subscriptions(now=None, batch_size=None, concurrency=None):
+    """Charge every subscription due for renewal; returns counts by outcome."""
+    from services.stripe_client import get_stripe_client
+
+    config = current_app.config
+    now = now or datetime.utcnow()
+    horizon = now + timedelta(seconds=config.get("RENEWAL_LEAD_TIME", 86400))
+    batch_size = batch_size or config.get("RENEWAL_BATCH_SIZE", 200)
+    concurrency = concurrency or config.get("RENEWAL_CONCURRENCY", 8)
+    client = get_stripe_client()
+
+    outcomes = Counter()
+    after_id = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="renewal") as pool:
+        while True:
+            batch = _due_batch(after_id, horizon, batch_size)
+            if not batch:
+                break
+            after_id = batch[-1].subscription_id
+
+            results = list(pool.map(lambda renewal: _charge(client, renewal), batch))
+            outcomes.update(result.status for result in results)
+            renewed = _record(results, now)
+            if renewed:
+                enqueue_renewal_notices(renewed)
+            if len(batch) < batch_size:
+                break
+
+    if outcomes:
+        logger.info(f"Subscription renewals: {dict(outcomes)}")
+    return outcomes
+
+
+def send_renewal_notices(subscription_ids):
+    """Email the subscribers of renewed subscriptions."""
+    from email_utils import send_subscription_renewal_email
+    from models.models import Subscription
+
+    for subscription in Subscription.query.filter(Subscription.id.in_(subscription_ids)):
+        send_subscription_renewal_email(subscription.user, subscription)
+
+
+def enqueue_renewal_notices(subscription_ids):
+    """Send renewal emails from a Celery worker, or inline if it can't be queued."""
+    from tasks.subscriptions import send_renewal_notices as notices_task
+
+    enqueue(notices_task, subscription_ids, inline=send_renewal_notices)
+
+
+def main(argv):
+    if argv[1:] != ["run"]:
+        print("Usage: python -m services.renewals run")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        outcomes = renew_due_subscriptions()
+    print(f"Renewals: {dict(outcomes) or 'none due'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,290 @@
+"""
+Revenue ledger for LTFPQRR.
+
+The revenue_ledger table (RevenueLedger) holds one row per day, gateway,
+payment type, plan, currency and status, with the number of payments and
+their total amount. A payment counts on the day it was created, so its
+whole life (completed, then perhaps refunded) stays on one day and the
+ledger always equals a GROUP BY over payments.
+
+- An after_flush event turns every inserted, changed or deleted Payment
+  into +/- deltas and applies them with one upsert, in the same transaction,
+  so the ledger commits or rolls back with the payments. Code that inserts
+  payments in bulk (services/renewals.py) bypasses the ORM and calls
+  record_payment_rows() itself.
+- rebuild_ledger() recomputes the ledger from payments, for backfilling or
+  after editing payments by hand.
+- revenue_report() and ledger_rows() feed the admin revenue page and its CSV
+  export; neither reads the payments table.
+
+Usage:
+    python -m services.revenue rebuild [YYYY-MM-DD]
+"""
+import sys
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from extensions import logger
+
+LEDGER_DIMENSIONS = ("day", "payment_gateway", "payment_type", "pricing_plan_id", "currency", "status")
+# Payment attributes that decide a payment's ledger row, and its amount
+_TRACKED = ("created_at", "payment_gateway", "payment_type", "pricing_plan_id", "currency", "status", "amount")
+
+LedgerKey = namedtuple("LedgerKey", LEDGER_DIMENSIONS)
+ReportRow = namedtuple("ReportRow", "label currency completed_count revenue refunded_count refunded failed_count")
+
+_events_registered = False
+
+
+def _ledger_key(created_at, payment_gateway, payment_type, pricing_plan_id, currency, status):
+    created_at = created_at or datetime.utcnow()
+    return LedgerKey(
+        created_at.date(), payment_gateway, payment_type, pricing_plan_id or 0,
+        (currency or "USD").upper(), status,
+    )
+
+
+def _add(deltas, key, count, amount):
+    entry = deltas.setdefault(key, [0, Decimal("0")])
+    entry[0] += count
+    entry[1] += Decimal(str(amount or 0))
+
+
+def _payment_deltas(session):
+    """Ledger deltas of the Payment rows this flush wrote."""
+    from sqlalchemy import inspect as sa_inspect
+    from models.models import Payment
+
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            _add(deltas, _ledger_key(*(getattr(obj, name) for name in _TRACKED[:-1])), 1, obj.amount)
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Payment):
+            continue
+        state = sa_inspect(obj)
+        old = []
+        for name in _TRACKED:
+            history = state.attrs[name].history
+            old.append(history.deleted[0] if history.deleted else getattr(obj, name))
+        new = [getattr(obj, name) for name in _TRACKED]
+        if obj in session.deleted:
+            _add(deltas, _ledger_key(*old[:-1]), -1, -(old[-1] or 0))
+        elif old != new:
+            _add(deltas, _ledger_key(*old[:-1]), -1, -(old[-1] or 0))
+            _add(deltas, _ledger_key(*new[:-1]), 1, new[-1])
+    return deltas
+
+
+def _upsert(connection, deltas):
+    """Add deltas to their ledger rows, creating missing rows."""
+    from models.models import RevenueLedger
+
+    rows = [
+        dict(key._asdict(), payment_count=count, amount=amount)
+        for key, (count, amount) in deltas.items() if count or amount
+    ]
+    if not rows:
+        return
+
+    table = RevenueLedger.__table__
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        statement = insert(table)
+        statement = statement.on_duplicate_key_update(
+            payment_count=table.c.payment_count + statement.inserted.payment_count,
+            amount=table.c.amount + statement.inserted.amount,
+        )
+    else:
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(LEDGER_DIMENSIONS),
+            set_={
+                "payment_count": table.c.payment_count + statement.excluded.payment_count,
+                "amount": table.c.amount + statement.excluded.amount,
+            },
+        )
+    connection.execute(statement, rows)
+
+
+def record_payment_rows(session, rows):
+    """Count payments inserted in bulk (dicts of Payment columns) in the ledger."""
+    deltas = {}
+    for row in rows:
+        key = _ledger_key(*(row.get(name) for name in _TRACKED[:-1]))
+        _add(deltas, key, 1, row.get("amount"))
+    _upsert(session.connection(), deltas)
+
+
+def _register_events():
+    global _events_registered
+    if _events_registered:
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from models.models import Payment
+
+    # Keep the old value when one of these changes, so its old row can be debited
+    for name in _TRACKED:
+        event.listen(getattr(Payment, name), "set", lambda target, value, old, initiator: value,
+                     active_history=True, retval=True)
+
+    @event.listens_for(Session, "after_flush")
+    def update_revenue_ledger(session, flush_context):
+        deltas = _payment_deltas(session)
+        if deltas:
+            _upsert(session.connection(), deltas)
+
+    _events_registered = True
+
+
+def init_revenue(app):
+    """Register the ORM event that keeps the revenue ledger up to date."""
+    _register_events()
+
+
+def rebuild_ledger(since=None):
+    """Recompute the ledger from payments, from the day `since` on (or all of it).
+
+    Returns the number of ledger rows written.
+    """
+    from sqlalchemy import func
+    from extensions import db
+    from models.models import Payment, RevenueLedger
+
+    day = func.date(Payment.created_at)
+    query = db.session.query(
+        day, Payment.payment_gateway, Payment.payment_type, Payment.pricing_plan_id,
+        Payment.currency, Payment.status, func.count(Payment.id), func.sum(Payment.amount),
+    ).group_by(
+        day, Payment.payment_gateway, Payment.payment_type, Payment.pricing_plan_id,
+        Payment.currency, Payment.status,
+    )
+    ledger = RevenueLedger.query
+    if since:
+        query = query.filter(Payment.created_at >= datetime.combine(since, datetime.min.time()))
+        ledger = ledger.filter(RevenueLedger.day >= since)
+
+    deltas = {}
+    for created, gateway, payment_type, plan_id, currency, status, count, amount in query:
+        if isinstance(created, str):
+            created = datetime.strptime(created, "%Y-%m-%d")
+        elif not isinstance(created, datetime):
+            created = datetime.combine(created, datetime.min.time())
+        _add(deltas, _ledger_key(created, gateway, payment_type, plan_id, currency, status), count, amount)
+
+    ledger.delete(synchronize_session=False)
+    _upsert(db.session.connection(), deltas)
+    db.session.commit()
+    logger.info(f"Rebuilt revenue ledger{f' from {since}' if since else ''}: {len(deltas)} rows")
+    return len(deltas)
+
+
+def ledger_rows(start, end):
+    """RevenueLedger rows for days start..end (inclusive), oldest first."""
+    from models.models import RevenueLedger
+
+    return (
+        RevenueLedger.query
+        .filter(RevenueLedger.day >= start, RevenueLedger.day <= end)
+        .order_by(*(getattr(RevenueLedger, name) for name in LEDGER_DIMENSIONS))
+        .all()
+    )
+
+
+def revenue_report(start, end, by="day"):
+    """Totals for days start..end grouped by day, payment_gateway, payment_type or plan.
+
+    Amounts in different currencies are never added up: there is a row per
+    label and currency. Returns the ReportRows in label order, plus a total
+    ReportRow per currency.
+    """
+    from sqlalchemy import case, func
+    from extensions import db
+    from models.models import RevenueLedger
+
+    column = RevenueLedger.pricing_plan_id if by == "plan" else getattr(RevenueLedger, by)
+
+    def total(status, field):
+        return func.coalesce(func.sum(case((RevenueLedger.status == status, field), else_=0)), 0)
+
+    rows = (
+        db.session.query(
+            column, RevenueLedger.currency,
+            total("completed", RevenueLedger.payment_count), total("completed", RevenueLedger.amount),
+            total("refunded", RevenueLedger.payment_count), total("refunded", RevenueLedger.amount),
+            total("failed", RevenueLedger.payment_count),
+        )
+        .filter(RevenueLedger.day >= start, RevenueLedger.day <= end)
+        .group_by(column, RevenueLedger.currency)
+        .order_by(column, RevenueLedger.currency)
+        .all()
+    )
+
+    labels = _plan_names() if by == "plan" else {}
+    report = [
+        ReportRow(labels.get(row[0], row[0]), row[1], int(row[2]), Decimal(row[3]), int(row[4]), Decimal(row[5]),
+                  int(row[6]))
+        for row in rows
+    ]
+    totals = []
+    for currency in sorted({row.currency for row in report}):
+        same = [row for row in report if row.currency == currency]
+        sums = (sum(row[i] for row in same) for i in range(2, len(ReportRow._fields)))
+        totals.append(ReportRow("Total", currency, *sums))
+    return report, totals
+
+
+def _plan_names():
+    from extensions import db
+    from models.models import PricingPlan
+
+    names = {0: "No plan"}
+    names.update(
+        (plan_id, f"{name} ({plan_type}, {period})")
+        for plan_id, name, plan_type, period in db.session.query(
+            PricingPlan.id, PricingPlan.name, PricingPlan.plan_type, PricingPlan.billing_period
+        )
+    )
+    return names
+
+
+def parse_range(start, end, default_days=30):
+    """The (start, end) dates of a report from YYYY-MM-DD strings, defaulting to recent days."""
+    try:
+        end = datetime.strptime(end, "%Y-%m-%d").date() if end else date.today()
+    except ValueError:
+        end = date.today()
+    try:
+        start = datetime.strptime(start, "%Y-%m-%d").date() if start else end - timedelta(days=default_days - 1)
+    except ValueError:
+        start = end - timedelta(days=default_days - 1)
+    return min(start, end), end
+
+
+def main(argv):
+    if len(argv) not in (2, 3) or argv[1] != "rebuild":
+        print("Usage: python -m services.revenue rebuild [YYYY-MM-DD]")
+        return 2
+
+    since = datetime.strptime(argv[2], "%Y-%m-%d").date() if len(argv) == 3 else None
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        rows = rebuild_ledger(since)
+    print(f"Revenue ledger rebuilt: {rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,52 @@
+"""
+Found-tag scans for LTFPQRR.
+
+A scan is a visit to a tag's found page or a request to the scan API. Both
+look the tag up the same way and log every scan to SearchLog (notifying the
+owner if they asked for it), including scans answered from the page cache.
+Scans by known bots (services/bots.py) are neither logged nor notified.
+"""
+from flask import request
+from services.bots import is_bot_request
+from services.metrics import count_scan
+
+
+def find_tag(tag_id):
+    """Case-insensitive tag lookup."""
+    from sqlalchemy import func
+    from models.models import Tag
+
+    return Tag.query.filter(func.upper(Tag.tag_id) == func.upper(tag_id)).first()
+
+
+def record_scan(tag_pk, pet_id, owner_id):
+    """Log a found-tag scan and notify the owner if they asked for it."""
+    if is_bot_request():
+        return
+
+    from models.models import Tag, Pet, User, SearchLog, NotificationPreference
+    from extensions import db
+    from utils import send_notification_email
+
+    search_log = SearchLog(
+        tag_id=tag_pk,
+        ip_address=request.remote_addr,
+        user_agent=request.headers.get("User-Agent"),
+    )
+    db.session.add(search_log)
+    db.session.commit()
+
+    # Check if owner wants notifications
+    notification_pref = NotificationPreference.query.filter_by(
+        user_id=owner_id, notification_type="tag_search"
+    ).first()
+
+    if notification_pref and notification_pref.enabled:
+        send_notification_email(User.query.get(owner_id), Tag.query.get(tag_pk), Pet.query.get(pet_id))
+
+
+def cached_scan_hit(meta):
+    """on_hit handler of cached scan responses: count and log the scan."""
+    count_scan(meta.get("channel", "page"), meta["result"])
+    if meta["result"] == "found":
+        record_scan(meta["tag_pk"], meta["pet_id"], meta["owner_id"])
@@ -0,0 +1,63 @@
+"""
+Read-mostly snapshots for LTFPQRR.
+
+Small tables that are read on almost every request but rarely change (system
+settings, the pricing catalog in services/pricing.py) are loaded once into
+plain Python structures and reloaded after SNAPSHOT_TTL seconds or when an
+admin route changes them.
+Snapshots are built during warm-up, so with gunicorn's preload_app they are
+created in the master and inherited by every worker.
+"""
+import time
+from flask import current_app
+from services.metrics import observe_cache
+from services.warmup import register_warmer
+
+
+class Snapshot:
+    """A value loaded by loader() and kept per application."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+
+    def _store(self, app):
+        return app.extensions.setdefault("ltfpqrr_snapshots", {})
+
+    def get(self):
+        """Return the current value, reloading it once the TTL has expired."""
+        app = current_app._get_current_object()
+        store = self._store(app)
+        entry = store.get(self.name)
+        now = time.monotonic()
+        if entry is not None and now - entry[1] < app.config.get("SNAPSHOT_TTL", 60):
+            observe_cache(f"snapshot_{self.name}", True)
+            return entry[0]
+
+        observe_cache(f"snapshot_{self.name}", False)
+        value = self.loader()
+        store[self.name] = (value, now)
+        return value
+
+    def invalidate(self):
+        """Drop the value so the next get() reloads it (this process only)."""
+        self._store(current_app._get_current_object()).pop(self.name, None)
+
+
+def _load_settings():
+    from models.models import SystemSetting
+
+    return {key: value for key, value in SystemSetting.query.with_entities(
+        SystemSetting.key, SystemSetting.value
+    )}
+
+
+settings_snapshot = Snapshot("settings", _load_settings)
+
+
+def init_snapshots(app):
+    """Build the snapshots during warm-up."""
+    from services.pricing import pricing_catalog
+
+    register_warmer("settings_snapshot", lambda app: settings_snapshot.get())
+    register_warmer("pricing_snapshot", lambda app: pricing_catalog.get())
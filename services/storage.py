@@ -0,0 +1,431 @@
+"""
+Content-addressed photo storage for LTFPQRR.
+
+Photo files are stored under the SHA-256 of their content
+("ab/ab12...ef.jpg"), so uploading the same photo twice stores it once. Each
+file has a PhotoBlob row counting the pet photo fields that point at it:
+store_upload()/store_file() add a reference, release() drops one, and
+collect_orphaned_blobs() (a periodic Celery task) deletes files that have had
+no references for PHOTO_BLOB_GC_GRACE seconds. The grace period keeps a file
+that is being re-uploaded from being collected underneath the upload.
+
+Backends (PHOTO_STORAGE):
+    local  files under UPLOAD_FOLDER, served by routes/media.py (default)
+    s3     an S3-compatible bucket (AWS, MinIO, ...), requires boto3
+
+Photos stored before content addressing keep their flat "uuid_name.jpg" keys
+and have no PhotoBlob row; releasing them deletes the file directly.
+
+Usage:
+    python -m services.storage gc
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from flask import Request, current_app, url_for
+from werkzeug.utils import secure_filename
+from extensions import logger
+
+# Optional imports with fallbacks
+try:
+    import boto3
+    HAS_BOTO3 = True
+except ImportError:
+    HAS_BOTO3 = False
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_NEW_BLOBS_KEY = "ltfpqrr_new_photo_blobs"
+
+_events_registered = False
+
+
+def _safe_key(key):
+    normalized = posixpath.normpath(key)
+    if normalized.startswith(("/", "..")) or normalized != key:
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return key
+
+
+class LocalStorage:
+    """Files under a local directory, served by the media route."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *_safe_key(key).split("/"))
+
+    def save(self, key, source_path, content_type=None):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Copy next to the target and rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out, open(source_path, "rb") as src:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def open(self, key):
+        return open(self.path(key), "rb")
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key):
+        return url_for("media.photo", key=key)
+
+
+class S3Storage:
+    """Files in an S3-compatible bucket."""
+
+    def __init__(self, bucket, prefix="", client=None, public_url=None, url_expires=3600, **client_options):
+        if client is None:
+            if not HAS_BOTO3:
+                raise RuntimeError("PHOTO_STORAGE=s3 requires boto3 (pip install boto3)")
+            client = boto3.client("s3", **client_options)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.url_expires = url_expires
+
+    def _object_key(self, key):
+        return self.prefix + _safe_key(key)
+
+    def save(self, key, source_path, content_type=None):
+        extra = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra["ContentType"] = content_type
+        self.client.upload_file(source_path, self.bucket, self._object_key(key), ExtraArgs=extra)
+
+    def open(self, key):
+        # Image decoding needs a seekable file; small photos stay in memory
+        buffer = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+        self.client.download_fileobj(self.bucket, self._object_key(key), buffer)
+        buffer.seek(0)
+        return buffer
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except Exception as e:
+            code = getattr(e, "response", {}).get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url}/{self._object_key(key)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=self.url_expires,
+        )
+
+
+class HashingTempFile:
+    """Temporary file that hashes everything written to it; deleted on close."""
+
+    def __init__(self, dir=None):
+        self.file = tempfile.NamedTemporaryFile(dir=dir, prefix="ltfpqrr-upload-")
+        self.name = self.file.name
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def __getattr__(self, name):
+        # read, seek, flush, close, ... go to the underlying file
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+class UploadRequest(Request):
+    """Request that streams uploaded files to disk, hashing them on the way.
+
+    Werkzeug parses multipart bodies in 64 KiB chunks; each file part is
+    written straight to a HashingTempFile instead of being buffered in memory,
+    so store_upload() neither copies nor re-reads the upload to hash it.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingTempFile()
+
+
+def content_key(digest, filename):
+    """Storage key of a file: its SHA-256, fanned out, plus the extension."""
+    ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    return f"{digest[:2]}/{digest}{ext}"
+
+
+def _add_reference(tmp, filename):
+    """Count a reference to the file in tmp, storing it if it is new."""
+    from sqlalchemy.exc import IntegrityError
+    from extensions import db
+    from models.models import PhotoBlob
+
+    storage = get_storage()
+    digest = tmp.hexdigest()
+    for _ in range(3):
+        blob = db.session.query(PhotoBlob.id, PhotoBlob.key, PhotoBlob.content_type).filter_by(sha256=digest).first()
+        if blob is not None:
+            # Conditional: the collector may have deleted the row since it was read
+            updated = PhotoBlob.query.filter_by(id=blob.id).update(
+                {PhotoBlob.ref_count: PhotoBlob.ref_count + 1, PhotoBlob.updated_at: datetime.utcnow()},
+                synchronize_session=False,
+            )
+            if updated:
+                # The file of an unreferenced blob may have gone missing
+                if not storage.exists(blob.key):
+                    storage.save(blob.key, tmp.name, blob.content_type)
+                return blob.key
+            continue
+
+        key = content_key(digest, filename)
+        # From the extension, never from the client: S3 serves it as-is
+        content_type = mimetypes.guess_type(key)[0]
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    PhotoBlob(sha256=digest, key=key, size=tmp.size, content_type=content_type, ref_count=1)
+                )
+        except IntegrityError:
+            # Stored concurrently by another upload
+            continue
+        storage.save(key, tmp.name, content_type)
+        _new_blobs(db.session).append(
+            {"sha256": digest, "key": key, "size": tmp.size, "content_type": content_type}
+        )
+        return key
+    raise RuntimeError(f"Could not store photo {digest}: its blob kept changing")
+
+
+def _new_blobs(session):
+    """Blobs whose files this session stored, forgotten when it commits."""
+    return session.info.setdefault(_NEW_BLOBS_KEY, [])
+
+
+def store_stream(stream, filename):
+    """Store a file read from stream and return its key (adds a reference)."""
+    with HashingTempFile() as tmp:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            tmp.write(chunk)
+        tmp.flush()
+        return _add_reference(tmp, filename)
+
+
+def store_upload(file_storage):
+    """Store an uploaded werkzeug FileStorage and return its key."""
+    stream = file_storage.stream
+    if isinstance(stream, HashingTempFile):
+        # Already on disk and hashed by UploadRequest
+        stream.flush()
+        return _add_reference(stream, file_storage.filename)
+    return store_stream(stream, file_storage.filename)
+
+
+def store_file(path):
+    """Store a local file and return its key."""
+    with open(path, "rb") as f:
+        return store_stream(f, os.path.basename(path))
+
+
+def release(*keys):
+    """Drop one reference to each key; files are deleted by the collector."""
+    from extensions import db
+    from models.models import PhotoBlob
+
+    for key in keys:
+        if not key:
+            continue
+        updated = PhotoBlob.query.filter(PhotoBlob.key == key, PhotoBlob.ref_count > 0).update(
+            {PhotoBlob.ref_count: PhotoBlob.ref_count - 1, PhotoBlob.updated_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+        if not updated and db.session.query(PhotoBlob.id).filter_by(key=key).first() is None:
+            # Stored before content addressing, nothing else can refer to it
+            try:
+                get_storage().delete(key)
+            except Exception as e:
+                logger.warning(f"Could not delete photo {key}: {e}")
+
+
+def collect_orphaned_blobs(grace=None, batch_size=500):
+    """Delete blobs that have been unreferenced for the grace period.
+
+    Files are deleted before the transaction that deletes their rows commits.
+    Until then the rows stay locked (SQLite locks the whole database), so an
+    upload of the same content waits, finds no row, and stores the file again.
+
+    Returns the number of blobs deleted.
+    """
+    from extensions import db
+    from models.models import PhotoBlob
+
+    if grace is None:
+        grace = current_app.config.get("PHOTO_BLOB_GC_GRACE", 3600)
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    storage = get_storage()
+
+    deleted = 0
+    while True:
+        rows = (
+            db.session.query(PhotoBlob.id, PhotoBlob.key)
+            .filter(PhotoBlob.ref_count == 0, PhotoBlob.updated_at < cutoff)
+            .order_by(PhotoBlob.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            break
+        ids = [row.id for row in rows]
+        db.session.query(PhotoBlob).filter(PhotoBlob.id.in_(ids), PhotoBlob.ref_count == 0).delete(
+            synchronize_session=False
+        )
+        # Without row locks, a blob may have been referenced again since the SELECT
+        referenced = {blob_id for (blob_id,) in db.session.query(PhotoBlob.id).filter(PhotoBlob.id.in_(ids))}
+
+        for row in rows:
+            if row.id in referenced:
+                continue
+            try:
+                storage.delete(row.key)
+            except Exception as e:
+                logger.warning(f"Could not delete orphaned photo {row.key}: {e}")
+            deleted += 1
+        db.session.commit()
+        if len(rows) < batch_size:
+            break
+
+    if deleted:
+        logger.info(f"Deleted {deleted} orphaned photo blobs")
+    return deleted
+
+
+def photo_url(key):
+    """Public URL of a stored photo."""
+    return get_storage().url(key)
+
+
+def _register_events():
+    global _events_registered
+    if _events_registered:
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm import Session
+    from extensions import db
+    from models.models import PhotoBlob
+
+    @event.listens_for(Session, "after_commit")
+    def forget_new_blobs(session):
+        session.info.pop(_NEW_BLOBS_KEY, None)
+
+    # A file stored by a transaction that rolled back has no row; give it an
+    # unreferenced one so the collector deletes it after the grace period
+    @event.listens_for(Session, "after_rollback")
+    def track_rolled_back_blobs(session):
+        for blob in session.info.pop(_NEW_BLOBS_KEY, ()):
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        PhotoBlob.__table__.insert(),
+                        dict(blob, ref_count=0, created_at=datetime.utcnow(), updated_at=datetime.utcnow()),
+                    )
+            except IntegrityError:
+                # Stored again by another upload, which now owns the file
+                pass
+            except Exception as e:
+                logger.warning(f"Could not track photo {blob['key']} after rollback: {e}")
+
+    _events_registered = True
+
+
+def init_storage(app):
+    """Create the photo storage backend from the PHOTO_STORAGE_* settings."""
+    backend = app.config.get("PHOTO_STORAGE", "local")
+    if backend == "s3":
+        client_options = {
+            "endpoint_url": app.config.get("PHOTO_STORAGE_S3_ENDPOINT_URL"),
+            "region_name": app.config.get("PHOTO_STORAGE_S3_REGION"),
+        }
+        storage = S3Storage(
+            app.config["PHOTO_STORAGE_S3_BUCKET"],
+            prefix=app.config.get("PHOTO_STORAGE_S3_PREFIX", ""),
+            public_url=app.config.get("PHOTO_STORAGE_S3_PUBLIC_URL"),
+            **{name: value for name, value in client_options.items() if value},
+        )
+    elif backend == "local":
+        # Absolute, so existence checks and send_file agree whatever the working directory
+        storage = LocalStorage(os.path.join(app.root_path, app.config["UPLOAD_FOLDER"]))
+    else:
+        raise ValueError(f"Unknown PHOTO_STORAGE backend: {backend}")
+    app.extensions["ltfpqrr_storage"] = storage
+    app.jinja_env.globals["photo_url"] = photo_url
+    app.request_class = UploadRequest
+    _register_events()
+    return storage
+
+
+def get_storage(app=None):
+    """Return the photo storage of app (or the current app)."""
+    app = app or current_app
+    return app.extensions["ltfpqrr_storage"]
+
+
+def main(argv):
+    if argv[1:] != ["gc"]:
+        print("Usage: python -m services.storage gc")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        deleted = collect_orphaned_blobs()
+    print(f"Deleted {deleted} orphaned photo blobs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,252 @@
+"""
+Stripe gateway client for LTFPQRR.
+
+Every Stripe call goes through get_stripe_client(), which returns a client
+bound to the current gateway settings:
+
+- the settings (keys and webhook secret from the PaymentGateway row, or the
+  STRIPE_* config values) are a snapshot: decrypted once and reloaded after
+  SNAPSHOT_TTL seconds or when an admin saves the gateway. The key is passed
+  to each call; the global stripe.api_key is never set;
+- the SDK is set up once per worker on first use, with an HTTP client that
+  keeps a requests session (and its keep-alive connections) per thread and
+  uses explicit STRIPE_CONNECT_TIMEOUT / STRIPE_READ_TIMEOUT timeouts;
+- connection errors, rate limits and Stripe 5xx answers are retried up to
+  STRIPE_MAX_RETRIES times after a jittered exponential backoff. POSTs always
+  carry an idempotency key, so a retry never charges twice;
+- STRIPE_BREAKER_THRESHOLD consecutive connection or server errors open a
+  circuit breaker: calls fail at once with GatewayUnavailable for
+  STRIPE_BREAKER_RESET seconds, then one trial call decides whether it closes;
+- every attempt is timed in ltfpqrr_gateway_request_duration_seconds.
+
+STRIPE_API_BASE points the SDK elsewhere, e.g. at benchmarks/fake_stripe.py.
+"""
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+from flask import current_app
+from extensions import logger
+from services.metrics import observe_gateway
+from services.snapshots import Snapshot
+
+StripeSettings = namedtuple("StripeSettings", "secret_key publishable_key webhook_secret environment")
+
+
+class GatewayUnavailable(Exception):
+    """Raised without calling the gateway while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calls after repeated failures and lets one through to probe."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go out now (at most one while half-open)."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Stripe circuit breaker open after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+def _load_stripe_settings():
+    from utils import decrypt_value
+
+    config = current_app.config
+    try:
+        from models.models import PaymentGateway
+
+        gateway = PaymentGateway.query.filter_by(name="stripe", enabled=True).first()
+        if gateway and gateway.secret_key:
+            return StripeSettings(
+                decrypt_value(gateway.secret_key),
+                decrypt_value(gateway.publishable_key) if gateway.publishable_key else None,
+                decrypt_value(gateway.webhook_secret) if gateway.webhook_secret else None,
+                gateway.environment,
+            )
+    except Exception as e:
+        logger.error(f"Error loading Stripe settings: {e}")
+    # Fallback to the environment when the database has no gateway
+    return StripeSettings(
+        config.get("STRIPE_SECRET_KEY"),
+        config.get("STRIPE_PUBLISHABLE_KEY"),
+        config.get("STRIPE_WEBHOOK_SECRET"),
+        None,
+    )
+
+
+stripe_settings_snapshot = Snapshot("stripe_settings", _load_stripe_settings)
+
+
+class StripeGateway:
+    """Per-worker SDK setup shared by every client: HTTP client and breaker."""
+
+    def __init__(self, config):
+        self.api_base = config.get("STRIPE_API_BASE")
+        self.timeout = (config.get("STRIPE_CONNECT_TIMEOUT", 3.05), config.get("STRIPE_READ_TIMEOUT", 20.0))
+        self.max_retries = config.get("STRIPE_MAX_RETRIES", 2)
+        self.backoff = config.get("STRIPE_RETRY_BACKOFF", 0.25)
+        self.backoff_max = config.get("STRIPE_RETRY_BACKOFF_MAX", 2.0)
+        self.breaker = CircuitBreaker(
+            config.get("STRIPE_BREAKER_THRESHOLD", 5), config.get("STRIPE_BREAKER_RESET", 30.0)
+        )
+        self.stripe = None
+        self._lock = threading.Lock()
+
+    def sdk(self):
+        """The stripe module, configured on first use in this worker."""
+        if self.stripe is None:
+            with self._lock:
+                if self.stripe is None:
+                    import stripe
+                    from stripe.http_client import RequestsClient
+
+                    # Sessions are created per thread on first request, so
+                    # they are never shared across a fork
+                    stripe.default_http_client = RequestsClient(timeout=self.timeout)
+                    # Retries are ours (jitter, breaker); the SDK must not retry again
+                    stripe.max_network_retries = 0
+                    if self.api_base:
+                        stripe.api_base = self.api_base
+                    self.stripe = stripe
+        return self.stripe
+
+    def backoff_delay(self, attempt):
+        """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+class StripeClient:
+    """Stripe calls with the current settings; safe to use from any thread."""
+
+    def __init__(self, gateway, settings):
+        self.gateway = gateway
+        self.settings = settings
+        self.stripe = gateway.sdk()
+
+    @property
+    def configured(self):
+        return bool(self.settings.secret_key)
+
+    @property
+    def publishable_key(self):
+        return self.settings.publishable_key
+
+    def _result(self, error):
+        errors = self.stripe.error
+        if isinstance(error, errors.CardError):
+            return "card_error", False, False
+        if isinstance(error, errors.RateLimitError):
+            return "rate_limited", True, False
+        if isinstance(error, errors.APIConnectionError):
+            return "connection_error", True, True
+        if isinstance(error, errors.APIError) or (error.http_status or 0) >= 500:
+            return "server_error", True, True
+        return "client_error", False, False
+
+    def call(self, operation, method, *args, **params):
+        """Call an SDK method with retries, the breaker and latency metrics."""
+        gateway = self.gateway
+        params.setdefault("api_key", self.settings.secret_key)
+        attempt = 0
+        while True:
+            if not gateway.breaker.allow():
+                observe_gateway("stripe", operation, "circuit_open", 0)
+                raise GatewayUnavailable(f"Stripe circuit breaker is {gateway.breaker.state}")
+
+            started = time.perf_counter()
+            try:
+                response = method(*args, **params)
+            except self.stripe.error.StripeError as e:
+                result, retryable, trips = self._result(e)
+                observe_gateway("stripe", operation, result, time.perf_counter() - started)
+                if trips:
+                    gateway.breaker.record_failure()
+                else:
+                    gateway.breaker.record_success()
+                if not retryable or attempt >= gateway.max_retries:
+                    raise
+                delay = gateway.backoff_delay(attempt)
+                attempt += 1
+                logger.warning(f"Stripe {operation} failed ({result}), retry {attempt} in {delay:.2f}s: {e}")
+                time.sleep(delay)
+                continue
+            except Exception:
+                # Never leave a half-open breaker waiting for this probe
+                gateway.breaker.record_failure()
+                raise
+
+            observe_gateway("stripe", operation, "ok", time.perf_counter() - started)
+            gateway.breaker.record_success()
+            return response
+
+    def _post(self, operation, method, idempotency_key=None, **params):
+        # The same key on every attempt: Stripe replays instead of repeating
+        return self.call(operation, method, idempotency_key=idempotency_key or str(uuid.uuid4()), **params)
+
+    def create_customer(self, idempotency_key=None, **params):
+        return self._post("customer.create", self.stripe.Customer.create, idempotency_key, **params)
+
+    def create_payment_intent(self, idempotency_key=None, **params):
+        return self._post("payment_intent.create", self.stripe.PaymentIntent.create, idempotency_key, **params)
+
+    def retrieve_payment_intent(self, intent_id):
+        return self.call("payment_intent.retrieve", self.stripe.PaymentIntent.retrieve, intent_id)
+
+    def create_refund(self, idempotency_key=None, **params):
+        return self._post("refund.create", self.stripe.Refund.create, idempotency_key, **params)
+
+    def construct_event(self, payload, signature):
+        """Verify a webhook signature; raises ValueError without a webhook secret."""
+        if not self.settings.webhook_secret:
+            raise ValueError("Stripe webhook secret is not configured")
+        return self.stripe.Webhook.construct_event(payload, signature, self.settings.webhook_secret)
+
+
+def get_stripe_client():
+    """A StripeClient for the current app and gateway settings."""
+    app = current_app._get_current_object()
+    gateway = app.extensions.get("ltfpqrr_stripe")
+    if gateway is None:
+        gateway = app.extensions.setdefault("ltfpqrr_stripe", StripeGateway(app.config))
+    return StripeClient(gateway, stripe_settings_snapshot.get())
+
+
+def init_stripe_client(app):
+    """Prepare the per-worker gateway; the SDK itself is imported on first use."""
+    app.extensions["ltfpqrr_stripe"] = StripeGateway(app.config)
@@ -0,0 +1,123 @@
+"""
+Subscription expiry for LTFPQRR.
+
+Subscriptions (tag and partner) and partner subscriptions whose end_date has
+passed are moved from 'active' to 'expired' by expire_lapsed_subscriptions(),
+a periodic Celery task (SUBSCRIPTION_EXPIRY_INTERVAL). It works in chunks of
+ids read through the (status, end_date) index and flipped with one UPDATE
+each, committing between chunks, so a backlog never holds long locks. With
+the sweeper running, status == 'active' in SQL is authoritative up to one
+interval; is_active() still checks end_date for that window.
+
+After each chunk the subscriptions_expired signal is sent with the model and
+the expired ids; the default receiver queues the expiry emails.
+
+Usage:
+    python -m services.subscriptions expire
+"""
+import sys
+from datetime import datetime
+from blinker import Namespace
+from flask import current_app
+from extensions import enqueue, logger
+
+_signals = Namespace()
+# sender: the model class; ids: the subscriptions that just expired
+subscriptions_expired = _signals.signal("subscriptions-expired")
+
+
+def _expiring_models():
+    from models.models import PartnerSubscription, Subscription
+
+    return (Subscription, PartnerSubscription)
+
+
+def _expire_model(model, now, batch_size):
+    from extensions import db
+
+    expired = 0
+    while True:
+        ids = [
+            row.id
+            for row in db.session.query(model.id)
+            .filter(model.status == "active", model.end_date < now)
+            .order_by(model.end_date)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ]
+        if not ids:
+            break
+        db.session.query(model).filter(model.id.in_(ids), model.status == "active").update(
+            {model.status: "expired", model.updated_at: now}, synchronize_session=False
+        )
+        db.session.commit()
+
+        subscriptions_expired.send(model, ids=ids)
+        expired += len(ids)
+        if len(ids) < batch_size:
+            break
+    return expired
+
+
+def expire_lapsed_subscriptions(now=None, batch_size=None):
+    """Mark active subscriptions past their end date as expired.
+
+    Returns the number of subscriptions expired.
+    """
+    now = now or datetime.utcnow()
+    if batch_size is None:
+        batch_size = current_app.config.get("SUBSCRIPTION_EXPIRY_BATCH_SIZE", 500)
+
+    expired = 0
+    for model in _expiring_models():
+        count = _expire_model(model, now, batch_size)
+        if count:
+            logger.info(f"Expired {count} {model.__tablename__} rows")
+        expired += count
+    return expired
+
+
+def send_expiry_notices(table, ids):
+    """Email the owners of newly expired subscriptions."""
+    from email_utils import send_subscription_expired_email
+
+    model = {model.__tablename__: model for model in _expiring_models()}[table]
+    for subscription in model.query.filter(model.id.in_(ids)):
+        if table == "partner_subscription":
+            user = subscription.partner.owner
+        else:
+            user = subscription.user
+        if user is not None:
+            send_subscription_expired_email(user, subscription)
+
+
+def _queue_expiry_notices(model, ids):
+    """Default subscriptions_expired receiver: send the emails in a worker."""
+    if not current_app.config.get("SUBSCRIPTION_EXPIRY_EMAILS", True):
+        return
+    from tasks.subscriptions import send_expiry_notices as notices_task
+
+    enqueue(notices_task, model.__tablename__, ids, inline=send_expiry_notices)
+
+
+def init_subscriptions(app):
+    """Connect the default expiry receivers (SUBSCRIPTION_EXPIRY_EMAILS)."""
+    subscriptions_expired.connect(_queue_expiry_notices)
+
+
+def main(argv):
+    if argv[1:] != ["expire"]:
+        print("Usage: python -m services.subscriptions expire")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        expired = expire_lapsed_subscriptions()
+    print(f"Expired {expired} subscriptions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,121 @@
+"""
+Tag claiming for LTFPQRR.
+
+When a partner makes a batch of tags available, many buyers can go for the
+same ones at once. Every state change is therefore a single conditional
+UPDATE whose WHERE clause re-checks the state, and the row count says who
+won. There is no read-check-write in Python, so there is nothing to retry:
+the database serializes writers on the row, and a loser sees 0 rows.
+
+- reserve_tag() holds an available tag for one buyer for TAG_RESERVATION_TTL
+  seconds, the checkout window. The claim form takes the hold and the payment
+  page renews it. Other buyers cannot reserve or claim the tag while the hold
+  is live.
+- claim_tag() gives the tag to the buyer once their payment succeeds,
+  provided it is still available and not held by someone else.
+- release_expired_reservations() (a periodic Celery task) clears the lapsed
+  holds with one UPDATE. Lapsed holds are already ignored by the two calls
+  above, so this is only housekeeping.
+
+Usage:
+    python -m services.tag_claims release
+"""
+import sys
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import logger
+
+
+def _same_tag(tag_id):
+    from sqlalchemy import func
+    from models.models import Tag
+
+    return func.upper(Tag.tag_id) == tag_id.upper()
+
+
+def _claimable_by(user_id, now):
+    """Available and not held by another buyer."""
+    from sqlalchemy import or_
+    from models.models import Tag
+
+    return (
+        Tag.status == "available",
+        or_(Tag.reserved_until.is_(None), Tag.reserved_until < now, Tag.reserved_by == user_id),
+    )
+
+
+def reserve_tag(tag_id, user_id, now=None):
+    """Hold an available tag for user_id during checkout; False if it is taken.
+
+    Renews the hold if user_id already has it. Commits.
+    """
+    from extensions import db
+    from models.models import Tag
+
+    now = now or datetime.utcnow()
+    until = now + timedelta(seconds=current_app.config.get("TAG_RESERVATION_TTL", 900))
+    reserved = Tag.query.filter(_same_tag(tag_id), *_claimable_by(user_id, now)).update(
+        {Tag.reserved_by: user_id, Tag.reserved_until: until}, synchronize_session=False
+    )
+    db.session.commit()
+    return reserved == 1
+
+
+def claim_tag(tag_id, user_id, now=None):
+    """Give an available tag to user_id; returns its primary key or None.
+
+    Runs in the caller's transaction. None means the tag was claimed or held by
+    someone else (or does not exist).
+    """
+    from extensions import db
+    from models.models import Tag
+    from services.page_cache import invalidate_found_page_on_commit
+
+    now = now or datetime.utcnow()
+    claimed = Tag.query.filter(_same_tag(tag_id), *_claimable_by(user_id, now)).update(
+        {
+            Tag.owner_id: user_id,
+            Tag.status: "claimed",
+            Tag.reserved_by: None,
+            Tag.reserved_until: None,
+            Tag.updated_at: now,
+        },
+        synchronize_session=False,
+    )
+    if claimed != 1:
+        return None
+    invalidate_found_page_on_commit(db.session, tag_id)
+    return db.session.query(Tag.id).filter(_same_tag(tag_id)).scalar()
+
+
+def release_expired_reservations(now=None):
+    """Clear every lapsed hold; returns how many were cleared."""
+    from extensions import db
+    from models.models import Tag
+
+    now = now or datetime.utcnow()
+    released = Tag.query.filter(Tag.reserved_until < now).update(
+        {Tag.reserved_by: None, Tag.reserved_until: None}, synchronize_session=False
+    )
+    db.session.commit()
+    if released:
+        logger.info(f"Released {released} expired tag reservations")
+    return released
+
+
+def main(argv):
+    if argv[1:] != ["release"]:
+        print("Usage: python -m services.tag_claims release")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        released = release_expired_reservations()
+    print(f"Released {released} tag reservations")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,353 @@
+"""
+Negative lookup filter for tag IDs.
+
+Scans of tag IDs that do not exist (bots walking the ID space, mistyped IDs)
+each cost a database query. Every process keeps a Bloom filter of all tag IDs
+(upper-cased): an ID the filter has never seen is rejected without a query,
+and only about TAG_FILTER_ERROR_RATE of the unknown IDs reach the database.
+A Bloom filter never reports an added ID as absent, so the filter only has to
+be kept complete:
+
+- it is built during warm-up, or loaded from the snapshot the last build
+  published to the application cache (shared between hosts through Redis);
+- tags committed by this process are added right after the commit;
+- tags created by other processes are picked up every TAG_FILTER_SYNC_INTERVAL
+  seconds by one primary-key range query, so a flood of unknown IDs costs at
+  most one query per interval;
+- the rebuild_tag_filter Celery task rebuilds and publishes the filter every
+  TAG_FILTER_REBUILD_INTERVAL seconds, and processes switch to it on their
+  next sync. Deleted tags (which only cost a query) drop out and renamed ones
+  are picked up.
+- a process rebuilds its own filter only as a last resort: when it is full,
+  when the published filter is overdue, or when it cannot see the published
+  one (no shared cache). One background thread rebuilds while requests keep
+  using the current filter, and only one request at a time syncs.
+
+Usage:
+    python -m services.tag_filter rebuild
+"""
+import hashlib
+import math
+import struct
+import sys
+import threading
+import time
+import uuid
+from functools import wraps
+from flask import current_app, has_app_context, render_template
+from extensions import logger
+from services.cache import get_cache
+
+_PENDING_KEY = "ltfpqrr_tag_filter_ids"
+_SNAPSHOT_KEY = "tag_filter:snapshot"
+_VERSION_KEY = "tag_filter:version"
+_events_registered = False
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings."""
+
+    _HEADER = struct.Struct("!QBQ")
+
+    def __init__(self, capacity, error_rate=0.01, num_bits=None, num_hashes=None, bits=None, count=0):
+        capacity = max(capacity, 1)
+        self.num_bits = num_bits or max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        # Setting a bit is a read-modify-write of its byte; a lost bit would
+        # make an existing tag look unknown
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_bytes(self):
+        return self._HEADER.pack(self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        num_bits, num_hashes, count = cls._HEADER.unpack_from(data)
+        bits = bytearray(data[cls._HEADER.size:])
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError("Truncated Bloom filter")
+        return cls(1, num_bits=num_bits, num_hashes=num_hashes, bits=bits, count=count)
+
+
+class TagFilter:
+    """A process's Bloom filter of tag IDs and how far it is synced."""
+
+    def __init__(self, bloom, capacity, max_id, version):
+        self.bloom = bloom
+        self.capacity = capacity
+        self.max_id = max_id
+        self.version = version
+        self.built_at = self.synced_at = time.monotonic()
+
+    def add(self, tag_id):
+        tag_id = normalize_tag_id(tag_id)
+        if tag_id not in self.bloom:
+            self.bloom.add(tag_id)
+
+    def __contains__(self, tag_id):
+        return normalize_tag_id(tag_id) in self.bloom
+
+
+def normalize_tag_id(tag_id):
+    """Tag IDs are matched case-insensitively (see services/scans.find_tag)."""
+    return tag_id.upper()
+
+
+def _tag_ids(after_id=None):
+    from extensions import db
+    from models.models import Tag
+
+    query = db.session.query(Tag.id, Tag.tag_id)
+    if after_id is not None:
+        query = query.filter(Tag.id > after_id)
+    return query.yield_per(5000)
+
+
+def build_tag_filter(app):
+    """Build a filter of every tag ID from the database."""
+    from sqlalchemy import func
+    from extensions import db
+    from models.models import Tag
+
+    count = db.session.query(func.count(Tag.id)).scalar()
+    # Room for growth until the next rebuild without losing accuracy
+    capacity = max(app.config.get("TAG_FILTER_MIN_CAPACITY", 10000), 2 * count)
+    bloom = BloomFilter(capacity, app.config.get("TAG_FILTER_ERROR_RATE", 0.01))
+    max_id = 0
+    for tag_pk, tag_id in _tag_ids():
+        bloom.add(normalize_tag_id(tag_id))
+        max_id = max(max_id, tag_pk)
+    return TagFilter(bloom, capacity, max_id, uuid.uuid4().hex)
+
+
+def _publish(app, tag_filter):
+    cache = get_cache(app)
+    cache.set(_SNAPSHOT_KEY, {
+        "version": tag_filter.version,
+        "capacity": tag_filter.capacity,
+        "max_id": tag_filter.max_id,
+        "data": tag_filter.bloom.to_bytes(),
+    }, timeout=0)
+    cache.set(_VERSION_KEY, tag_filter.version, timeout=0)
+
+
+def _load_snapshot(app):
+    snapshot = get_cache(app).get(_SNAPSHOT_KEY)
+    if snapshot is None:
+        return None
+    try:
+        bloom = BloomFilter.from_bytes(snapshot["data"])
+    except (KeyError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable tag filter snapshot: {e}")
+        return None
+    return TagFilter(bloom, snapshot["capacity"], snapshot["max_id"], snapshot["version"])
+
+
+def _install(app, tag_filter):
+    app.extensions["ltfpqrr_tag_filter"] = tag_filter
+    return tag_filter
+
+
+def rebuild_tag_filter(app=None):
+    """Rebuild the filter from the database and publish it to other processes."""
+    app = app or current_app._get_current_object()
+    tag_filter = build_tag_filter(app)
+    _publish(app, tag_filter)
+    logger.info(f"Rebuilt tag filter: {tag_filter.bloom.count} tag IDs, {len(tag_filter.bloom.bits)} bytes")
+    return _install(app, tag_filter)
+
+
+def load_tag_filter(app):
+    """Load the published snapshot, or build (and publish) a new filter."""
+    tag_filter = _load_snapshot(app)
+    if tag_filter is None:
+        return rebuild_tag_filter(app)
+    _install(app, tag_filter)
+    # Catch up with tags created since the snapshot was built
+    return _sync(app, tag_filter)
+
+
+def _sync(app, tag_filter):
+    """Adopt a newer published filter and add tags created elsewhere."""
+    published = get_cache(app).get(_VERSION_KEY)
+    if published and published != tag_filter.version:
+        newer = _load_snapshot(app)
+        if newer is not None:
+            tag_filter = _install(app, newer)
+
+    now = time.monotonic()
+    if _rebuild_due(app, tag_filter):
+        _rebuild_in_background(app)
+
+    # Transactions can commit out of id order, so look back a little
+    after_id = max(tag_filter.max_id - app.config.get("TAG_FILTER_SYNC_OVERLAP", 100), 0)
+    for tag_pk, tag_id in _tag_ids(after_id):
+        tag_filter.add(tag_id)
+        tag_filter.max_id = max(tag_filter.max_id, tag_pk)
+    tag_filter.synced_at = now
+    return tag_filter
+
+
+def _rebuild_due(app, tag_filter):
+    """Whether this process should rebuild its filter instead of waiting for the task's."""
+    if tag_filter.bloom.count > tag_filter.capacity:
+        return True
+    interval = app.config.get("TAG_FILTER_REBUILD_INTERVAL", 3600)
+    if get_cache(app).shared:
+        # The task publishes one on schedule; give it a missed run
+        interval *= 2
+    return time.monotonic() - tag_filter.built_at >= interval
+
+
+def _rebuild_in_background(app):
+    """Rebuild on a thread, unless one is already building; requests keep the current filter."""
+    if not _build_lock.acquire(blocking=False):
+        return
+
+    def rebuild():
+        try:
+            with app.app_context():
+                rebuild_tag_filter(app)
+        except Exception as e:
+            logger.warning(f"Tag filter rebuild failed: {e}")
+        finally:
+            _build_lock.release()
+
+    threading.Thread(target=rebuild, name="tag-filter-rebuild", daemon=True).start()
+
+
+def get_tag_filter(app=None):
+    """The current process's filter, loading it on first use."""
+    app = app or current_app._get_current_object()
+    tag_filter = app.extensions.get("ltfpqrr_tag_filter")
+    if tag_filter is None:
+        with _build_lock:
+            tag_filter = app.extensions.get("ltfpqrr_tag_filter") or load_tag_filter(app)
+    return tag_filter
+
+
+def tag_may_exist(tag_id):
+    """False when tag_id certainly does not exist; True means look it up."""
+    app = current_app._get_current_object()
+    if not app.config.get("TAG_FILTER_ENABLED", True):
+        return True
+    try:
+        tag_filter = get_tag_filter(app)
+        if time.monotonic() - tag_filter.synced_at >= app.config.get("TAG_FILTER_SYNC_INTERVAL", 5):
+            # One request syncs; the others use the filter as it is
+            if _sync_lock.acquire(blocking=False):
+                try:
+                    tag_filter = _sync(app, tag_filter)
+                finally:
+                    _sync_lock.release()
+    except Exception as e:
+        # Without a filter every ID goes to the database, as before
+        logger.warning(f"Tag filter unavailable: {e}")
+        return True
+    return tag_id in tag_filter
+
+
+def render_invalid_tag(tag_id):
+    """The invalid-tag page.
+
+    Rendered by Jinja for every request, so the tag ID is escaped for each
+    place it lands in (the markup, and the page URL in the meta tags).
+    """
+    return render_template("found/invalid_tag.html", tag_id=tag_id)
+
+
+def reject_unknown_tags(respond):
+    """Answer with respond(tag_id) when the filter rules tag_id out.
+
+    Goes above cache_page, so rejected IDs don't take up page cache entries.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not tag_may_exist(kwargs["tag_id"]):
+                return respond(kwargs["tag_id"])
+            return view(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def _register_events():
+    global _events_registered
+    if _events_registered:
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from models.models import Tag
+
+    @event.listens_for(Session, "after_flush")
+    def collect_new_tag_ids(session, flush_context):
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Tag) and obj.tag_id:
+                pending.add(obj.tag_id)
+
+    @event.listens_for(Session, "after_commit")
+    def add_new_tag_ids(session):
+        pending = session.info.pop(_PENDING_KEY, ())
+        if not pending or not has_app_context():
+            return
+        tag_filter = current_app.extensions.get("ltfpqrr_tag_filter")
+        if tag_filter is not None:
+            for tag_id in pending:
+                tag_filter.add(tag_id)
+
+    @event.listens_for(Session, "after_rollback")
+    def forget_new_tag_ids(session):
+        session.info.pop(_PENDING_KEY, None)
+
+    _events_registered = True
+
+
+def init_tag_filter(app):
+    """Build the filter during warm-up and keep it up to date on commits."""
+    from services.warmup import register_warmer
+
+    _register_events()
+    if app.config.get("TAG_FILTER_ENABLED", True):
+        register_warmer("tag_filter", load_tag_filter)
+
+
+def main(argv):
+    if argv[1:] != ["rebuild"]:
+        print("Usage: python -m services.tag_filter rebuild")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        tag_filter = rebuild_tag_filter(app)
+    print(f"Rebuilt tag filter with {tag_filter.bloom.count} tag IDs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
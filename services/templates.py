@@ -0,0 +1,83 @@
+"""
+Template compilation for LTFPQRR.
+
+Compiled templates are stored in a Jinja filesystem bytecode cache
+(JINJA_BYTECODE_CACHE_DIR), so a fresh worker loads them instead of parsing
+the template sources again. The Docker build fills the cache ahead of time and
+fails when a template does not compile.
+
+Usage (compile every template, exit 1 on syntax errors):
+    python -m services.templates compile
+"""
+import os
+import sys
+from jinja2 import FileSystemBytecodeCache
+from extensions import logger
+
+TEMPLATE_EXTENSIONS = ["html", "txt", "xml"]
+
+
+class BytecodeCache(FileSystemBytecodeCache):
+    """Filesystem bytecode cache that never fails a render.
+
+    A read-only or full cache directory only costs a recompile, so write
+    errors are logged instead of raised.
+    """
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError as e:
+            logger.warning(f"Could not write template bytecode cache: {e}")
+
+
+def init_template_cache(app):
+    """Attach the bytecode cache to the app's Jinja environment."""
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled, cannot create {cache_dir}: {e}")
+        return
+    app.jinja_env.bytecode_cache = BytecodeCache(cache_dir)
+
+
+def compile_templates(app):
+    """Load every template into the environment (and the bytecode cache).
+
+    Returns a list of (template name, error) for templates that failed.
+    """
+    env = app.jinja_env
+    errors = []
+    for name in env.list_templates(extensions=TEMPLATE_EXTENSIONS):
+        try:
+            env.get_template(name)
+        except Exception as e:
+            errors.append((name, e))
+    return errors
+
+
+def main(argv):
+    if argv[1:] != ["compile"]:
+        print("Usage: python -m services.templates compile")
+        return 2
+
+    from app import create_app
+
+    app = create_app()
+    if app.jinja_env.bytecode_cache is None:
+        print("JINJA_BYTECODE_CACHE_DIR is not set, templates are only checked")
+
+    errors = compile_templates(app)
+    for name, error in errors:
+        line = f" line {error.lineno}" if getattr(error, "lineno", None) else ""
+        print(f"{name}{line}: {error}")
+    total = len(app.jinja_env.list_templates(extensions=TEMPLATE_EXTENSIONS))
+    print(f"Compiled {total - len(errors)} of {total} templates")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
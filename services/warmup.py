@@ -0,0 +1,98 @@
+"""
+Startup warm-up for LTFPQRR.
+
+Modules register warmers for their caches; warm_up() runs them all and then
+opens the readiness gate so a worker only takes traffic once it is warm.
+
+With gunicorn's preload_app the master calls prepare_for_fork() once, so the
+warm state lives in pages shared copy-on-write by every worker, and each worker
+calls after_fork() to drop the database connections it inherited.
+"""
+import gc
+import time
+from extensions import logger
+from services import health
+
+_warmers = []
+
+
+def register_warmer(name, func):
+    """Register func(app) to run during warm-up."""
+    if name not in [existing for existing, _ in _warmers]:
+        _warmers.append((name, func))
+
+
+def warmer(name):
+    """Decorator form of register_warmer."""
+    def decorator(func):
+        register_warmer(name, func)
+        return func
+    return decorator
+
+
+def warm_up(app):
+    """Run every registered warmer and mark the process ready.
+
+    A failing warmer is logged and skipped; a cold cache is slower, not broken.
+    Returns a dict of warmer name to duration in milliseconds.
+    """
+    timings = {}
+    for name, func in _warmers:
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                func(app)
+        except Exception as e:
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    health.mark_ready()
+    logger.info(f"Warm-up finished: {timings}")
+    return timings
+
+
+def _dispose_engines(app, close):
+    from extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def prepare_for_fork(app):
+    """Warm the app in the gunicorn master before any worker is forked."""
+    health.defer_probes()
+    timings = warm_up(app)
+    # Connections opened while warming must not be shared with the workers
+    _dispose_engines(app, close=True)
+    # Move the warm objects out of the collector's reach: a collection in a
+    # worker would otherwise write to (and un-share) every page it scans
+    gc.collect()
+    gc.freeze()
+    return timings
+
+
+def after_fork(app):
+    """Reset per-process state in a worker forked from a preloaded master."""
+    # close=False: the sockets belong to the master, only forget the pool
+    _dispose_engines(app, close=False)
+    health.resume_probes(app)
+
+
+@warmer("templates")
+def _compile_templates(app):
+    """Compile every template into the Jinja environment cache."""
+    from services.templates import compile_templates
+
+    for name, error in compile_templates(app):
+        logger.warning(f"Template {name} could not be compiled: {error}")
+
+
+@warmer("url_map")
+def _compile_url_map(app):
+    """Build the URL matcher and adapter once instead of on the first request."""
+    from flask import url_for
+
+    app.url_map.update()
+    with app.test_request_context():
+        url_for("public.index")
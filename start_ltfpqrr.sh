@@ -2,26 +2,10 @@
 
 # Wait for database to be ready
 echo "Waiting for database to be ready..."
-while ! python -c "
-import os
-from sqlalchemy import create_engine
-import sys
-import time
-
-try:
-    # Use SQLAlchemy to test database connection
-    db_url = os.environ.get('DATABASE_URL', 'sqlite:///ltfpqrr.db')
-    engine = create_engine(db_url)
-    conn = engine.connect()
-    conn.close()
-    sys.exit(0)
-except Exception as e:
-    print(f'Database connection failed: {e}')
-    sys.exit(1)
-"; do
-    echo "Database not ready, retrying in 1 second..."
-    sleep 1
-done
+if ! python -m services.health wait-db; then
+    echo "Database did not become ready, giving up."
+    exit 1
+fi
 
 echo "Database is ready!"
 
@@ -92,5 +76,10 @@ with app.app_context():
 "
 
 # Start the Flask application
-echo "Starting Flask application..."
-exec python app.py
+if [ "$FLASK_ENV" = "development" ]; then
+    echo "Starting Flask development server..."
+    exec python app.py
+fi
+
+echo "Starting Flask application with gunicorn..."
+exec gunicorn -c gunicorn.conf.py
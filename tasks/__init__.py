@@ -0,0 +1,8 @@
+"""
+Celery tasks for LTFPQRR.
+
+Task modules listed in TASK_MODULES are imported by the worker
+(celery -A app.celery worker); periodic tasks are scheduled by
+CELERYBEAT_SCHEDULE in config.py (celery -A app.celery beat).
+"""
+TASK_MODULES = ["tasks.admin_jobs", "tasks.photos", "tasks.storage", "tasks.subscriptions", "tasks.tags"]
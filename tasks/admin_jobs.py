@@ -0,0 +1,17 @@
+"""
+Admin job tasks.
+"""
+from celery import shared_task
+from services import admin_jobs
+
+
+@shared_task(ignore_result=True)
+def run_admin_job(job_id):
+    """Refund, cancel or extend the subscriptions of an admin job."""
+    admin_jobs.run_job(job_id)
+
+
+@shared_task(ignore_result=True)
+def requeue_waiting_admin_jobs():
+    """Queue again the admin jobs whose task never reached a worker."""
+    admin_jobs.requeue_waiting_jobs()
@@ -0,0 +1,11 @@
+"""
+Pet photo tasks.
+"""
+from celery import shared_task
+from services import photos
+
+
+@shared_task(ignore_result=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def process_pet_photo(pet_id, filename):
+    """Build the responsive variants of an uploaded pet photo."""
+    photos.process_pet_photo(pet_id, filename)
@@ -0,0 +1,11 @@
+"""
+Photo storage tasks.
+"""
+from celery import shared_task
+from services import storage
+
+
+@shared_task(ignore_result=True)
+def collect_orphaned_blobs():
+    """Delete photo files that no pet has referenced for the grace period."""
+    storage.collect_orphaned_blobs()
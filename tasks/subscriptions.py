@@ -0,0 +1,35 @@
+"""
+Subscription tasks.
+"""
+from celery import shared_task
+from services import approvals, renewals, subscriptions
+
+
+@shared_task(ignore_result=True)
+def expire_lapsed_subscriptions():
+    """Mark subscriptions past their end date as expired."""
+    subscriptions.expire_lapsed_subscriptions()
+
+
+@shared_task(ignore_result=True)
+def send_expiry_notices(table, ids):
+    """Email the owners of subscriptions that just expired."""
+    subscriptions.send_expiry_notices(table, ids)
+
+
+@shared_task(ignore_result=True)
+def renew_due_subscriptions():
+    """Charge the subscriptions due for automatic renewal."""
+    renewals.renew_due_subscriptions()
+
+
+@shared_task(ignore_result=True)
+def send_renewal_notices(subscription_ids):
+    """Email the subscribers of renewed subscriptions."""
+    renewals.send_renewal_notices(subscription_ids)
+
+
+@shared_task(ignore_result=True)
+def send_approval_notices(subscription_ids):
+    """Email the owners of newly approved partner subscriptions."""
+    approvals.send_approval_notices(subscription_ids)
@@ -0,0 +1,17 @@
+"""
+Tag tasks.
+"""
+from celery import shared_task
+from services import tag_claims, tag_filter
+
+
+@shared_task(ignore_result=True)
+def rebuild_tag_filter():
+    """Rebuild the unknown tag ID filter and publish it to the web workers."""
+    tag_filter.rebuild_tag_filter()
+
+
+@shared_task(ignore_result=True)
+def release_expired_reservations():
+    """Clear lapsed checkout holds on tags."""
+    tag_claims.release_expired_reservations()
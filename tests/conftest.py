@@ -0,0 +1,63 @@
+"""
+Shared pytest fixtures for in-process tests.
+
+These tests build the app with the testing configuration (in-memory SQLite)
+and do not need the Docker environment used by the template test suites.
+"""
+import os
+import sys
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app():
+    """Application with a fresh in-memory database."""
+    from app import create_app
+    from extensions import db
+
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Test client for the application."""
+    return app.test_client()
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """Photo storage in a temporary directory."""
+    from services.storage import LocalStorage
+
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    app.extensions["ltfpqrr_storage"] = storage
+    return storage
+
+
+@pytest.fixture
+def fake_stripe(app, monkeypatch):
+    """The Stripe client pointed at benchmarks/fake_stripe.py; yields the fake."""
+    import stripe
+    from benchmarks.fake_stripe import FakeStripeServer
+    from services.stripe_client import StripeGateway
+
+    with FakeStripeServer() as server:
+        # The client sets the SDK's api_base; restore it afterwards
+        monkeypatch.setattr(stripe, "api_base", stripe.api_base)
+        app.config.update(
+            STRIPE_API_BASE=server.url,
+            STRIPE_SECRET_KEY="sk_test_fake",
+            STRIPE_PUBLISHABLE_KEY="pk_test_fake",
+            STRIPE_RETRY_BACKOFF=0,
+        )
+        app.extensions["ltfpqrr_stripe"] = StripeGateway(app.config)
+        yield server.fake
@@ -0,0 +1,186 @@
+"""
+Tests for background admin jobs: bulk refund, cancel and extend.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from test_stripe_client import login
+
+
+@pytest.fixture
+def emails(monkeypatch):
+    import email_utils
+
+    sent = []
+    monkeypatch.setattr(email_utils, "send_subscription_cancelled_email",
+                        lambda user, subscription, refunded=False: sent.append((subscription.id, refunded)))
+    return sent
+
+
+def make_admin():
+    from models.models import Role, User
+
+    admin = User(username="admin", email="admin@example.com", password_hash="x",
+                 first_name="Ad", last_name="Min")
+    admin.roles.append(Role(name="admin"))
+    db.session.add(admin)
+    db.session.commit()
+    return admin
+
+
+def make_partner_subscriptions(count, paid_intents=()):
+    """Active partner subscriptions; the first len(paid_intents) have a Stripe payment."""
+    from models.models import Partner, Payment, Subscription, User
+
+    owner = User(username="partner", email="partner@example.com", password_hash="x",
+                 first_name="Part", last_name="Ner")
+    db.session.add(owner)
+    db.session.flush()
+    partner = Partner(company_name="Acme Tags", email="acme@example.com", owner_id=owner.id)
+    db.session.add(partner)
+    db.session.flush()
+    subscriptions = [
+        Subscription(user_id=owner.id, partner_id=partner.id, subscription_type="partner", status="active",
+                     admin_approved=True, amount=29.99, start_date=datetime.utcnow(),
+                     end_date=datetime.utcnow() + timedelta(days=10))
+        for _ in range(count)
+    ]
+    db.session.add_all(subscriptions)
+    db.session.flush()
+    for subscription, intent_id in zip(subscriptions, paid_intents):
+        db.session.add(Payment(user_id=owner.id, subscription_id=subscription.id, payment_gateway="stripe",
+                               payment_intent_id=intent_id, amount=29.99, status="completed",
+                               payment_type="partner"))
+    db.session.commit()
+    return [subscription.id for subscription in subscriptions]
+
+
+def paid_intent(fake_stripe):
+    from services.stripe_client import get_stripe_client
+
+    return get_stripe_client().create_payment_intent(
+        amount=2999, currency="usd", payment_method="pm_card_visa", confirm=True
+    )["id"]
+
+
+def test_bulk_refund_runs_in_the_background(app, client, fake_stripe, emails):
+    from models.models import AdminJob, Payment, Subscription
+
+    ids = make_partner_subscriptions(3, paid_intents=[paid_intent(fake_stripe)])
+    login(client, make_admin().id)
+    form = {"action": "refund", "subscription_ids": [str(i) for i in ids], "job_token": "t1"}
+
+    response = client.post("/admin/partner-subscriptions/bulk", data=form)
+    job = AdminJob.query.one()
+    assert response.headers["Location"].endswith(f"/admin/jobs/{job.id}")
+
+    progress = client.get(f"/admin/jobs/{job.id}/progress").json
+    assert progress["status"] == "completed" and progress["finished"]
+    assert (progress["done"], progress["succeeded"], progress["failed"]) == (3, 3, 0)
+    assert {subscription.status for subscription in Subscription.query} == {"refunded"}
+    assert Payment.query.one().status == "refunded"
+    assert sorted(emails) == [(ids[0], True), (ids[1], False), (ids[2], False)]
+    assert b"Stripe refund re_" in client.get(f"/admin/jobs/{job.id}").data
+
+    # Submitting the same form again returns the same job without refunding twice
+    refunds = [request for request in fake_stripe.requests if request[1] == "/v1/refunds"]
+    client.post("/admin/partner-subscriptions/bulk", data=form)
+    assert AdminJob.query.count() == 1
+    assert [request for request in fake_stripe.requests if request[1] == "/v1/refunds"] == refunds
+
+
+def test_failed_refund_leaves_the_subscription_active(app, fake_stripe, emails):
+    from services.admin_jobs import start_job
+    from models.models import AdminJobItem, Subscription
+
+    app.config["STRIPE_MAX_RETRIES"] = 0
+    ids = make_partner_subscriptions(2, paid_intents=[paid_intent(fake_stripe)])
+    fake_stripe.fail_next(1, status=402)
+
+    job = start_job("refund", ids, make_admin().id)
+    db.session.refresh(job)
+    assert (job.status, job.succeeded, job.failed) == ("completed", 1, 1)
+    failed = AdminJobItem.query.filter_by(status="failed").one()
+    assert failed.subscription_id == ids[0]
+    assert db.session.get(Subscription, ids[0]).status == "active"
+    assert emails == [(ids[1], False)]
+
+
+def test_extend_and_cancel(app, client, emails):
+    from models.models import Subscription
+
+    ids = make_partner_subscriptions(2)
+    login(client, make_admin().id)
+
+    client.post(f"/admin/partner-subscriptions/extend/{ids[0]}",
+                data={"action": "set_custom", "custom_date": "2030-01-31", "job_token": "t2"})
+    assert db.session.get(Subscription, ids[0]).end_date == datetime(2030, 1, 31)
+
+    response = client.post(f"/admin/partner-subscriptions/extend/{ids[0]}",
+                           data={"action": "set_custom", "custom_date": "soon", "job_token": "t2"})
+    assert response.headers["Location"].endswith("/admin/partner-subscriptions")
+
+    client.post(f"/admin/partner-subscriptions/cancel/{ids[1]}", data={"job_token": "t2"})
+    client.post("/admin/partner-subscriptions/bulk",
+                data={"action": "cancel", "subscription_ids": [str(i) for i in ids], "job_token": "t3"})
+    db.session.expire_all()
+    assert [db.session.get(Subscription, i).status for i in ids] == ["cancelled", "cancelled"]
+    assert emails == []
+
+    for page in ("/admin/partner-subscriptions", f"/admin/partner-subscriptions/extend/{ids[0]}", "/admin/jobs"):
+        assert client.get(page).status_code == 200
+
+
+def test_a_claimed_job_is_not_run_twice(app):
+    from models.models import AdminJob, AdminJobItem
+    from services.admin_jobs import resume_job, run_job
+
+    ids = make_partner_subscriptions(2)
+    admin = make_admin()
+    job = AdminJob(kind="cancel", params={}, idempotency_key="k", status="running", total=2, created_by=admin.id)
+    db.session.add(job)
+    db.session.flush()
+    db.session.add_all([AdminJobItem(job_id=job.id, subscription_id=ids[0], status="succeeded"),
+                        AdminJobItem(job_id=job.id, subscription_id=ids[1], status="running")])
+    job.succeeded = 1
+    db.session.commit()
+
+    # A redelivered task finds the job already running
+    assert run_job(job.id).done == 1
+
+    # Resuming after a crash finishes the interrupted item
+    job = resume_job(job.id)
+    assert (job.status, job.succeeded) == ("completed", 2)
+
+
+def test_a_job_that_cannot_be_queued_waits_for_the_beat_schedule(app, client, monkeypatch, emails):
+    import extensions
+    from models.models import AdminJob, Subscription
+    from services.admin_jobs import requeue_waiting_jobs
+
+    def broker_down(app):
+        raise ConnectionError("broker unreachable")
+
+    ids = make_partner_subscriptions(2)
+    login(client, make_admin().id)
+    monkeypatch.setattr(extensions, "get_celery", broker_down)
+
+    client.post("/admin/partner-subscriptions/bulk",
+                data={"action": "cancel", "subscription_ids": [str(i) for i in ids], "job_token": "t4"})
+    job = AdminJob.query.one()
+    # Nothing ran in the request
+    assert job.status == "queued"
+    assert {db.session.get(Subscription, i).status for i in ids} == {"active"}
+    html = client.get(f"/admin/jobs/{job.id}").get_data(as_text=True)
+    assert "Pending: waiting for a worker" in html and f"/admin/jobs/{job.id}/resume" in html
+
+    assert requeue_waiting_jobs(older_than=0) == []
+    monkeypatch.undo()
+    assert requeue_waiting_jobs(older_than=3600) == []
+    assert requeue_waiting_jobs(older_than=0) == [job.id]
+    db.session.refresh(job)
+    assert job.status == "completed"
+    db.session.expire_all()
+    assert {db.session.get(Subscription, i).status for i in ids} == {"cancelled"}
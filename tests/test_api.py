@@ -0,0 +1,109 @@
+"""
+Tests for the JSON scan API.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from extensions import db
+from test_page_cache import make_found_tag
+
+
+def scan_count():
+    from models.models import SearchLog
+
+    return SearchLog.query.count()
+
+
+def test_found_document_is_cached_and_logs_every_scan(app, client, monkeypatch):
+    import routes.api as api_routes
+
+    tag, pet = make_found_tag("ABC123")
+    pet.photo = "p_large.jpg"
+    pet.photo_variants = {"thumb": {"webp": "p_thumb.webp", "jpeg": "p_thumb.jpg", "width": 160, "height": 120}}
+    db.session.commit()
+
+    first = client.get("/api/v1/found/abc123")
+    assert first.status_code == 200
+    assert first.mimetype == "application/json"
+    assert first.get_json() == {
+        "status": "found",
+        "tag_id": "ABC123",
+        "pet": {
+            "name": "Rex",
+            "breed": None,
+            "color": None,
+            "photo": {
+                "url": "/media/p_large.jpg",
+                "variants": {"thumb": {"webp": "/media/p_thumb.webp", "jpeg": "/media/p_thumb.jpg",
+                                       "width": 160, "height": 120}},
+            },
+        },
+        "contact": {"method": "form", "url": "/tag/found/ABC123/contact"},
+    }
+    assert scan_count() == 1
+
+    def fail(tag_id):
+        raise AssertionError("cached scan must not look the tag up")
+
+    monkeypatch.setattr(api_routes, "find_tag", fail)
+    second = client.get("/api/v1/found/abc123")
+    assert second.data == first.data
+    not_modified = client.get("/api/v1/found/abc123", headers={"If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert scan_count() == 3
+
+
+def test_pet_changes_invalidate_the_document(app, client):
+    tag, pet = make_found_tag("ABC123")
+    assert client.get("/api/v1/found/ABC123").get_json()["pet"]["name"] == "Rex"
+
+    pet.name = "Max"
+    db.session.commit()
+    assert client.get("/api/v1/found/ABC123").get_json()["pet"]["name"] == "Max"
+
+
+def test_unregistered_and_invalid_tags(app, client):
+    from models.models import Tag
+
+    tag, pet = make_found_tag("ABC123")
+    db.session.add(Tag(tag_id="FREE01", status="available", created_by=pet.owner_id))
+    db.session.commit()
+
+    unregistered = client.get("/api/v1/found/free01")
+    assert unregistered.status_code == 200
+    assert unregistered.get_json() == {"status": "unregistered", "tag_id": "FREE01"}
+
+    invalid = client.get("/api/v1/found/NOPE99")
+    assert invalid.status_code == 404
+    assert invalid.get_json() == {"status": "invalid", "tag_id": "NOPE99"}
+    assert scan_count() == 0
+
+
+def test_orjson_provider_matches_default_output(app):
+    from flask.json.provider import DefaultJSONProvider
+    from services.json_provider import HAS_ORJSON, OrjsonProvider
+
+    if not HAS_ORJSON:
+        return
+    value = {"b": Decimal("9.99"), "a": datetime(2026, 1, 2, 3, 4, 5), "c": [None, True, "é"]}
+    default = DefaultJSONProvider(app)
+    fast = OrjsonProvider(app)
+
+    assert fast.loads(fast.dumps(value)) == default.loads(default.dumps(value))
+    assert fast.dumps(value) == default.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def test_scanner_app_scans_are_logged_and_notified(app, client, monkeypatch):
+    import utils
+    from models.models import NotificationPreference
+
+    tag, pet = make_found_tag("ABC123")
+    db.session.add(NotificationPreference(user_id=pet.owner_id, notification_type="tag_search", enabled=True))
+    db.session.commit()
+    notified = []
+    monkeypatch.setattr(utils, "send_notification_email", lambda owner, tag, pet: notified.append(pet.id))
+
+    for user_agent in ("okhttp/4.12.0", "axios/1.6.2", ""):
+        assert client.get("/api/v1/found/ABC123", headers={"User-Agent": user_agent}).status_code == 200
+    assert scan_count() == 3
+    assert notified == [pet.id] * 3
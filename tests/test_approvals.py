@@ -0,0 +1,96 @@
+"""
+Tests for the partner subscription review queue: batch approve and reject.
+"""
+from datetime import datetime
+
+import pytest
+
+from extensions import db
+from test_admin_jobs import make_admin
+from test_dashboards import count_queries
+from test_stripe_client import login
+
+
+@pytest.fixture
+def approval_emails(monkeypatch):
+    import email_utils
+
+    sent = []
+    monkeypatch.setattr(email_utils, "send_subscription_approved_email",
+                        lambda user, subscription: sent.append(subscription.id))
+    return sent
+
+
+def make_requests(count):
+    """Pending partner subscription requests, as Partner signup creates them."""
+    from models.models import Partner, Subscription, User
+
+    owner = User(username="partner", email="partner@example.com", password_hash="x",
+                 first_name="Part", last_name="Ner")
+    db.session.add(owner)
+    db.session.flush()
+    partner = Partner(company_name="Acme Tags", email="acme@example.com", owner_id=owner.id)
+    db.session.add(partner)
+    db.session.flush()
+    subscriptions = [
+        Subscription(user_id=owner.id, partner_id=partner.id, subscription_type="partner",
+                     status="pending", admin_approved=False, amount=29.99, start_date=datetime.utcnow())
+        for _ in range(count)
+    ]
+    db.session.add_all(subscriptions)
+    db.session.commit()
+    return [subscription.id for subscription in subscriptions]
+
+
+def test_batch_approve_updates_once_and_emails_once(app, client, approval_emails):
+    from models.models import Subscription
+
+    ids = make_requests(3)
+    admin = make_admin()
+    login(client, admin.id)
+
+    with count_queries() as statements:
+        response = client.post("/admin/partner-subscriptions/approve",
+                               data={"subscription_ids": [str(i) for i in ids[:2]]})
+    assert response.status_code == 302
+    assert sum(statement.startswith("UPDATE subscription") for statement in statements) == 1
+    assert sorted(approval_emails) == ids[:2]
+
+    for subscription in Subscription.query.filter(Subscription.id.in_(ids[:2])):
+        assert subscription.admin_approved and subscription.status == "active"
+        assert subscription.approved_by == admin.id
+    assert not db.session.get(Subscription, ids[2]).admin_approved
+
+    # Approving again (a double submit, or a second admin) changes nothing
+    client.post(f"/admin/partner-subscriptions/approve/{ids[0]}")
+    assert sorted(approval_emails) == ids[:2]
+
+
+def test_batch_reject_skips_approved_requests(app, client, approval_emails):
+    from models.models import Subscription
+    from services.approvals import approve_partner_subscriptions, reject_partner_subscriptions
+
+    ids = make_requests(3)
+    admin = make_admin()
+    approve_partner_subscriptions([ids[0]], admin)
+
+    assert reject_partner_subscriptions(ids, admin) == ids[1:]
+    statuses = [db.session.get(Subscription, i).status for i in ids]
+    assert statuses == ["active", "cancelled", "cancelled"]
+    assert approval_emails == [ids[0]]
+
+
+def test_review_queue_is_paginated_with_bounded_queries(app, client):
+    app.config["ADMIN_REVIEW_PAGE_SIZE"] = 5
+    make_requests(12)
+    login(client, make_admin().id)
+    client.get("/admin/partner-subscriptions")
+
+    with count_queries() as statements:
+        response = client.get("/admin/partner-subscriptions?pending_page=3")
+    html = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert "Page 3 of 3" in html
+    assert html.count('form="review-form"') == 2
+    assert len(statements) < 15
@@ -0,0 +1,74 @@
+"""
+Tests for static asset fingerprinting and response compression.
+"""
+import gzip
+import json
+import shutil
+
+from services.assets import IMMUTABLE_CACHE_CONTROL, build_assets, init_assets
+
+
+def test_build_fingerprints_and_rewrites_css(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "img").mkdir()
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "img" / "bg.png").write_bytes(b"png")
+    (tmp_path / "uploads" / "pet.jpg").write_bytes(b"jpg")
+    (tmp_path / "css" / "site.css").write_text(
+        "a{background:url('/static/img/bg.png')} b{background:url(../img/bg.png?v=1)}" * 20
+    )
+
+    manifest = build_assets(str(tmp_path))
+
+    assert set(manifest) == {"css/site.css", "img/bg.png"}
+    css_path = tmp_path / manifest["css/site.css"]
+    css = css_path.read_text()
+    bg_name = manifest["img/bg.png"].split("/")[-1]
+    assert f"url('../img/{bg_name}')" in css
+    assert f"url(../img/{bg_name}?v=1)" in css
+    assert gzip.decompress((tmp_path / (manifest["css/site.css"] + ".gz")).read_bytes()).decode() == css
+    assert json.loads((tmp_path / "dist" / "manifest.json").read_text()) == manifest
+
+
+def test_fingerprinted_assets_are_immutable_and_precompressed(app, client, tmp_path):
+    static = tmp_path / "static"
+    shutil.copytree(app.static_folder, static, ignore=shutil.ignore_patterns("uploads", "dist"))
+    app.static_folder = str(static)
+    manifest = build_assets(str(static))
+    init_assets(app)
+
+    with app.test_request_context():
+        from services.assets import static_url
+        url = static_url("css/custom.css")
+    assert url == f"/static/{manifest['css/custom.css']}"
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert gzip.decompress(response.data) == (static / "css" / "custom.css").read_bytes()
+    response.close()
+
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers
+    plain.close()
+
+
+def test_html_is_compressed_with_weak_etag(client):
+    plain = client.get("/contact")
+    response = client.get("/contact", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers["ETag"] == "W/" + plain.headers["ETag"]
+
+    revalidated = client.get(
+        "/contact", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/healthz", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
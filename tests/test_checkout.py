@@ -0,0 +1,110 @@
+"""
+Tests for checkout sessions: payment intent reuse and single processing.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from extensions import db
+from test_pricing import make_plans
+from test_stripe_client import login, make_available_tags, make_user
+
+
+def create_intent(client):
+    response = client.post("/payment/stripe/create-intent", json={"payment_type": "tag"})
+    assert response.status_code == 200
+    return response.json["client_secret"]
+
+
+def intent_requests(fake_stripe):
+    return [path for method, path in fake_stripe.requests if path == "/v1/payment_intents"]
+
+
+def test_repeated_checkout_reuses_the_payment_intent(app, client, fake_stripe):
+    make_plans()
+    user = make_user()
+    make_available_tags(user.id, "ABC123", "XYZ789")
+    login(client, user.id, claiming_tag_id="ABC123", subscription_type="lifetime")
+
+    secret = create_intent(client)
+    assert create_intent(client) == secret
+    assert len(intent_requests(fake_stripe)) == 1
+
+    # A different purchase gets its own intent
+    with client.session_transaction() as session:
+        session["claiming_tag_id"] = "XYZ789"
+    assert create_intent(client) != secret
+    assert len(intent_requests(fake_stripe)) == 2
+
+
+def test_expired_checkout_gets_a_new_intent(app, client, fake_stripe):
+    from models.models import CheckoutSession
+
+    make_plans()
+    user = make_user()
+    make_available_tags(user.id, "ABC123", "XYZ789")
+    login(client, user.id, claiming_tag_id="ABC123", subscription_type="lifetime")
+    secret = create_intent(client)
+    CheckoutSession.query.update({CheckoutSession.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    assert create_intent(client) != secret
+    keys = [checkout.idempotency_key for checkout in CheckoutSession.query.order_by(CheckoutSession.id)]
+    assert len(set(keys)) == 2
+
+
+def test_payment_is_processed_once(app, client, fake_stripe, monkeypatch):
+    import email_utils
+    from models.models import CheckoutSession, Payment
+    from utils import process_successful_payment
+
+    monkeypatch.setattr(email_utils, "send_subscription_confirmation_email", lambda *args, **kwargs: None)
+    make_plans()
+    user = make_user()
+    make_available_tags(user.id, "ABC123", "XYZ789")
+    login(client, user.id, claiming_tag_id="ABC123", subscription_type="lifetime")
+    secret = create_intent(client)
+    intent_id = secret.split("_secret")[0]
+
+    # The webhook and the confirm route both report it
+    for _ in range(2):
+        assert process_successful_payment(
+            user_id=user.id, payment_type="tag", payment_method="stripe", amount=9.99,
+            payment_intent_id=intent_id, subscription_type="lifetime",
+        )
+    assert Payment.query.filter_by(payment_intent_id=intent_id).count() == 1
+    assert CheckoutSession.query.filter_by(payment_intent_id=intent_id).one().status == "completed"
+
+    # Buying again after paying needs a new intent
+    assert create_intent(client) != secret
+
+
+def test_payment_is_credited_to_the_plan_bought(app, client, fake_stripe, monkeypatch):
+    import email_utils
+    from models.models import CheckoutSession, Payment, PricingPlan, Subscription
+    from services.stripe_client import get_stripe_client
+    from utils import process_successful_payment
+
+    for name in ("send_subscription_confirmation_email", "send_admin_approval_notification"):
+        monkeypatch.setattr(email_utils, name, lambda *args, **kwargs: None)
+    make_plans()
+    # A second partner plan with the same period, listed after the first
+    bigger = PricingPlan(name="Partner Plus", price=Decimal("29.99"), billing_period="monthly",
+                         plan_type="partner", max_tags=500, sort_order=5)
+    db.session.add(bigger)
+    db.session.commit()
+    user = make_user()
+    login(client, user.id, partner_subscription_type="monthly", pricing_plan_id=bigger.id)
+
+    response = client.post("/payment/stripe/create-intent", json={"payment_type": "partner"})
+    intent_id = response.json["client_secret"].split("_secret")[0]
+    assert CheckoutSession.query.one().pricing_plan_id == bigger.id
+    metadata = get_stripe_client().retrieve_payment_intent(intent_id)["metadata"]
+    assert metadata["pricing_plan_id"] == str(bigger.id)
+
+    assert process_successful_payment(
+        user_id=user.id, payment_type="partner", payment_method="stripe", amount=29.99,
+        payment_intent_id=intent_id, subscription_type="monthly",
+    )
+    assert Payment.query.one().pricing_plan_id == bigger.id
+    subscription = Subscription.query.one()
+    assert (subscription.pricing_plan_id, subscription.max_tags) == (bigger.id, 500)
@@ -0,0 +1,111 @@
+"""
+Tests for the dashboard loaders.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import g
+from sqlalchemy import event
+
+from extensions import db
+
+
+def make_customer(username, pet_count):
+    from models.models import User, Pet, Tag, Subscription
+
+    user = User(username=username, email=f"{username}@example.com", password_hash="x",
+                first_name="Pat", last_name="Owner")
+    db.session.add(user)
+    db.session.flush()
+    for i in range(pet_count):
+        pet = Pet(name=f"{username}-pet-{i}", owner_id=user.id)
+        db.session.add(pet)
+        db.session.flush()
+        tag = Tag(tag_id=f"{username[:4].upper()}{i:04d}", status="active",
+                  created_by=user.id, owner_id=user.id, pet_id=pet.id)
+        db.session.add(tag)
+        db.session.flush()
+        # An expired subscription followed by the current one
+        db.session.add(Subscription(user_id=user.id, tag_id=tag.id, subscription_type="monthly",
+                                    status="expired", start_date=datetime.utcnow() - timedelta(days=60),
+                                    end_date=datetime.utcnow() - timedelta(days=30)))
+        db.session.add(Subscription(user_id=user.id, tag_id=tag.id, subscription_type="yearly",
+                                    status="active", start_date=datetime.utcnow()))
+    # One tag without a pet or subscription
+    db.session.add(Tag(tag_id=f"{username[:4].upper()}FREE", status="active",
+                       created_by=user.id, owner_id=user.id))
+    db.session.commit()
+    return user
+
+
+def log_in(client, user):
+    # Requests reuse the fixture's app context, where Flask-Login caches the user
+    g.pop("_login_user", None)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user.id)
+        sess["_fresh"] = True
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def dashboard_queries(app, username, pet_count):
+    user = make_customer(username, pet_count)
+    client = app.test_client()
+    log_in(client, user)
+    # First render fills the navigation/sidebar fragment caches
+    assert client.get("/dashboard/customer").status_code == 200
+    with count_queries() as statements:
+        response = client.get("/dashboard/customer")
+    assert response.status_code == 200
+    return len(statements), response.get_data(as_text=True)
+
+
+def test_query_count_does_not_grow_with_pets(app):
+    few, _ = dashboard_queries(app, "single", 1)
+    many, html = dashboard_queries(app, "breeder", 12)
+
+    assert many == few
+    assert "breeder-pet-11" in html and "BREE0011" in html
+    assert html.count("Yearly") == 12
+    assert "Monthly" not in html
+    assert "No pet assigned" in html
+
+
+def test_loader_returns_latest_subscription_per_tag(app):
+    from services.dashboards import load_customer_dashboard
+
+    user = make_customer("owner", 2)
+    data = load_customer_dashboard(user.id)
+
+    assert [pet.tag_id for pet in data.pets] == ["OWNE0000", "OWNE0001"]
+    assert [(tag.tag_id, tag.pet_name, tag.subscription_type, tag.subscription_active) for tag in data.tags] == [
+        ("OWNE0000", "owner-pet-0", "yearly", True),
+        ("OWNE0001", "owner-pet-1", "yearly", True),
+        ("OWNEFREE", None, None, False),
+    ]
+
+
+def test_qr_code_is_only_for_the_tag_owner(app):
+    user = make_customer("owner", 1)
+    other = make_customer("other", 0)
+    client = app.test_client()
+
+    log_in(client, user)
+    response = client.get("/tag/qr/owne0000")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+
+    log_in(client, other)
+    assert client.get("/tag/qr/OWNE0000").status_code == 403
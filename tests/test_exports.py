@@ -0,0 +1,97 @@
+"""
+Tests for the streaming CSV/NDJSON exports.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from extensions import db
+from test_admin_jobs import make_admin
+from test_stripe_client import login, make_user
+
+
+def make_partner_tags(owner_username, company, *tag_ids):
+    """A partner owned by a new user, with tags; returns (owner, partner)."""
+    from models.models import Partner, Tag, User
+
+    owner = User(username=owner_username, email=f"{owner_username}@example.com", password_hash="x",
+                 first_name="Part", last_name="Ner")
+    db.session.add(owner)
+    db.session.flush()
+    partner = Partner(company_name=company, email=f"{company}@example.com", owner_id=owner.id)
+    db.session.add(partner)
+    db.session.flush()
+    db.session.add_all(
+        Tag(tag_id=tag_id, status="available", created_by=owner.id, partner_id=partner.id) for tag_id in tag_ids
+    )
+    db.session.commit()
+    return owner, partner
+
+
+def test_admin_export_streams_the_filtered_list(app, client):
+    make_user()
+    login(client, make_admin().id)
+
+    response = client.get("/admin/export/users.csv?search=buy")
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    assert "attachment; filename=users-" in response.headers["Content-Disposition"]
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["id", "username", "email", "first_name", "last_name", "phone", "created_at"]
+    assert [row[1] for row in rows[1:]] == ["buyer"]
+    assert "password" not in response.get_data(as_text=True)
+
+    assert client.get("/admin/export/users.xml").status_code == 404
+    assert client.get("/admin/export/users.csv?partner_id=1").status_code == 404
+
+
+def test_export_is_read_a_chunk_at_a_time(app):
+    from services.exports import stream_export
+
+    make_partner_tags("acme", "acme", *(f"TAG{i:03}" for i in range(5)))
+
+    chunks = list(stream_export("tags", "ndjson", chunk_size=2))
+    assert len(chunks) == 3
+    tags = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [tag["tag_id"] for tag in tags] == [f"TAG{i:03}" for i in range(5)]
+    assert tags[0]["created_by"] == "acme" and tags[0]["owner"] is None
+
+
+def test_partner_exports_only_their_own_tags_and_scans(app, client):
+    from models.models import SearchLog, Tag
+
+    owner, partner = make_partner_tags("acme", "acme", "ACME01", "ACME02")
+    _, other = make_partner_tags("other", "other", "OTHER1")
+    tag = Tag.query.filter_by(tag_id="ACME01").one()
+    db.session.add_all([
+        SearchLog(tag_id=tag.id, ip_address="10.0.0.1", timestamp=datetime.utcnow()),
+        SearchLog(tag_id=tag.id, ip_address="10.0.0.2", timestamp=datetime.utcnow() - timedelta(days=10)),
+        SearchLog(tag_id=Tag.query.filter_by(tag_id="OTHER1").one().id, ip_address="10.0.0.3"),
+    ])
+    db.session.commit()
+    login(client, owner.id)
+
+    tags = client.get(f"/partner/{partner.id}/export/tags.csv").get_data(as_text=True)
+    assert "ACME01" in tags and "ACME02" in tags and "OTHER1" not in tags
+
+    today = date.today().isoformat()
+    scans = client.get(f"/partner/{partner.id}/export/scans.ndjson?start={today}").get_data(as_text=True)
+    # Finders' IP addresses and browsers stay with the admins
+    assert [sorted(json.loads(line)) for line in scans.splitlines()] == [["id", "tag_id", "timestamp"]]
+
+    assert client.get(f"/partner/{other.id}/export/tags.csv").status_code == 302
+    assert client.get(f"/partner/{partner.id}/export/users.csv").status_code == 404
+
+
+def test_csv_cells_are_not_spreadsheet_formulas(app):
+    from services.exports import stream_export
+    from models.models import User
+
+    db.session.add(User(username="=HYPERLINK(1)", email="@evil@example.com", password_hash="x",
+                        first_name="-2+3", last_name="Plain"))
+    db.session.commit()
+
+    rows = list(csv.reader(io.StringIO("".join(stream_export("users", "csv")))))
+    assert rows[1][1:5] == ["'=HYPERLINK(1)", "'@evil@example.com", "'-2+3", "Plain"]
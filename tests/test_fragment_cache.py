@@ -0,0 +1,109 @@
+"""
+Tests for the application cache and template fragment caching.
+"""
+from flask import render_template_string
+from flask_login import login_user
+
+from extensions import db
+from services.cache import LocalCache
+
+TEMPLATE = '{% cache "greeting", request.endpoint %}{{ render() }}{% endcache %}'
+
+
+def make_user(username="alice"):
+    from models.models import User
+
+    user = User(username=username, email=f"{username}@example.com", password_hash="x",
+                first_name="Alice", last_name="Smith")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_fragment_rendered_once_per_user_version(app):
+    from models.models import Role
+
+    user = make_user()
+    calls = []
+
+    def render():
+        calls.append(1)
+        return f"{user.get_full_name()} {len(user.roles)}"
+
+    with app.test_request_context("/"):
+        login_user(user)
+        first = render_template_string(TEMPLATE, render=render)
+        second = render_template_string(TEMPLATE, render=render)
+
+        assert first == second == "Alice Smith 0"
+        assert len(calls) == 1
+
+        # Role changes invalidate once the session commits
+        role = Role(name="admin")
+        db.session.add(role)
+        user.roles.append(role)
+        assert render_template_string(TEMPLATE, render=render) == "Alice Smith 0"
+        db.session.commit()
+        assert render_template_string(TEMPLATE, render=render) == "Alice Smith 1"
+
+        user.first_name = "Alicia"
+        db.session.commit()
+        assert render_template_string(TEMPLATE, render=render) == "Alicia Smith 1"
+        assert len(calls) == 3
+
+
+def test_fragments_are_per_user(app):
+    alice, bob = make_user("alice"), make_user("bob")
+    bob.first_name = "Bob"
+    db.session.commit()
+
+    with app.test_request_context("/"):
+        login_user(alice)
+        assert render_template_string(TEMPLATE, render=alice.get_full_name) == "Alice Smith"
+    with app.test_request_context("/"):
+        login_user(bob)
+        assert render_template_string(TEMPLATE, render=bob.get_full_name) == "Bob Smith"
+
+
+def test_version_bump_reaches_other_workers_within_snapshot_ttl(app, monkeypatch):
+    import services.cache
+    from models.models import Role
+
+    now = [1000.0]
+    monkeypatch.setattr(services.cache.time, "monotonic", lambda: now[0])
+    # Two workers, each with its own in-process cache
+    workers = [LocalCache(), LocalCache()]
+    user = make_user()
+    role = Role(name="admin")
+    user.roles.append(role)
+    db.session.commit()
+
+    def render_in(worker):
+        app.extensions["ltfpqrr_cache"] = worker
+        with app.test_request_context("/"):
+            login_user(user)
+            return render_template_string(TEMPLATE, render=lambda: f"roles {len(user.roles)}")
+
+    assert [render_in(worker) for worker in workers] == ["roles 1", "roles 1"]
+
+    # Worker 0 revokes the role; worker 1 still has the old version
+    app.extensions["ltfpqrr_cache"] = workers[0]
+    user.roles.remove(role)
+    db.session.commit()
+    assert render_in(workers[0]) == "roles 0"
+    assert render_in(workers[1]) == "roles 1"
+
+    now[0] += app.config["SNAPSHOT_TTL"]
+    assert render_in(workers[1]) == "roles 0"
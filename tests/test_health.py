@@ -0,0 +1,43 @@
+"""
+Tests for the liveness and readiness endpoints.
+"""
+from services import health
+
+
+def test_healthz_does_no_io(client, monkeypatch):
+    def fail(app):
+        raise AssertionError("healthz must not probe dependencies")
+
+    monkeypatch.setitem(health.PROBES, "database", fail)
+
+    response = client.get("/healthz")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "ok"}
+
+
+def test_readyz_waits_for_warm_up(app, client, monkeypatch):
+    monkeypatch.setattr(health, "_ready", False)
+    health.run_probes(app)
+
+    response = client.get("/readyz")
+
+    assert response.status_code == 503
+    assert response.get_json()["warmed"] is False
+
+
+def test_readyz_reports_cached_probe_results(app, client, monkeypatch):
+    from services.warmup import warm_up
+
+    monkeypatch.setattr(health, "_ready", False)
+    warm_up(app)
+
+    calls = []
+    monkeypatch.setitem(health.PROBES, "database", lambda app: calls.append(1))
+    response = client.get("/readyz")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "ready"
+    assert body["checks"]["database"]["ok"] is True
+    assert calls == []
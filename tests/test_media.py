@@ -0,0 +1,109 @@
+"""
+Tests for photo uploads and the media route.
+"""
+import hashlib
+import io
+import os
+
+from extensions import db
+
+
+def test_uploads_stream_to_a_hashed_temp_file(app, local_storage):
+    from flask import request
+    from services.storage import HashingTempFile, store_upload
+
+    data = os.urandom(300 * 1024)
+    with app.test_request_context(
+        "/pet/create", method="POST", data={"photo": (io.BytesIO(data), "rex.jpg")}
+    ):
+        upload = request.files["photo"]
+        assert isinstance(upload.stream, HashingTempFile)
+        temp_path = upload.stream.name
+        key = store_upload(upload)
+        db.session.commit()
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert key == f"{digest[:2]}/{digest}.jpg"
+    with local_storage.open(key) as f:
+        assert f.read() == data
+    # Closed (and deleted) when the request ends
+    assert not os.path.exists(temp_path)
+
+
+def store(local_storage, data, filename="rex.jpg"):
+    from services.storage import store_stream
+
+    key = store_stream(io.BytesIO(data), filename)
+    db.session.commit()
+    return key
+
+
+def test_content_addressed_photos_are_immutable_with_ranges(client, local_storage):
+    data = bytes(range(256)) * 8
+    key = store(local_storage, data)
+    digest = key.split("/")[1].split(".")[0]
+
+    response = client.get(f"/media/{key}")
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.mimetype == "image/jpeg"
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+    partial = client.get(f"/media/{key}", headers={"Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.data == data[100:200]
+    assert partial.headers["Content-Range"] == f"bytes 100-199/{len(data)}"
+
+    not_modified = client.get(f"/media/{key}", headers={"If-None-Match": f'"{digest}"'})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+
+def test_legacy_photos_are_revalidated(client, local_storage):
+    os.makedirs(local_storage.root)
+    with open(local_storage.path("uuid_rex.png"), "wb") as f:
+        f.write(b"old upload")
+
+    response = client.get("/media/uuid_rex.png")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=86400"
+
+    not_modified = client.get(
+        "/media/uuid_rex.png", headers={"If-Modified-Since": response.headers["Last-Modified"]}
+    )
+    assert not_modified.status_code == 304
+
+
+def test_accel_redirect_offloads_to_nginx(app, client, local_storage):
+    key = store(local_storage, b"photo bytes", filename="rex.webp")
+    app.config["MEDIA_ACCEL_REDIRECT_PREFIX"] = "/_media/"
+
+    response = client.get(f"/media/{key}")
+    assert response.status_code == 200
+    assert response.headers["X-Accel-Redirect"] == f"/_media/{key}"
+    assert response.mimetype == "image/webp"
+    assert response.data == b""
+
+
+def test_missing_and_invalid_keys_are_404(client, local_storage):
+    assert client.get("/media/ab/missing.jpg").status_code == 404
+    assert client.get("/media/..%2Fconfig.py").status_code == 404
+
+
+def test_s3_photos_redirect_to_the_bucket(app, client):
+    from services.storage import S3Storage
+
+    app.extensions["ltfpqrr_storage"] = S3Storage("pets", client=object(), public_url="https://cdn.test")
+    response = client.get("/media/ab/photo.jpg")
+    assert response.status_code == 302
+    assert response.headers["Location"] == "https://cdn.test/ab/photo.jpg"
+
+
+def test_local_storage_root_does_not_depend_on_the_working_directory(app):
+    from services.storage import get_storage
+
+    root = get_storage(app).root
+    assert os.path.isabs(root)
+    assert root == os.path.join(app.root_path, app.config["UPLOAD_FOLDER"])
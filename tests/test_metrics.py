@@ -0,0 +1,38 @@
+"""
+Tests for the Prometheus metrics endpoint.
+"""
+
+
+def test_metrics_endpoint_reports_request_latency(client):
+    client.get("/privacy")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    body = response.get_data(as_text=True)
+    assert 'ltfpqrr_http_request_duration_seconds_count{blueprint="public",endpoint="public.privacy"' in body
+    assert "ltfpqrr_celery_queue_depth" in body
+
+
+def test_tag_scans_are_counted(client):
+    client.get("/tag/found/NOPE1234")
+
+    body = client.get("/metrics").get_data(as_text=True)
+
+    assert 'ltfpqrr_tag_scans_total{channel="page",result="invalid"}' in body
+    assert "ltfpqrr_db_queries_total" in body
+
+
+def test_failed_statements_leave_no_timing_state_on_the_connection(app):
+    import pytest
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from extensions import db
+
+    with db.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM no_such_table"))
+        connection.rollback()
+        connection.execute(text("SELECT 1"))
+        assert not [key for key in connection.info if key.startswith("_metrics")]
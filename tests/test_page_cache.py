@@ -0,0 +1,128 @@
+"""
+Tests for the anonymous page cache.
+"""
+from extensions import db
+
+
+def make_found_tag(tag_id="ABC123"):
+    from models.models import User, Pet, Tag
+
+    owner = User(username="owner", email="owner@example.com", password_hash="x",
+                 first_name="Pat", last_name="Owner")
+    db.session.add(owner)
+    db.session.flush()
+    pet = Pet(name="Rex", owner_id=owner.id)
+    db.session.add(pet)
+    db.session.flush()
+    tag = Tag(tag_id=tag_id, status="active", created_by=owner.id, owner_id=owner.id, pet_id=pet.id)
+    db.session.add(tag)
+    db.session.commit()
+    return tag, pet
+
+
+def test_hit_skips_view_and_304_on_matching_etag(client, monkeypatch):
+    import routes.public as public_routes
+
+    first = client.get("/contact")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached page must not render")
+
+    monkeypatch.setattr(public_routes, "render_template", fail)
+
+    second = client.get("/contact")
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert second.headers["ETag"] == etag
+
+    not_modified = client.get("/contact", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+
+def test_pricing_changes_invalidate_homepage(app, client):
+    from models.models import PricingPlan
+    from services.page_cache import invalidate_pages
+    from services.pricing import pricing_catalog
+
+    assert b"Gold Plan" not in client.get("/").data
+
+    db.session.add(PricingPlan(name="Gold Plan", price=10, billing_period="monthly",
+                               plan_type="tag", show_on_homepage=True, is_active=True))
+    db.session.commit()
+    assert b"Gold Plan" not in client.get("/").data
+
+    # What the admin pricing routes do after committing
+    pricing_catalog.invalidate()
+    invalidate_pages("pricing")
+    assert b"Gold Plan" in client.get("/").data
+
+    # Query arguments the view reads are part of the key
+    assert client.get("/?tag_id=XYZ").status_code == 302
+
+
+def test_found_page_logs_every_scan_and_follows_pet_changes(app, client):
+    from models.models import SearchLog
+
+    tag, pet = make_found_tag()
+
+    assert b"Rex" in client.get("/tag/found/abc123").data
+    assert b"Rex" in client.get("/tag/found/abc123").data
+    assert SearchLog.query.count() == 2
+
+    pet.name = "Max"
+    db.session.commit()
+    page = client.get("/tag/found/abc123").data
+    assert b"Max" in page and b"Rex" not in page
+    assert SearchLog.query.count() == 3
+
+
+def test_other_workers_drop_stale_pages_within_snapshot_ttl(app, client, monkeypatch):
+    import services.cache
+    from services.cache import LocalCache
+
+    now = [1000.0]
+    monkeypatch.setattr(services.cache.time, "monotonic", lambda: now[0])
+    # Two workers, each with its own in-process cache
+    workers = [LocalCache(), LocalCache()]
+    tag, pet = make_found_tag()
+
+    def page_in(worker):
+        app.extensions["ltfpqrr_cache"] = worker
+        return client.get("/tag/found/abc123").data
+
+    assert b"Rex" in page_in(workers[0]) and b"Rex" in page_in(workers[1])
+
+    # Worker 0 commits the change; worker 1 still has the old generation
+    app.extensions["ltfpqrr_cache"] = workers[0]
+    pet.name = "Max"
+    db.session.commit()
+    assert b"Max" in page_in(workers[0])
+    assert b"Rex" in page_in(workers[1])
+
+    now[0] += app.config["SNAPSHOT_TTL"]
+    assert b"Max" in page_in(workers[1])
+
+
+def test_unknown_tag_page_invalidated_when_tag_is_created(app, client):
+    assert b"Rex" not in client.get("/tag/found/NEW1").data
+    make_found_tag("NEW1")
+    assert b"Rex" in client.get("/tag/found/NEW1").data
+
+
+def test_authenticated_users_bypass_cache(app, client):
+    from models.models import User
+
+    user = User(username="u", email="u@example.com", password_hash="x",
+                first_name="U", last_name="Ser")
+    db.session.add(user)
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user.id)
+        sess["_fresh"] = True
+
+    response = client.get("/contact")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
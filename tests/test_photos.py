@@ -0,0 +1,134 @@
+"""
+Tests for pet photo processing.
+"""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from extensions import db
+
+
+def write_photo(path, size=(2000, 1500), orientation=None):
+    image = Image.new("RGB", size, (200, 120, 40))
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(path, "JPEG", exif=exif.tobytes())
+
+
+def make_pet(photo):
+    from models.models import User, Pet
+
+    owner = User(username="owner", email="owner@example.com", password_hash="x",
+                 first_name="Pat", last_name="Owner")
+    db.session.add(owner)
+    db.session.flush()
+    pet = Pet(name="Rex", owner_id=owner.id, photo=photo)
+    db.session.add(pet)
+    db.session.commit()
+    return pet
+
+
+def test_variants_are_upright_resized_and_stripped(tmp_path):
+    from services.photos import build_variants
+
+    source = tmp_path / "upload.jpg"
+    # Orientation 6: stored landscape, displayed rotated 90 degrees (portrait)
+    write_photo(source, orientation=6)
+
+    variants = build_variants(str(source), str(tmp_path), stem="rex")
+
+    assert [variants[name]["height"] for name in ("thumb", "medium", "large")] == [160, 480, 1080]
+    assert variants["large"]["width"] == 810
+    for variant in variants.values():
+        for key, fmt in (("webp", "WEBP"), ("jpeg", "JPEG")):
+            with Image.open(tmp_path / variant[key]) as image:
+                assert image.format == fmt
+                assert image.size == (variant["width"], variant["height"])
+                assert not image.getexif()
+
+
+def stored_files(storage):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), storage.root).replace(os.sep, "/")
+        for root, dirs, files in os.walk(storage.root) for name in files
+    )
+
+
+def test_upload_is_replaced_by_variants(app, local_storage, tmp_path):
+    from models.models import PhotoBlob
+    from services.photos import enqueue_photo_processing
+    from services.storage import collect_orphaned_blobs, store_file
+
+    write_photo(tmp_path / "upload.jpg")
+    original = store_file(str(tmp_path / "upload.jpg"))
+    pet = make_pet(original)
+
+    # CELERY_ALWAYS_EAGER runs the task in-process
+    enqueue_photo_processing(pet.id, original)
+
+    db.session.refresh(pet)
+    variant_keys = sorted(v[key] for v in pet.photo_variants.values() for key in ("webp", "jpeg"))
+    assert pet.photo == pet.photo_variants["large"]["jpeg"]
+    assert PhotoBlob.query.filter_by(key=original).one().ref_count == 0
+
+    # The original is kept until the collector runs
+    assert stored_files(local_storage) == sorted(variant_keys + [original])
+    assert collect_orphaned_blobs(grace=-1) == 1
+    assert stored_files(local_storage) == variant_keys
+
+
+def test_upload_is_stripped_before_it_is_stored(app, local_storage, tmp_path):
+    from werkzeug.datastructures import FileStorage
+    from services.photos import store_pet_photo
+
+    write_photo(tmp_path / "upload.jpg", orientation=6)
+    with open(tmp_path / "upload.jpg", "rb") as f:
+        key = store_pet_photo(FileStorage(f, filename="upload.jpg"))
+
+    assert stored_files(local_storage) == [key]
+    with Image.open(local_storage.path(key)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (810, 1080)
+        assert not image.getexif()
+
+    with pytest.raises(ValueError):
+        store_pet_photo(FileStorage(io.BytesIO(b"<svg/>"), filename="evil.jpg"))
+    assert stored_files(local_storage) == [key]
+
+
+def test_replaced_photo_is_not_overwritten(app, local_storage):
+    from services.photos import process_pet_photo
+
+    pet = make_pet("new.jpg")
+
+    assert process_pet_photo(pet.id, "old.jpg") is None
+    assert pet.photo == "new.jpg" and pet.photo_variants is None
+    assert stored_files(local_storage) == []
+
+    # Storage errors reach the task, which retries
+    with pytest.raises(OSError):
+        process_pet_photo(pet.id, "new.jpg")
+
+
+def test_macro_renders_srcset(app):
+    from flask import render_template_string
+    from models.models import Pet
+
+    pet = Pet(name="Rex", photo="p_large.jpg", photo_variants={
+        "large": {"webp": "p_large.webp", "jpeg": "p_large.jpg", "width": 1080, "height": 810},
+        "thumb": {"webp": "p_thumb.webp", "jpeg": "p_thumb.jpg", "width": 160, "height": 120},
+        "medium": {"webp": "p_medium.webp", "jpeg": "p_medium.jpg", "width": 480, "height": 360},
+    })
+    template = '{% from "includes/pet_photo.html" import pet_photo %}{{ pet_photo(pet, "200px") }}'
+    with app.test_request_context():
+        html = render_template_string(template, pet=pet)
+        unprocessed = render_template_string(template, pet=Pet(name="Rex", photo="raw.jpg"))
+
+    assert ('srcset="/media/p_thumb.webp 160w, /media/p_medium.webp 480w, '
+            '/media/p_large.webp 1080w"') in html
+    assert 'src="/media/p_medium.jpg"' in html
+    assert 'src="/media/raw.jpg"' in unprocessed and "srcset" not in unprocessed
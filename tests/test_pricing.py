@@ -0,0 +1,70 @@
+"""
+Tests for the pricing catalog.
+"""
+from decimal import Decimal
+
+from extensions import db
+from test_dashboards import count_queries
+
+
+def make_plans():
+    """The default tag and partner plans; returns them by (type, period)."""
+    from models.models import PricingPlan
+
+    plans = {
+        ("tag", "monthly"): PricingPlan(name="Monthly", price=Decimal("9.99"), billing_period="monthly",
+                                        plan_type="tag", show_on_homepage=True, sort_order=1,
+                                        features={"features": ["QR tag", "Found alerts"]}),
+        ("tag", "yearly"): PricingPlan(name="Yearly", price=Decimal("99.99"), billing_period="yearly",
+                                       plan_type="tag", show_on_homepage=True, sort_order=2),
+        ("tag", "lifetime"): PricingPlan(name="Lifetime", price=Decimal("199.99"), billing_period="lifetime",
+                                         plan_type="tag", sort_order=3),
+        ("partner", "monthly"): PricingPlan(name="Partner", price=Decimal("29.99"), billing_period="monthly",
+                                            plan_type="partner", max_tags=100, sort_order=4),
+    }
+    db.session.add_all(plans.values())
+    db.session.add(PricingPlan(name="Retired", price=Decimal("1.00"), billing_period="monthly",
+                               plan_type="tag", is_active=False, sort_order=0))
+    db.session.commit()
+    return plans
+
+
+def test_catalog_indexes_active_plans(app):
+    from services.pricing import get_pricing_catalog
+
+    plans = make_plans()
+    catalog = get_pricing_catalog()
+
+    assert catalog.price("tag", "monthly") == Decimal("9.99")
+    assert catalog.get("partner", "monthly").max_tags == 100
+    assert catalog.get("partner", "yearly") is None
+    assert catalog.by_id(str(plans[("tag", "yearly")].id)).name == "Yearly"
+    assert [plan.name for plan in catalog.homepage] == ["Monthly", "Yearly"]
+    assert [plan.name for plan in catalog.for_type("tag")] == ["Monthly", "Yearly", "Lifetime"]
+    assert catalog.choices("tag")[0] == ("monthly", "Monthly ($9.99/month)")
+    assert catalog.get("tag", "monthly").get_features_list() == ["QR tag", "Found alerts"]
+
+
+def test_checkout_pages_read_prices_from_the_catalog(app, client):
+    from models.models import PaymentGateway
+    from services.pricing import get_pricing_catalog, pricing_catalog
+    from test_stripe_client import login, make_user
+
+    make_plans()
+    db.session.add(PaymentGateway(name="stripe", enabled=True, secret_key="sk", publishable_key="pk"))
+    user = make_user()
+    login(client, user.id, claiming_tag_id="ABC123", subscription_type="yearly")
+    get_pricing_catalog()
+
+    with count_queries() as statements:
+        page = client.get("/payment/tag")
+    assert page.status_code == 200
+    assert b"99.99" in page.data
+    assert not [sql for sql in statements if "pricing_plans" in sql]
+
+    # Admin pricing routes invalidate it after committing a change
+    from models.models import PricingPlan
+    PricingPlan.query.filter_by(billing_period="yearly").update({PricingPlan.price: Decimal("89.99")})
+    db.session.commit()
+    pricing_catalog.invalidate()
+    assert b"89.99" in client.get("/payment/tag").data
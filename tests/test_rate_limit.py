@@ -0,0 +1,99 @@
+"""
+Tests for rate limiting and bot detection.
+"""
+from test_dashboards import count_queries
+from test_page_cache import make_found_tag
+
+BROWSER = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Firefox/118.0"}
+
+
+def limit(app, policies):
+    from services.rate_limit import parse_limit
+
+    app.extensions["ltfpqrr_rate_limits"].clear()
+    app.extensions["ltfpqrr_rate_limits"].update({
+        name: {scope: parse_limit(text) for scope, text in limits.items()}
+        for name, limits in policies.items()
+    })
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    from services import rate_limit
+
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    store = rate_limit.LocalRateStore()
+    per_minute = rate_limit.parse_limit("2/minute")
+
+    assert store.take("k", per_minute) == 0
+    assert store.take("k", per_minute) == 0
+    assert store.take("k", per_minute) == 30
+    now[0] += 30
+    assert store.take("k", per_minute) == 0
+    assert store.take("other", per_minute) == 0
+
+
+def test_limits_are_enforced_per_ip_before_any_query(app, client):
+    make_found_tag("ABC123")
+    limit(app, {"tag.found_pet": {"ip": "2/minute"}})
+
+    assert client.get("/tag/found/ABC123").status_code == 200
+    assert client.get("/tag/found/ABC123").status_code == 200
+    with count_queries() as statements:
+        rejected = client.get("/tag/found/ABC123")
+    assert statements == []
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "30"
+
+    other_ip = client.get("/tag/found/ABC123", environ_base={"REMOTE_ADDR": "10.0.0.9"})
+    assert other_ip.status_code == 200
+
+
+def test_method_policies_and_json_answers(app, client):
+    limit(app, {
+        "tag.contact_owner:POST": {"tag": "1/hour"},
+        "api.found": {"tag": "1/minute"},
+    })
+
+    assert client.get("/api/v1/found/NOPE").status_code == 404
+    rejected = client.get("/api/v1/found/nope")
+    assert rejected.status_code == 429
+    assert rejected.get_json() == {"status": "rate_limited", "retry_after": 60}
+
+    client.post("/tag/found/X1/contact")
+    assert client.post("/tag/found/X1/contact").status_code == 429
+    assert client.get("/tag/found/X1/contact").status_code == 200
+
+
+def test_bots_are_not_logged_or_notified(app, client):
+    from models.models import SearchLog
+    from services.bots import is_bot
+
+    assert is_bot("Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)")
+    assert is_bot("Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)")
+    assert is_bot("facebookexternalhit/1.1")
+    assert not is_bot(BROWSER["User-Agent"])
+    # Scanner apps are built on plain HTTP clients
+    assert not is_bot("okhttp/4.12.0")
+    assert not is_bot("axios/1.6.2")
+    assert not is_bot("")
+
+    make_found_tag("ABC123")
+    client.get("/tag/found/ABC123", headers={"User-Agent": "facebookexternalhit/1.1"})
+    client.get("/tag/found/ABC123", headers={"User-Agent": "facebookexternalhit/1.1"})
+    assert SearchLog.query.count() == 0
+    client.get("/tag/found/ABC123", headers=BROWSER)
+    assert SearchLog.query.count() == 1
+
+
+def test_a_blocked_ip_leaves_the_tag_bucket_alone(app, client):
+    limit(app, {"tag.contact_owner:POST": {"ip": "1/hour", "tag": "2/day"}})
+
+    assert client.post("/tag/found/X1/contact").status_code != 429
+    for _ in range(5):
+        assert client.post("/tag/found/X1/contact").status_code == 429
+
+    # One token was taken from the tag's bucket, by the request that got through
+    finder = {"REMOTE_ADDR": "10.0.0.9"}
+    assert client.post("/tag/found/X1/contact", environ_base=finder).status_code != 429
+    assert client.post("/tag/found/X1/contact", environ_base={"REMOTE_ADDR": "10.0.0.10"}).status_code == 429
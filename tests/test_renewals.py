@@ -0,0 +1,113 @@
+"""
+Tests for the auto-renewal engine, against the local Stripe stand-in.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from extensions import db
+
+
+def make_renewable(user, plan, payment_method, ends_in):
+    from models.models import Subscription
+
+    subscription = Subscription(
+        user_id=user.id, pricing_plan_id=plan.id, subscription_type="tag", status="active",
+        payment_method="stripe", amount=Decimal("9.99"), auto_renew=True,
+        start_date=datetime.utcnow() - timedelta(days=29),
+        end_date=datetime.utcnow() + ends_in,
+        gateway_customer_id="cus_1", gateway_payment_method_id=payment_method,
+    )
+    db.session.add(subscription)
+    return subscription
+
+
+def test_due_subscriptions_are_charged_once_and_recorded(app, fake_stripe, monkeypatch):
+    import email_utils
+    from models.models import Payment, PricingPlan, Subscription, User
+    from services.renewals import renew_due_subscriptions
+
+    emailed = []
+    monkeypatch.setattr(email_utils, "send_subscription_renewal_email",
+                        lambda user, subscription: emailed.append(subscription.id))
+    user = User(username="c", email="c@example.com", password_hash="x", first_name="C", last_name="Ust")
+    plan = PricingPlan(name="Monthly", price=Decimal("9.99"), billing_period="monthly", plan_type="tag")
+    db.session.add_all([user, plan])
+    db.session.flush()
+    due = [make_renewable(user, plan, "pm_card_visa", timedelta(hours=h)) for h in (1, 2, 3)]
+    declined = make_renewable(user, plan, "pm_card_chargeDeclined", timedelta(hours=1))
+    later = make_renewable(user, plan, "pm_card_visa", timedelta(days=10))
+    no_card = make_renewable(user, plan, None, timedelta(hours=1))
+    db.session.commit()
+    due_ids = [s.id for s in due]
+    old_ends = {s.id: s.end_date for s in due}
+    declined_id, later_id, no_card_id = declined.id, later.id, no_card.id
+
+    outcomes = renew_due_subscriptions(batch_size=2, concurrency=3)
+    assert outcomes == {"completed": 3, "failed": 1}
+    charged = [path for method, path in fake_stripe.requests if path == "/v1/payment_intents"]
+    assert len(charged) == 4
+
+    for subscription_id in due_ids:
+        subscription = db.session.get(Subscription, subscription_id)
+        assert subscription.end_date == old_ends[subscription_id] + timedelta(days=30)
+    payments = Payment.query.order_by(Payment.id).all()
+    assert sorted(p.status for p in payments) == ["completed"] * 3 + ["failed"]
+    failed = next(p for p in payments if p.status == "failed")
+    assert failed.subscription_id == declined_id
+    assert failed.payment_metadata["failure_reason"] == "card_declined"
+    assert all(p.payment_type == "renewal" and p.payment_intent_id for p in payments)
+    assert sorted(emailed) == sorted(due_ids)
+    assert {later_id, no_card_id}.isdisjoint(p.subscription_id for p in payments)
+
+    # The bulk-inserted payments are counted in the revenue ledger
+    from models.models import RevenueLedger
+    ledger = {(row.status, row.pricing_plan_id): (row.payment_count, row.amount) for row in RevenueLedger.query}
+    assert ledger == {("completed", plan.id): (3, Decimal("29.97")), ("failed", plan.id): (1, Decimal("9.99"))}
+
+    # A second run only retries the declined card; Stripe replays its answer
+    assert renew_due_subscriptions() == {"failed": 1}
+    assert Payment.query.count() == 4
+
+
+def test_idempotency_key_is_per_period():
+    from services.renewals import DueRenewal, idempotency_key
+
+    renewal = DueRenewal(7, 1, Decimal("1"), "USD", datetime(2026, 1, 31, 12), "monthly", "cus", "pm", None)
+    assert idempotency_key(renewal) == "renewal-7-20260131120000"
+    assert idempotency_key(renewal._replace(end_date=datetime(2026, 3, 2, 12))) != idempotency_key(renewal)
+
+
+def test_subscription_changed_during_the_run_is_not_renewed(app, fake_stripe, monkeypatch):
+    import email_utils
+    from services import renewals
+    from models.models import Payment, PricingPlan, Subscription, User
+
+    emailed = []
+    monkeypatch.setattr(email_utils, "send_subscription_renewal_email",
+                        lambda user, subscription: emailed.append(subscription.id))
+    user = User(username="c", email="c@example.com", password_hash="x", first_name="C", last_name="Ust")
+    plan = PricingPlan(name="Monthly", price=Decimal("9.99"), billing_period="monthly", plan_type="tag")
+    db.session.add_all([user, plan])
+    db.session.flush()
+    kept, extended = (make_renewable(user, plan, "pm_card_visa", timedelta(hours=1)) for _ in range(2))
+    db.session.commit()
+    kept_id, extended_id, kept_end = kept.id, extended.id, kept.end_date
+    manual_end = datetime(2030, 1, 31)
+
+    record = renewals._record
+
+    def extended_by_an_admin_while_charging(results, now):
+        Subscription.query.filter_by(id=extended_id).update({Subscription.end_date: manual_end})
+        db.session.commit()
+        return record(results, now)
+
+    monkeypatch.setattr(renewals, "_record", extended_by_an_admin_while_charging)
+    assert renewals.renew_due_subscriptions() == {"completed": 2}
+
+    assert db.session.get(Subscription, kept_id).end_date == kept_end + timedelta(days=30)
+    assert db.session.get(Subscription, extended_id).end_date == manual_end
+    assert emailed == [kept_id]
+    flagged = Payment.query.filter_by(subscription_id=extended_id).one()
+    assert flagged.status == "completed"
+    assert flagged.payment_metadata["reconcile"] == "subscription_changed"
+    assert "reconcile" not in Payment.query.filter_by(subscription_id=kept_id).one().payment_metadata
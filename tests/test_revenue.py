@@ -0,0 +1,145 @@
+"""
+Tests for the revenue ledger and the admin reports built on it.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from extensions import db
+from test_admin_jobs import make_admin
+from test_dashboards import count_queries
+from test_stripe_client import login
+
+
+def make_payment(user_id, amount, status="completed", gateway="stripe", payment_type="tag",
+                 plan_id=None, created_at=datetime(2026, 3, 1, 12), currency="USD"):
+    from models.models import Payment
+
+    payment = Payment(user_id=user_id, payment_gateway=gateway, amount=Decimal(amount), currency=currency,
+                      status=status, payment_type=payment_type, pricing_plan_id=plan_id, created_at=created_at,
+                      payment_metadata={"note": "x" * 100}, gateway_response={"raw": "y" * 100})
+    db.session.add(payment)
+    return payment
+
+
+def ledger():
+    from models.models import RevenueLedger
+
+    return sorted(
+        (row.day, row.payment_gateway, row.payment_type, row.pricing_plan_id, row.currency, row.status,
+         row.payment_count, row.amount)
+        for row in RevenueLedger.query if row.payment_count or row.amount
+    )
+
+
+def test_ledger_follows_payment_changes_and_matches_a_rebuild(app):
+    from services.revenue import rebuild_ledger
+
+    admin = make_admin()
+    first = make_payment(admin.id, "10.00")
+    second = make_payment(admin.id, "5.50")
+    make_payment(admin.id, "20.00", gateway="paypal", created_at=datetime(2026, 3, 2, 9))
+    failed = make_payment(admin.id, "7.00", status="pending")
+    db.session.commit()
+
+    failed.mark_failed("card_declined")
+    first.status = "refunded"
+    db.session.commit()
+    # Rolled back changes never reach the ledger
+    second.amount = Decimal("99.00")
+    db.session.flush()
+    db.session.rollback()
+    db.session.delete(second)
+    db.session.commit()
+
+    incremental = ledger()
+    assert incremental == [
+        (date(2026, 3, 1), "stripe", "tag", 0, "USD", "failed", 1, Decimal("7.00")),
+        (date(2026, 3, 1), "stripe", "tag", 0, "USD", "refunded", 1, Decimal("10.00")),
+        (date(2026, 3, 2), "paypal", "tag", 0, "USD", "completed", 1, Decimal("20.00")),
+    ]
+    assert rebuild_ledger() == 3
+    assert ledger() == incremental
+
+
+def test_processed_payments_record_their_plan(app, monkeypatch):
+    import email_utils
+    from models.models import Payment
+    from test_pricing import make_plans
+    from test_stripe_client import make_available_tags, make_user
+    from utils import process_successful_payment
+
+    monkeypatch.setattr(email_utils, "send_subscription_confirmation_email", lambda *args, **kwargs: None)
+    plans = make_plans()
+    user = make_user()
+    make_available_tags(user.id, "ABC123")
+    assert process_successful_payment(
+        user_id=user.id, payment_type="tag", payment_method="stripe", amount=99.99,
+        payment_intent_id="pi_1", claiming_tag_id="ABC123", subscription_type="yearly",
+    )
+
+    yearly = plans[("tag", "yearly")].id
+    assert Payment.query.one().pricing_plan_id == yearly
+    assert [row[3:] for row in ledger()] == [(yearly, "USD", "completed", 1, Decimal("99.99"))]
+
+
+def test_reports_read_the_ledger(app, client):
+    from models.models import PricingPlan
+
+    admin = make_admin()
+    plan = PricingPlan(name="Yearly", price=Decimal("99.99"), billing_period="yearly", plan_type="tag")
+    db.session.add(plan)
+    db.session.flush()
+    make_payment(admin.id, "99.99", plan_id=plan.id)
+    make_payment(admin.id, "99.99", plan_id=plan.id, status="refunded")
+    make_payment(admin.id, "29.99", payment_type="partner", created_at=datetime(2026, 3, 5))
+    db.session.commit()
+    login(client, admin.id)
+
+    with count_queries() as statements:
+        page = client.get("/admin/revenue?start=2026-03-01&end=2026-03-31&by=plan")
+    assert page.status_code == 200
+    assert b"Yearly (tag, yearly)" in page.data and b"129.98" in page.data
+    assert not [sql for sql in statements if "FROM payments" in sql]
+
+    export = client.get("/admin/revenue.csv?start=2026-03-01&end=2026-03-04")
+    assert export.mimetype == "text/csv"
+    assert export.data.decode().splitlines() == [
+        "day,payment_gateway,payment_type,pricing_plan_id,currency,status,payment_count,amount",
+        f"2026-03-01,stripe,tag,{plan.id},USD,completed,1,99.99",
+        f"2026-03-01,stripe,tag,{plan.id},USD,refunded,1,99.99",
+    ]
+
+
+def test_payment_list_leaves_out_the_json_columns(app, client):
+    admin = make_admin()
+    for _ in range(3):
+        make_payment(admin.id, "1.00")
+    db.session.commit()
+    login(client, admin.id)
+    app.config["ADMIN_PAYMENTS_PAGE_SIZE"] = 2
+
+    with count_queries() as statements:
+        page = client.get("/admin/payments")
+    assert page.status_code == 200
+    assert b"Older" in page.data
+    payment_selects = [sql for sql in statements if "FROM payments" in sql]
+    assert len(payment_selects) == 1
+    assert "payment_metadata" not in payment_selects[0] and "gateway_response" not in payment_selects[0]
+
+
+def test_report_keeps_currencies_apart(app):
+    from services.revenue import revenue_report
+
+    admin = make_admin()
+    make_payment(admin.id, "10.00")
+    make_payment(admin.id, "20.00", currency="EUR")
+    make_payment(admin.id, "5.00", currency="EUR", created_at=datetime(2026, 3, 2))
+    db.session.commit()
+
+    rows, totals = revenue_report(date(2026, 3, 1), date(2026, 3, 2), "payment_gateway")
+    assert [(row.label, row.currency, row.revenue) for row in rows] == [
+        ("stripe", "EUR", Decimal("25.00")), ("stripe", "USD", Decimal("10.00")),
+    ]
+    assert [(total.currency, total.completed_count, total.revenue) for total in totals] == [
+        ("EUR", 2, Decimal("25.00")), ("USD", 1, Decimal("10.00")),
+    ]
@@ -0,0 +1,75 @@
+"""
+Cold-start guards: importing the app and creating it must stay cheap.
+
+Each check runs in a fresh interpreter so modules imported by other tests do
+not hide regressions. The time budgets can be tuned for slow machines with
+LTFPQRR_IMPORT_BUDGET and LTFPQRR_CREATE_APP_BUDGET (seconds).
+"""
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET = float(os.environ.get("LTFPQRR_IMPORT_BUDGET", "1.5"))
+CREATE_APP_BUDGET = float(os.environ.get("LTFPQRR_CREATE_APP_BUDGET", "0.5"))
+
+# Modules that must only be imported when they are actually used
+LAZY_MODULES = ["stripe", "paypalrestsdk", "celery"]
+
+PROBE_SCRIPT = """
+import json, sys, time
+
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter() - started
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+started = time.perf_counter()
+flask_app = app_module.create_app("testing")
+created = time.perf_counter() - started
+
+print(json.dumps({
+    "import_seconds": imported,
+    "create_app_seconds": created,
+    "default_app_created_on_import": "app" in vars(app_module) and vars(app_module)["app"] is not flask_app,
+    "sql_statements": statements,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def _probe():
+    """Run the probe script in a fresh interpreter, best of three runs."""
+    runs = []
+    for _ in range(3):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE_SCRIPT],
+            cwd=PROJECT_ROOT,
+            env={**os.environ, "FLASK_ENV": "testing"},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["import_seconds"] + run["create_app_seconds"])
+
+
+def test_import_and_create_app_have_no_side_effects():
+    result = _probe()
+
+    assert result["default_app_created_on_import"] is False
+    assert result["sql_statements"] == []
+    assert result["loaded"] == []
+
+
+def test_cold_start_within_budget():
+    result = _probe()
+
+    assert result["import_seconds"] < IMPORT_BUDGET, result
+    assert result["create_app_seconds"] < CREATE_APP_BUDGET, result
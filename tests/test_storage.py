@@ -0,0 +1,154 @@
+"""
+Tests for content-addressed photo storage.
+"""
+import hashlib
+import io
+import os
+
+import pytest
+
+from extensions import db
+
+
+class FakeS3Client:
+    """In-memory stand-in for the boto3 S3 client calls the backend uses."""
+
+    class NotFound(Exception):
+        response = {"Error": {"Code": "404"}}
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None):
+        with open(filename, "rb") as f:
+            self.objects[(bucket, key)] = (f.read(), ExtraArgs or {})
+
+    def download_fileobj(self, bucket, key, fileobj):
+        fileobj.write(self.objects[(bucket, key)][0])
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.NotFound()
+        return {}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+def upload(data, filename="photo.JPG"):
+    from werkzeug.datastructures import FileStorage
+    from services.storage import store_upload
+
+    key = store_upload(FileStorage(io.BytesIO(data), filename=filename, content_type="text/html"))
+    db.session.commit()
+    return key
+
+
+def ref_count(key):
+    from models.models import PhotoBlob
+
+    return db.session.query(PhotoBlob.ref_count).filter_by(key=key).scalar()
+
+
+def test_identical_uploads_are_stored_once(app, local_storage):
+    data = b"same photo bytes"
+    digest = hashlib.sha256(data).hexdigest()
+
+    first = upload(data)
+    second = upload(data, filename="copy.jpg")
+
+    assert first == second == f"{digest[:2]}/{digest}.jpg"
+    assert ref_count(first) == 2
+    with local_storage.open(first) as f:
+        assert f.read() == data
+    assert os.listdir(os.path.join(local_storage.root, digest[:2])) == [f"{digest}.jpg"]
+
+
+def test_collector_only_deletes_unreferenced_blobs_after_grace(app, local_storage):
+    from services.storage import collect_orphaned_blobs, release
+
+    kept = upload(b"kept")
+    orphan = upload(b"orphan")
+    release(orphan)
+    db.session.commit()
+
+    assert collect_orphaned_blobs() == 0  # still within the grace period
+    assert local_storage.exists(orphan)
+
+    assert collect_orphaned_blobs(grace=-1) == 1
+    assert not local_storage.exists(orphan) and ref_count(orphan) is None
+    assert local_storage.exists(kept) and ref_count(kept) == 1
+
+
+def test_reupload_restores_a_collected_file(app, local_storage):
+    from services.storage import release
+
+    key = upload(b"photo")
+    release(key)
+    db.session.commit()
+    # The file went missing while the blob was unreferenced
+    local_storage.delete(key)
+
+    assert upload(b"photo") == key
+    assert local_storage.exists(key) and ref_count(key) == 1
+
+
+def test_releasing_a_legacy_photo_deletes_it(app, local_storage):
+    from services.storage import release
+
+    os.makedirs(local_storage.root)
+    with open(os.path.join(local_storage.root, "uuid_rex.jpg"), "wb") as f:
+        f.write(b"old upload")
+
+    release("uuid_rex.jpg")
+    assert not local_storage.exists("uuid_rex.jpg")
+
+
+def test_s3_backend(app):
+    from services.storage import S3Storage
+
+    client = FakeS3Client()
+    app.extensions["ltfpqrr_storage"] = S3Storage("pets", prefix="photos/", client=client)
+
+    key = upload(b"\xff\xd8 jpeg", filename="rex.jpeg")
+
+    data, extra = client.objects[("pets", f"photos/{key}")]
+    assert data == b"\xff\xd8 jpeg"
+    # Served as an image whatever the client claimed, and cacheable forever
+    assert extra == {"ContentType": "image/jpeg", "CacheControl": "public, max-age=31536000, immutable"}
+    with app.test_request_context():
+        assert app.jinja_env.globals["photo_url"](key).startswith(f"https://s3.test/pets/photos/{key}?")
+
+    storage = app.extensions["ltfpqrr_storage"]
+    with storage.open(key) as f:
+        assert f.read() == data
+    storage.delete(key)
+    assert not storage.exists(key)
+
+
+@pytest.mark.parametrize("key", ["../config.py", "/etc/passwd", "a/../../b.jpg"])
+def test_keys_cannot_escape_the_storage_root(local_storage, key):
+    with pytest.raises(ValueError):
+        local_storage.path(key)
+
+
+def test_file_of_a_rolled_back_upload_is_collected(app, local_storage):
+    from werkzeug.datastructures import FileStorage
+    from services.storage import collect_orphaned_blobs, store_upload
+
+    from models.models import User
+
+    # The pet form's transaction fails after the photo was stored
+    db.session.add(User(username="u", email="u@example.com", password_hash="x", first_name="U", last_name="Ser"))
+    db.session.flush()
+    key = store_upload(FileStorage(io.BytesIO(b"abandoned"), filename="photo.jpg"))
+    db.session.rollback()
+
+    # The file is tracked by an unreferenced blob, not left behind untracked
+    assert local_storage.exists(key) and ref_count(key) == 0
+    assert collect_orphaned_blobs(grace=-1) == 1
+    assert not local_storage.exists(key)
+
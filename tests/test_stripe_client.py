@@ -0,0 +1,115 @@
+"""
+Tests for the shared Stripe client, against the local Stripe stand-in.
+"""
+import pytest
+
+from extensions import db
+
+
+def login(client, user_id, **session_values):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+        session.update(session_values)
+
+
+def make_user():
+    from models.models import User
+
+    user = User(username="buyer", email="buyer@example.com", password_hash="x",
+                first_name="Buy", last_name="Er")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_available_tags(created_by, *tag_ids):
+    from models.models import Tag
+
+    db.session.add_all(Tag(tag_id=tag_id, status="available", created_by=created_by) for tag_id in tag_ids)
+    db.session.commit()
+
+
+def test_server_errors_are_retried_with_the_same_idempotency_key(app, fake_stripe):
+    from services.stripe_client import get_stripe_client
+
+    fake_stripe.fail_next(2, status=503)
+    intent = get_stripe_client().create_payment_intent(amount=999, currency="usd")
+    assert intent["amount"] == 999
+    assert fake_stripe.requests == [("POST", "/v1/payment_intents")] * 3
+    assert len([obj for obj in fake_stripe.objects.values() if obj["object"] == "payment_intent"]) == 1
+
+
+def test_client_errors_are_not_retried(app, fake_stripe):
+    import stripe
+    from services.stripe_client import get_stripe_client
+
+    with pytest.raises(stripe.error.InvalidRequestError):
+        get_stripe_client().retrieve_payment_intent("pi_missing")
+    assert len(fake_stripe.requests) == 1
+
+
+def test_circuit_breaker_stops_calls_until_reset(app, fake_stripe):
+    import stripe
+    from services.stripe_client import GatewayUnavailable, StripeGateway, get_stripe_client
+
+    app.config.update(STRIPE_MAX_RETRIES=0, STRIPE_BREAKER_THRESHOLD=2, STRIPE_BREAKER_RESET=30)
+    gateway = app.extensions["ltfpqrr_stripe"] = StripeGateway(app.config)
+    fake_stripe.fail_next(2)
+    for _ in range(2):
+        with pytest.raises(stripe.error.APIError):
+            get_stripe_client().create_customer(email="a@example.com")
+    assert gateway.breaker.state == "open"
+
+    with pytest.raises(GatewayUnavailable):
+        get_stripe_client().create_customer(email="a@example.com")
+    assert len(fake_stripe.requests) == 2
+
+    # After the reset timeout one probe goes out and closes the breaker
+    gateway.breaker.opened_at -= 30
+    assert get_stripe_client().create_customer(email="a@example.com")["object"] == "customer"
+    assert gateway.breaker.state == "closed"
+
+
+def test_create_intent_uses_configured_keys(app, client, fake_stripe):
+    from test_pricing import make_plans
+
+    make_plans()
+    user = make_user()
+    make_available_tags(user.id, "ABC123")
+    login(client, user.id, subscription_type="monthly", claiming_tag_id="ABC123")
+
+    # The amount comes from the plan, not from the browser
+    response = client.post("/payment/stripe/create-intent", json={"amount": "0.50", "payment_type": "tag"})
+    assert response.status_code == 200
+    assert response.json["publishable_key"] == "pk_test_fake"
+    intent_id = response.json["client_secret"].split("_secret")[0]
+    intent = fake_stripe.objects[intent_id]
+    assert intent["amount"] == 999
+    assert intent["customer"].startswith("cus_")
+    assert intent["metadata"]["claiming_tag_id"] == "ABC123"
+
+
+def test_saving_the_gateway_reloads_settings(app, fake_stripe):
+    from services.stripe_client import get_stripe_client
+    from utils import update_payment_gateway_settings
+
+    assert get_stripe_client().settings.secret_key == "sk_test_fake"
+    assert update_payment_gateway_settings(
+        "stripe", enabled=True, secret_key="sk_test_saved", publishable_key="pk_test_saved",
+        environment="sandbox",
+    )
+    settings = get_stripe_client().settings
+    assert (settings.secret_key, settings.publishable_key) == ("sk_test_saved", "pk_test_saved")
+
+
+def test_refund(app, fake_stripe):
+    from services.stripe_client import get_stripe_client
+
+    stripe_client = get_stripe_client()
+    intent = stripe_client.create_payment_intent(
+        amount=500, currency="usd", payment_method="pm_card_visa", confirm=True
+    )
+    refund = stripe_client.create_refund(payment_intent=intent["id"], idempotency_key="refund-1")
+    assert refund["status"] == "succeeded"
+    assert stripe_client.create_refund(payment_intent=intent["id"], idempotency_key="refund-1")["id"] == refund["id"]
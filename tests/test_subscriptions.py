@@ -0,0 +1,77 @@
+"""
+Tests for the subscription expiry sweeper.
+"""
+from datetime import datetime, timedelta
+
+from extensions import db
+
+
+def make_subscriptions(user, ends):
+    from models.models import Subscription
+
+    subscriptions = [
+        Subscription(user_id=user.id, subscription_type="tag", status="active",
+                     start_date=datetime.utcnow() - timedelta(days=400), end_date=end)
+        for end in ends
+    ]
+    db.session.add_all(subscriptions)
+    db.session.commit()
+    return subscriptions
+
+
+def test_lapsed_subscriptions_expire_in_chunks_and_signal(app, monkeypatch):
+    from models.models import Partner, PartnerSubscription, Subscription, User
+    from services import subscriptions as subscription_service
+
+    app.config["SUBSCRIPTION_EXPIRY_EMAILS"] = False
+    user = User(username="c", email="c@example.com", password_hash="x", first_name="C", last_name="Ust")
+    db.session.add(user)
+    db.session.commit()
+    now = datetime.utcnow()
+    lapsed = make_subscriptions(user, [now - timedelta(days=d) for d in range(1, 6)])
+    current = make_subscriptions(user, [now + timedelta(days=1), None])
+    partner = Partner(company_name="P", email="p@example.com", owner_id=user.id)
+    db.session.add(partner)
+    db.session.flush()
+    db.session.add(PartnerSubscription(partner_id=partner.id, status="active", admin_approved=True,
+                                       start_date=now - timedelta(days=40), end_date=now - timedelta(days=5)))
+    db.session.commit()
+    lapsed_ids = sorted(s.id for s in lapsed)
+    current_ids = [s.id for s in current]
+
+    received = []
+
+    def receiver(model, ids):
+        received.append((model.__tablename__, ids))
+
+    subscription_service.subscriptions_expired.connect(receiver)
+    try:
+        assert subscription_service.expire_lapsed_subscriptions(batch_size=2) == 6
+    finally:
+        subscription_service.subscriptions_expired.disconnect(receiver)
+
+    assert [table for table, _ in received] == ["subscription"] * 3 + ["partner_subscription"]
+    assert sorted(i for table, ids in received[:3] for i in ids) == lapsed_ids
+    assert Subscription.query.filter_by(status="expired").count() == 5
+    assert sorted(s.id for s in Subscription.query.filter_by(status="active")) == sorted(current_ids)
+    assert PartnerSubscription.query.filter_by(status="active").count() == 0
+    # Nothing left to do
+    assert subscription_service.expire_lapsed_subscriptions() == 0
+
+
+def test_expiry_emails_go_to_the_subscriber(app, monkeypatch):
+    import email_utils
+    from models.models import User
+
+    sent = []
+    monkeypatch.setattr(email_utils, "send_subscription_expired_email",
+                        lambda user, subscription: sent.append((user.email, subscription.id)))
+    user = User(username="c", email="c@example.com", password_hash="x", first_name="C", last_name="Ust")
+    db.session.add(user)
+    db.session.commit()
+    (subscription,) = make_subscriptions(user, [datetime.utcnow() - timedelta(hours=1)])
+
+    from services.subscriptions import expire_lapsed_subscriptions
+
+    assert expire_lapsed_subscriptions() == 1
+    assert sent == [("c@example.com", subscription.id)]
@@ -0,0 +1,98 @@
+"""
+Tests for tag reservations and atomic claiming.
+"""
+from datetime import datetime, timedelta
+
+from extensions import db
+from test_stripe_client import make_available_tags
+
+
+def make_buyers(count):
+    from models.models import User
+
+    buyers = [User(username=f"buyer{i}", email=f"buyer{i}@example.com", password_hash="x",
+                   first_name="Buy", last_name=str(i)) for i in range(count)]
+    db.session.add_all(buyers)
+    db.session.commit()
+    return [buyer.id for buyer in buyers]
+
+
+def test_reservation_holds_the_tag_until_it_lapses(app):
+    from models.models import Tag
+    from services.tag_claims import claim_tag, release_expired_reservations, reserve_tag
+
+    first, second = make_buyers(2)
+    make_available_tags(first, "ABC123")
+    now = datetime.utcnow()
+
+    assert reserve_tag("abc123", first, now)
+    assert reserve_tag("ABC123", first, now)  # renewing is fine
+    assert not reserve_tag("ABC123", second, now)
+    assert claim_tag("ABC123", second, now) is None
+    db.session.rollback()
+
+    # Once the hold lapses another buyer may take it
+    later = now + timedelta(seconds=app.config["TAG_RESERVATION_TTL"] + 1)
+    assert release_expired_reservations(later) == 1
+    assert Tag.query.filter_by(tag_id="ABC123").one().reserved_by is None
+    assert reserve_tag("ABC123", second, later)
+
+
+def test_a_tag_is_claimed_once(app):
+    from models.models import Tag
+    from services.tag_claims import claim_tag, reserve_tag
+
+    first, second = make_buyers(2)
+    make_available_tags(first, "ABC123")
+    assert reserve_tag("ABC123", first)
+
+    tag_pk = claim_tag("ABC123", first)
+    db.session.commit()
+    assert tag_pk
+    assert claim_tag("ABC123", second) is None
+    assert claim_tag("ABC123", first) is None
+
+    tag = db.session.get(Tag, tag_pk)
+    assert (tag.owner_id, tag.status, tag.reserved_until) == (first, "claimed", None)
+    assert not reserve_tag("ABC123", second)
+
+
+def test_payment_for_a_taken_tag_is_flagged(app, monkeypatch):
+    import email_utils
+    from models.models import Payment, Subscription
+    from utils import process_successful_payment
+
+    monkeypatch.setattr(email_utils, "send_subscription_confirmation_email", lambda *args, **kwargs: None)
+    first, second = make_buyers(2)
+    make_available_tags(first, "ABC123")
+
+    for user_id, intent_id in ((first, "pi_first"), (second, "pi_second")):
+        assert process_successful_payment(
+            user_id=user_id, payment_type="tag", payment_method="stripe", amount=199.99,
+            payment_intent_id=intent_id, claiming_tag_id="ABC123", subscription_type="lifetime",
+        )
+
+    assert [subscription.user_id for subscription in Subscription.query] == [first]
+    conflicted = Payment.query.filter_by(payment_intent_id="pi_second").one()
+    assert conflicted.payment_metadata["claim_conflict"] is True
+    assert "claim_conflict" not in Payment.query.filter_by(payment_intent_id="pi_first").one().payment_metadata
+
+
+def test_claim_form_reserves_the_tag(app, client):
+    from models.models import Tag
+    from test_pricing import make_plans
+    from test_stripe_client import login
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    make_plans()
+    first, second = make_buyers(2)
+    make_available_tags(first, "ABC123")
+    login(client, first)
+
+    response = client.post("/tag/claim", data={"tag_id": "ABC123", "subscription_type": "lifetime"})
+    assert response.status_code == 302
+    assert Tag.query.filter_by(tag_id="ABC123").one().reserved_by == first
+
+    login(client, second)
+    client.post("/tag/claim", data={"tag_id": "ABC123", "subscription_type": "lifetime"})
+    assert Tag.query.filter_by(tag_id="ABC123").one().reserved_by == first
@@ -0,0 +1,114 @@
+"""
+Tests for the unknown tag ID filter.
+"""
+from extensions import db
+from test_dashboards import count_queries
+from test_page_cache import make_found_tag
+
+
+def test_bloom_filter_has_no_false_negatives_and_round_trips():
+    from services.tag_filter import BloomFilter
+
+    bloom = BloomFilter(1000, 0.01)
+    ids = [f"TAG{i:05d}" for i in range(1000)]
+    for tag_id in ids:
+        bloom.add(tag_id)
+    assert all(tag_id in bloom for tag_id in ids)
+
+    false_positives = sum(f"OTHER{i:05d}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+    copy = BloomFilter.from_bytes(bloom.to_bytes())
+    assert copy.count == 1000
+    assert all(tag_id in copy for tag_id in ids)
+
+
+def test_unknown_ids_are_rejected_without_queries(app, client):
+    make_found_tag("ABC123")
+    client.get("/tag/found/ABC123")
+
+    with count_queries() as statements:
+        page = client.get("/tag/found/NOPE42")
+        redirect = client.get("/found/nope43")
+        api = client.get("/api/v1/found/NOPE44")
+    assert statements == []
+
+    assert page.status_code == 200
+    assert b"NOPE42" in page.data and b"Invalid QR Code" in page.data
+    assert b"nope43" in redirect.data
+    assert api.status_code == 404
+    assert api.get_json() == {"status": "invalid", "tag_id": "NOPE44"}
+    # Known IDs (any case) still reach the page
+    assert b"Rex" in client.get("/tag/found/abc123").data
+
+
+def test_invalid_page_escapes_the_tag_id(app, client):
+    make_found_tag("ABC123")
+    response = client.get('/tag/found/"><script>x')
+    assert b"<script>x" not in response.data
+    assert b"&#34;&gt;&lt;script&gt;x" in response.data
+
+    # The page URL in the meta tags is the request's own, percent-encoded
+    spaced = client.get("/tag/found/NO%20PE")
+    assert b'og:url" content="http://localhost/tag/found/NO%20PE"' in spaced.data
+    assert b"<code>NO PE</code>" in spaced.data
+
+
+def test_tags_created_by_other_processes_are_synced(app, client):
+    from models.models import Tag
+    from services.tag_filter import get_tag_filter
+
+    tag, pet = make_found_tag("ABC123")
+    tag_filter = get_tag_filter(app)
+    # Inserted outside the ORM, as if by another worker
+    db.session.execute(Tag.__table__.insert().values(tag_id="LATE01", status="active", created_by=pet.owner_id))
+    db.session.commit()
+    assert "LATE01" not in tag_filter
+
+    app.config["TAG_FILTER_SYNC_INTERVAL"] = 0
+    assert client.get("/tag/found/LATE01").status_code == 200
+    assert "LATE01" in get_tag_filter(app)
+
+
+def test_rebuild_is_published_and_adopted(app):
+    from services.tag_filter import get_tag_filter, load_tag_filter, rebuild_tag_filter
+
+    make_found_tag("ABC123")
+    published = rebuild_tag_filter(app)
+    app.extensions.pop("ltfpqrr_tag_filter")
+
+    loaded = load_tag_filter(app)
+    assert loaded.version == published.version
+    assert "abc123" in loaded
+    assert get_tag_filter(app) is loaded
+
+
+def test_stale_filter_is_rebuilt_once_in_the_background(app, client, monkeypatch):
+    import services.tag_filter
+    from services.tag_filter import get_tag_filter
+
+    make_found_tag("ABC123")
+    old = get_tag_filter(app)
+    old.built_at -= app.config["TAG_FILTER_REBUILD_INTERVAL"]
+    app.config["TAG_FILTER_SYNC_INTERVAL"] = 0
+
+    started = []
+
+    class RecordingThread:
+        def __init__(self, target, **kwargs):
+            self.target = target
+
+        def start(self):
+            started.append(self.target)
+
+    monkeypatch.setattr(services.tag_filter.threading, "Thread", RecordingThread)
+
+    # Requests keep answering from the old filter while one rebuild is pending
+    for _ in range(3):
+        assert client.get("/tag/found/NOPE99").status_code == 200
+        assert client.get("/tag/found/ABC123").status_code == 200
+    assert len(started) == 1 and get_tag_filter(app) is old
+
+    started[0]()
+    assert get_tag_filter(app) is not old and "ABC123" in get_tag_filter(app)
+    assert not services.tag_filter._build_lock.locked()
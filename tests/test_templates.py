@@ -0,0 +1,34 @@
+"""
+Tests for template precompilation and the Jinja bytecode cache.
+"""
+from services.templates import BytecodeCache, compile_templates, init_template_cache
+
+
+def test_all_templates_compile(app):
+    assert compile_templates(app) == []
+
+
+def test_bytecode_cache_is_filled_and_reused(app, tmp_path):
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = str(tmp_path)
+    init_template_cache(app)
+    assert isinstance(app.jinja_env.bytecode_cache, BytecodeCache)
+
+    app.jinja_env.get_template("index.html")
+    assert len(list(tmp_path.glob("__jinja2_*.cache"))) >= 1
+
+    # A new environment state loads from the cache instead of compiling
+    app.jinja_env.cache.clear()
+    compiled = []
+    original = app.jinja_env.compile
+    app.jinja_env.compile = lambda *args, **kwargs: compiled.append(args) or original(*args, **kwargs)
+    app.jinja_env.get_template("index.html")
+    assert compiled == []
+
+
+def test_unwritable_cache_does_not_break_rendering(app, tmp_path):
+    app.jinja_env.bytecode_cache = BytecodeCache(str(tmp_path / "missing"))
+
+    template = app.jinja_env.from_string("x")
+    assert template.render() == "x"
+    app.jinja_env.cache.clear()
+    assert app.jinja_env.get_template("404.html") is not None
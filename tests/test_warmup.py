@@ -0,0 +1,58 @@
+"""
+Tests for warm-up, read-mostly snapshots and the preload fork hooks.
+"""
+import gc
+
+from sqlalchemy import event
+
+from extensions import db
+from services import health
+
+
+def count_queries(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_settings_are_read_from_snapshot(app):
+    from models.models import SystemSetting
+
+    SystemSetting.set_value("registration_enabled", "false")
+    assert SystemSetting.get_value("registration_enabled", True) is False
+
+    statements = count_queries(app)
+    for _ in range(5):
+        SystemSetting.get_value("registration_enabled", True)
+        SystemSetting.get_value("site_name", "LTFPQRR")
+    assert statements == []
+
+    # Writes through set_value are visible immediately
+    SystemSetting.set_value("registration_enabled", "true")
+    assert SystemSetting.get_value("registration_enabled", False) is True
+
+
+def test_prepare_for_fork_warms_without_probe_thread(app, monkeypatch):
+    from services import warmup
+
+    monkeypatch.setattr(health, "_ready", False)
+    monkeypatch.setattr(health, "_probes_deferred", False)
+    monkeypatch.setattr(health, "_probe_thread", None)
+    monkeypatch.setattr(gc, "freeze", lambda: None)
+    started = []
+    monkeypatch.setattr(health.threading.Thread, "start", lambda self: started.append(self.name))
+
+    warmup.prepare_for_fork(app)
+
+    assert health.is_ready()
+    assert started == []
+    assert any(name == "index.html" for _, name in app.jinja_env.cache.keys())
+    assert "settings" in app.extensions["ltfpqrr_snapshots"]
+
+    warmup.after_fork(app)
+
+    assert started == ["health-probes"]
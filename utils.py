@@ -7,12 +7,13 @@ from functools import wraps
 from flask import flash, redirect, url_for
 from flask_login import current_user
 from extensions import logger, get_cipher_suite
-import stripe
-import paypalrestsdk
 
 # Get cipher suite for encryption/decryption
 cipher_suite = None
 
+# Payment gateway SDKs are imported and configured on first use
+_configured_gateways = set()
+
 
 def init_utils(app):
     """Initialize utilities with app context."""
@@ -42,19 +43,13 @@ def encrypt_value(value):
         return None
 
 
-def configure_payment_gateways():
-    """Configure payment gateways from database settings."""
+def configure_paypal():
+    """Configure the PayPal SDK from database settings."""
+    import paypalrestsdk
+
     try:
         from models.models import PaymentGateway
-        
-        # Configure Stripe
-        stripe_gateway = PaymentGateway.query.filter_by(
-            name="stripe", enabled=True
-        ).first()
-        if stripe_gateway and stripe_gateway.secret_key:
-            stripe.api_key = decrypt_value(stripe_gateway.secret_key)
 
-        # Configure PayPal
         paypal_gateway = PaymentGateway.query.filter_by(
             name="paypal", enabled=True
         ).first()
@@ -67,9 +62,8 @@ def configure_payment_gateways():
                 }
             )
     except Exception as e:
-        logger.error(f"Error configuring payment gateways: {e}")
+        logger.error(f"Error configuring PayPal: {e}")
         # Fallback to environment variables if database configuration fails
-        stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
         paypalrestsdk.configure(
             {
                 "mode": os.environ.get("PAYPAL_MODE", "sandbox"),
@@ -77,6 +71,24 @@ def configure_payment_gateways():
                 "client_secret": os.environ.get("PAYPAL_CLIENT_SECRET"),
             }
         )
+    _configured_gateways.add("paypal")
+    return paypalrestsdk
+
+
+def configure_payment_gateways():
+    """Configure payment gateways from database settings.
+
+    Stripe needs no global setup: see services/stripe_client.py.
+    """
+    configure_paypal()
+
+
+def get_paypal():
+    """Return the PayPal SDK, importing and configuring it on first use."""
+    if "paypal" not in _configured_gateways:
+        return configure_paypal()
+    import paypalrestsdk
+    return paypalrestsdk
 
 
 def get_enabled_payment_gateways():
@@ -159,8 +171,10 @@ def update_payment_gateway_settings(
 
         db.session.commit()
 
-        # Reconfigure payment gateways after update
-        configure_payment_gateways()
+        # Reconfigure payment gateways on next use
+        _configured_gateways.clear()
+        from services.stripe_client import stripe_settings_snapshot
+        stripe_settings_snapshot.invalidate()
 
         logger.info("Payment gateway %s updated successfully", name)
         return True
@@ -218,11 +232,21 @@ def process_successful_payment(
     payment_intent_id,
     claiming_tag_id=None,
     subscription_type=None,
+    pricing_plan_id=None,
+    customer_id=None,
+    payment_method_id=None,
 ):
-    """Process a successful payment and create/update subscriptions"""
-    from models.models import User, Tag, Subscription, Payment, PricingPlan, Role
+    """Process a successful payment and create/update subscriptions
+
+    pricing_plan_id is the plan from the payment intent's metadata; the
+    intent's checkout session takes precedence. customer_id and
+    payment_method_id are the gateway's saved payment method, kept on the
+    subscription for automatic renewals.
+    """
+    from models.models import User, Subscription, Payment, PricingPlan, Role
     from extensions import db, logger
     from datetime import datetime, timedelta
+    from services.pricing import get_pricing_catalog
     
     logger.info(f"Processing payment: user_id={user_id}, payment_type={payment_type}, amount=${amount}, payment_intent_id={payment_intent_id}")
     
@@ -234,6 +258,21 @@ def process_successful_payment(
 
         logger.info(f"Found user: {user.username}")
 
+        # The webhook and the confirm route both report the same payment
+        from services.checkout import claim_checkout, purchased_plan_id
+        if payment_intent_id and not claim_checkout(payment_intent_id):
+            db.session.rollback()
+            logger.info(f"Payment {payment_intent_id} was already processed")
+            return True
+
+        # The plan that was bought; several plans can share a type and period
+        plan_id = purchased_plan_id(payment_intent_id, pricing_plan_id)
+        if plan_id:
+            plan = db.session.get(PricingPlan, plan_id)
+        else:
+            # Intents opened before the plan was recorded
+            plan = get_pricing_catalog().get(payment_type, subscription_type)
+
         # Create payment record first
         payment = Payment(
             user_id=user_id,
@@ -242,6 +281,7 @@ def process_successful_payment(
             amount=amount,
             status="completed",
             payment_type=payment_type,
+            pricing_plan_id=plan.id if plan else None,
             payment_metadata={
                 "claiming_tag_id": claiming_tag_id,
                 "subscription_type": subscription_type,
@@ -256,24 +296,19 @@ def process_successful_payment(
 
         if payment_type == "tag" and claiming_tag_id:
             logger.info(f"Processing tag subscription for tag {claiming_tag_id}")
-            # Process tag subscription
-            tag = Tag.query.filter_by(tag_id=claiming_tag_id).first()
-            if tag:
-                tag.owner_id = user_id
-                tag.status = "claimed"
-
-                # Find appropriate pricing plan
-                pricing_plan = PricingPlan.query.filter_by(
-                    plan_type="tag",
-                    billing_period=subscription_type,
-                    is_active=True,
-                ).first()
-
+            # Process tag subscription: one conditional UPDATE decides the owner
+            from services.tag_claims import claim_tag
+            tag_pk = claim_tag(claiming_tag_id, user_id)
+            if not tag_pk:
+                # Paid, but another buyer got the tag first: needs a refund
+                logger.error(f"Tag {claiming_tag_id} was no longer available for payment {payment_intent_id}")
+                payment.payment_metadata = {**(payment.payment_metadata or {}), "claim_conflict": True}
+            else:
                 # Create subscription
                 subscription = Subscription(
                     user_id=user_id,
-                    tag_id=tag.id,
-                    pricing_plan_id=pricing_plan.id if pricing_plan else None,
+                    tag_id=tag_pk,
+                    pricing_plan_id=plan.id if plan else None,
                     subscription_type="tag",
                     status="active",
                     payment_method=payment_method,
@@ -283,6 +318,8 @@ def process_successful_payment(
                     auto_renew=(
                         True if subscription_type in ["monthly", "yearly"] else False
                     ),
+                    gateway_customer_id=customer_id,
+                    gateway_payment_method_id=payment_method_id,
                 )
 
                 # Set end date based on subscription type
@@ -303,14 +340,7 @@ def process_successful_payment(
         elif payment_type == "partner":
             logger.info(f"Processing partner subscription for user {user_id}")
             
-            # Find appropriate pricing plan
-            pricing_plan = PricingPlan.query.filter_by(
-                plan_type="partner",
-                billing_period=subscription_type,
-                is_active=True,
-            ).first()
-            
-            logger.info(f"Found pricing plan: {pricing_plan.id if pricing_plan else 'None'}")
+            logger.info(f"Found pricing plan: {plan.id if plan else 'None'}")
 
             # Get or create partner
             from models.models import Partner
@@ -331,7 +361,7 @@ def process_successful_payment(
             subscription = Subscription(
                 user_id=user_id,
                 partner_id=partner.id,
-                pricing_plan_id=pricing_plan.id if pricing_plan else None,
+                pricing_plan_id=plan.id if plan else None,
                 subscription_type="partner",
                 status="pending",  # Partner subscriptions need admin approval
                 payment_method=payment_method,
@@ -339,7 +369,9 @@ def process_successful_payment(
                 amount=amount,
                 start_date=datetime.utcnow(),
                 auto_renew=True,
-                max_tags=pricing_plan.max_tags if pricing_plan else 0,
+                gateway_customer_id=customer_id,
+                gateway_payment_method_id=payment_method_id,
+                max_tags=plan.max_tags if plan else 0,
                 admin_approved=False,  # Still needs admin approval
             )
 